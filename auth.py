@@ -1,4 +1,8 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
+from functools import cached_property, lru_cache
 from typing import Annotated
 
 import jwt
@@ -8,25 +12,109 @@ from pwdlib import PasswordHash
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 import models
-from config import settings
-from database import get_db
+from cache import LRUCache
+from config import get_settings
+from database import get_db, get_write_db
+
+class PasswordHasherPool:
+    """Виконує argon2 у пулі потоків, щоб не блокувати event loop.
+
+    argon2 відпускає GIL під час обчислення, тому потоків достатньо.
+    Кількість одночасних хешувань обмежена max_workers; решта запитів
+    чекає в черзі (queued) — її глибину видно в stats().
+    """
+
+    def __init__(self, password_hash: PasswordHash, max_workers: int):
+        self.password_hash = password_hash
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="argon2")
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+
+    async def _run(self, func, *args):
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        future = self._executor.submit(self._track, func, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Клієнт пішов, поки задача чекала в черзі: вона вже не виконається,
+            # і _track не зменшить queued. Якщо вже виконується — зменшила сама
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def _track(self, func, *args):
+        # Виконується у потоці пулу: задача вийшла з черги
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.password_hash.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.password_hash.verify, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+        }
+
 
 class AuthService:
+    """Налаштування (ключ, алгоритм, розмір пулу) читаються при першому
+    використанні, а не при імпорті: модуль імпортують усі роутери."""
+
     def __init__(self):
         self.password_hash = PasswordHash.recommended()
         self.oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token")
-        self.secret_key = settings.secret_key.get_secret_value()
-        self.algorithm = settings.algorithm
 
-    def hash_password(self, password: str) -> str:
-        """Хешування пароля."""
-        return self.password_hash.hash(password)
+    @cached_property
+    def hasher_pool(self) -> PasswordHasherPool:
+        return PasswordHasherPool(self.password_hash, get_settings().password_hash_workers)
+
+    @property
+    def secret_key(self) -> str:
+        return get_settings().secret_key.get_secret_value()
+
+    @property
+    def algorithm(self) -> str:
+        return get_settings().algorithm
+
+    def shutdown(self) -> None:
+        # Пул потоків є лише якщо хтось уже хешував пароль
+        if "hasher_pool" in self.__dict__:
+            self.hasher_pool.shutdown()
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Перевірка пароля."""
-        return self.password_hash.verify(plain_password, hashed_password)
+    async def hash_password(self, password: str) -> str:
+        """Хешування пароля (у пулі потоків)."""
+        return await self.hasher_pool.hash(password)
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Перевірка пароля (у пулі потоків)."""
+        return await self.hasher_pool.verify(plain_password, hashed_password)
 
     def create_access_token(self, data: dict, expires_delta: timedelta = None) -> str:
         """Створення JWT токена."""
@@ -35,7 +123,7 @@ class AuthService:
             expire = datetime.now(UTC) + expires_delta
         else:
             expire = datetime.now(UTC) + timedelta(
-                minutes=settings.access_token_expire_minutes,
+                minutes=get_settings().access_token_expire_minutes,
             )
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(
@@ -45,57 +133,144 @@ class AuthService:
         )
         return encoded_jwt
 
-    def verify_access_token(self, token: str) -> str | None:
-        """Перевірка JWT токена та повернення subject (user id)."""
+    def decode_access_token(self, token: str) -> dict | None:
+        """Перевірка JWT токена та повернення payload (sub, exp)."""
         try:
-            payload = jwt.decode(
+            return jwt.decode(
                 token,
                 self.secret_key,
                 algorithms=[self.algorithm],
                 options={"require": ["exp", "sub"]},
             )
-            return payload.get("sub")
         except jwt.InvalidTokenError:
             return None
 
+    def verify_access_token(self, token: str) -> str | None:
+        """Перевірка JWT токена та повернення subject (user id)."""
+        payload = self.decode_access_token(token)
+        return payload.get("sub") if payload else None
+
+class UserCache:
+    """Кеш воркера: токен → user id та user id → рядок users.
+
+    Рядки зберігаються як кортежі колонок, а не ORM об'єкти, — кожен
+    запит отримує свою копію, приєднану до його сесії через merge().
+    Після видалення юзера в кеші лишається "надгробок", щоб паралельний
+    запит не повернув видалений рядок назад у кеш.
+    """
+
+    DELETED = object()
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self.tokens = LRUCache(maxsize)
+        self.users = LRUCache(maxsize)
+
+    def get_user_id(self, token: str) -> int | None:
+        return self.tokens.get(token)
+
+    def set_user_id(self, token: str, user_id: int, expires_at: float) -> None:
+        ttl = min(self.ttl, expires_at - datetime.now(UTC).timestamp())
+        if ttl > 0:
+            self.tokens.set(token, user_id, ttl)
+
+    def get_user(self, user_id: int):
+        """Повертає кортеж колонок, DELETED або None (немає в кеші)."""
+        return self.users.get(user_id)
+
+    def set_user(self, user: models.User) -> None:
+        if self.users.get(user.id) is self.DELETED:
+            return
+        self.users.set(user.id, (user.id, user.username, user.password_hash), self.ttl)
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.users.set(user_id, self.DELETED, self.ttl)
+
+
 # Створюємо єдиний екземпляр сервісу для всього додатку
 auth_service = AuthService()
 
-# Функція-залежність для отримання поточного користувача
-async def get_current_user(
-    token: Annotated[str, Depends(auth_service.oauth2_scheme)],
-    db: Annotated[AsyncSession, Depends(get_db)],
-) -> models.User:
-    user_id = auth_service.verify_access_token(token)
 
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+@lru_cache
+def get_user_cache() -> UserCache:
+    settings = get_settings()
+    return UserCache(settings.auth_cache_size, settings.auth_cache_ttl)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _token_user_id(token: str) -> int:
+    """user id з JWT; перевірений токен кешується до свого exp (але не довше TTL)."""
+    user_cache = get_user_cache()
+    user_id = user_cache.get_user_id(token)
+    if user_id is not None:
+        return user_id
+
+    payload = auth_service.decode_access_token(token)
+    if payload is None:
+        raise _unauthorized("Invalid or expired token")
 
     try:
-        user_id_int = int(user_id)
+        user_id = int(payload["sub"])
     except (TypeError, ValueError) as exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        ) from exception
+        raise _unauthorized("Invalid or expired token") from exception
 
+    user_cache.set_user_id(token, user_id, payload["exp"])
+    return user_id
+
+
+async def _load_user(db: AsyncSession, user_id: int) -> models.User:
     result = await db.execute(
-        select(models.User).where(models.User.id == user_id_int),
+        select(models.User).where(models.User.id == user_id),
     )
     user = result.scalars().first()
 
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("User not found")
+
+    get_user_cache().set_user(user)
     return user
 
+
+# Функція-залежність для отримання поточного користувача
+async def get_current_user(
+    token: Annotated[str, Depends(auth_service.oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> models.User:
+    user_id_int = _token_user_id(token)
+
+    cached = get_user_cache().get_user(user_id_int)
+    if cached is UserCache.DELETED:
+        raise _unauthorized("User not found")
+
+    if cached is not None:
+        # Без запиту до БД: приєднуємо копію з кешу до сесії запиту
+        user_id, username, password_hash = cached
+        user = models.User(id=user_id, username=username, password_hash=password_hash)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    return await _load_user(db, user_id_int)
+
+
+async def get_current_write_user(
+    token: Annotated[str, Depends(auth_service.oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_write_db)],
+) -> models.User:
+    """Для ендпоінтів, що змінюють дані: рядок юзера читається сесією
+    писача, повз кеш рядків. Надгробок UserCache є лише у воркері, що
+    видалив акаунт, а писач бачить видалення з будь-якого воркера."""
+    user_id = _token_user_id(token)
+    if get_user_cache().get_user(user_id) is UserCache.DELETED:
+        raise _unauthorized("User not found")
+    return await _load_user(db, user_id)
+
 # Тип для зручного використання в роутах
 CurrentUser = Annotated[models.User, Depends(get_current_user)]
+# Те саме в сесії писача (разом з WriteDB — FastAPI дає обом одну сесію)
+CurrentWriteUser = Annotated[models.User, Depends(get_current_write_user)]
@@ -0,0 +1,94 @@
+"""main.app з вимірюванням затримки event loop — для benchmarks/run.py.
+
+    uvicorn benchmarks.app:app
+
+Фонова задача засинає на LAG_INTERVAL і міряє, наскільки пізніше
+прокинулась: це час, коли loop був зайнятий чужим синхронним кодом
+(JSON, argon2 без потоку, важкі цикли). Для кожного запиту з заголовком
+X-Bench-Record запам'ятовується найбільша затримка, що припала на його
+час, по шаблону маршруту. При зупинці воркер пише lag-<pid>.json у
+BENCH_LAG_DIR; run.py об'єднує файли всіх воркерів.
+"""
+import asyncio
+import json
+import os
+import time
+
+from main import app as main_app
+from metrics import route_template
+
+HEADER = b"x-bench-record"
+LAG_INTERVAL = 0.005
+
+
+class LagMonitor:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: list[float] = []
+        # Запити в обробці → найбільша затримка за їхній час
+        self.active: dict[int, float] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            # Поза записаними запитами (прогрів, простій) семпли не потрібні
+            if self.active:
+                self.samples.append(lag)
+                for key, worst in self.active.items():
+                    if lag > worst:
+                        self.active[key] = lag
+
+
+class LagMiddleware:
+    def __init__(self, app, directory: str | None):
+        self.app = app
+        self.directory = directory
+        self.monitor = LagMonitor(LAG_INTERVAL)
+        self.per_route: dict[str, list[float]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.app(scope, receive, self._lifespan_send(send))
+            return
+        if scope["type"] != "http" or not any(name == HEADER for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        key = id(scope)
+        self.monitor.active[key] = 0.0
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            worst = self.monitor.active.pop(key)
+            route = f"{scope['method']} {route_template(scope)}"
+            self.per_route.setdefault(route, []).append(worst)
+
+    def _lifespan_send(self, send):
+        async def wrapped(message):
+            if message["type"] == "lifespan.startup.complete":
+                self.monitor.start()
+            elif message["type"] == "lifespan.shutdown.complete":
+                await self.monitor.stop()
+                self._dump()
+            await send(message)
+        return wrapped
+
+    def _dump(self) -> None:
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"lag-{os.getpid()}.json"), "w", encoding="utf-8") as file:
+            json.dump({"samples": self.monitor.samples, "per_route": self.per_route}, file)
+
+
+app = LagMiddleware(main_app, os.environ.get("BENCH_LAG_DIR"))
@@ -0,0 +1,137 @@
+"""GET /movies/common/{friend_id} для юзерів з тисячами лайків.
+
+    python -m benchmarks.seed bench.db --users 2000 --movies 100000 --likes-per-user 60
+    python -m benchmarks.common_movies bench.db --pairs 5 --likes 10000
+
+Працює на копії БД, куди додаються --pairs пар юзерів з рівно --likes
+лайків кожен (benchmarks.seed.add_power_users; фільми рівномірні, тож
+спільних ≈ likes² / movies). Кожен виклик — нова сесія, як окремий запит.
+Медіана на пару:
+  * orm — як до SQL перетину: refresh liked_movies обох юзерів і перетин
+    у Python (повертає всі спільні фільми);
+  * sql join — self-join likes по PK (user_id, movie_id): count і
+    сторінка --limit фільмів;
+  * service — MovieService.get_common_movies: count_only і сторінка
+    --limit; cold — порожній індекс лайків, warm — обидва юзери вже в ньому.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+
+
+async def _orm_common(session, user_id: int, friend_id: int) -> int:
+    """Перетин, як його рахував get_common_movies до SQL (повний список)."""
+    import models
+
+    user = await session.get(models.User, user_id)
+    friend = await session.get(models.User, friend_id)
+    await session.refresh(user, ["liked_movies"])
+    await session.refresh(friend, ["liked_movies"])
+    my_ids = {movie.id for movie in user.liked_movies}
+    return len([movie for movie in friend.liked_movies if movie.id in my_ids])
+
+
+def _common_ids(user_id: int, friend_id: int):
+    from sqlalchemy import and_, select
+
+    import models
+
+    mine = models.likes.alias("mine")
+    theirs = models.likes.alias("theirs")
+    return (
+        select(mine.c.movie_id)
+        .join(theirs, and_(theirs.c.movie_id == mine.c.movie_id, theirs.c.user_id == friend_id))
+        .where(mine.c.user_id == user_id)
+    )
+
+
+async def run(args, db_path: str) -> None:
+    from sqlalchemy import func, select
+
+    import models
+    from benchmarks.seed import add_power_users
+    from database import dispose_engines, get_write_engine, new_session
+    from like_index import get_like_index
+    from migrations import upgrade_schema
+    from services.movie_service import MovieService
+
+    try:
+        async with get_write_engine().begin() as conn:
+            await upgrade_schema(conn)
+        user_ids = add_power_users(db_path, [args.likes] * (args.pairs * 2), args.seed)
+        pairs = list(zip(user_ids[::2], user_ids[1::2]))
+
+        async def sql_count(session, user_id, friend_id):
+            return await session.scalar(select(func.count()).select_from(_common_ids(user_id, friend_id).subquery()))
+
+        async def sql_page(session, user_id, friend_id):
+            result = await session.execute(
+                select(models.Movie).where(models.Movie.id.in_(_common_ids(user_id, friend_id)))
+                .order_by(models.Movie.id).limit(args.limit)
+            )
+            return result.scalars().all()
+
+        async def service_count(session, user_id, friend_id):
+            user = await session.get(models.User, user_id)
+            return await MovieService(session).get_common_movies(user, friend_id, count_only=True)
+
+        async def service_page(session, user_id, friend_id):
+            user = await session.get(models.User, user_id)
+            return await MovieService(session).get_common_movies(user, friend_id, limit=args.limit)
+
+        cases = [
+            ("orm (all movies)", _orm_common, None),
+            ("sql join count", sql_count, None),
+            (f"sql join page {args.limit}", sql_page, None),
+            ("service count cold", service_count, "cold"),
+            ("service count warm", service_count, "warm"),
+            (f"service page {args.limit} warm", service_page, "warm"),
+        ]
+        common = []
+        print(f"{args.pairs} pairs x {args.likes} likes each")
+        for name, call, index_state in cases:
+            timings = []
+            for user_id, friend_id in pairs:
+                if index_state == "cold":
+                    get_like_index.cache_clear()
+                elif index_state == "warm":
+                    await get_like_index().get_many([user_id, friend_id])
+                started = time.perf_counter()
+                async with new_session() as session:
+                    result = await call(session, user_id, friend_id)
+                timings.append(time.perf_counter() - started)
+                if name == "sql join count":
+                    common.append(result)
+            print(f"  {name:<24} median {statistics.median(timings) * 1000:8.2f} ms"
+                  f"   max {max(timings) * 1000:8.2f} ms")
+        print(f"common movies per pair: median {statistics.median(common):.0f}")
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк спільних фільмів для юзерів з багатьма лайками")
+    parser.add_argument("db", help="БД з python -m benchmarks.seed (не змінюється, береться копія)")
+    parser.add_argument("--pairs", type=int, default=5, help="пар юзерів")
+    parser.add_argument("--likes", type=int, default=10000, help="лайків у кожного юзера")
+    parser.add_argument("--limit", type=int, default=50, help="розмір сторінки")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="moviematch-common-") as directory:
+        copy = os.path.join(directory, "bench.db")
+        shutil.copyfile(args.db, copy)
+        # До першого get_settings — рушії створюються з цим URL
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{copy}"
+        asyncio.run(run(args, copy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Локальна заміна TMDB для навантажувальних тестів.
+
+    python -m benchmarks.fake_tmdb --port 8765 --latency-ms 80 --jitter-ms 40
+
+Відповідає на ті самі шляхи, що використовує TMDBClient
+(/movie/popular, /discover/movie, /search/movie), з тією ж формою JSON.
+Фільми детерміновані: сторінка N завжди повертає ті самі id з діапазону
+1..--movies, тобто ті, що є в БД з benchmarks/seed.py. Затримка —
+asyncio.sleep, тож один процес тримає сотні одночасних запитів і сам
+не стає вузьким місцем. --error-rate віддає частку відповідей 503
+(перевірка кешу й запобіжника під навантаженням).
+"""
+import argparse
+import asyncio
+import random
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, Response
+
+from genres import GENRES
+
+PAGE_SIZE = 20
+TOTAL_PAGES = 500
+
+
+def fake_movie(movie_id: int) -> dict:
+    rng = random.Random(movie_id)
+    return {
+        "id": movie_id,
+        "title": f"Bench Movie {movie_id}",
+        "original_title": f"Bench Movie {movie_id}",
+        "poster_path": f"/bench{movie_id}.jpg",
+        "overview": "Synthetic movie",
+        "release_date": f"{1980 + movie_id % 45}-01-01",
+        "vote_average": round(rng.uniform(3, 9), 1),
+        "genre_ids": [genre_id for genre_id, _ in rng.sample(GENRES, rng.randint(1, 3))],
+    }
+
+
+def create_app(movies: int, latency: float, jitter: float, error_rate: float) -> FastAPI:
+    app = FastAPI(title="Fake TMDB")
+    stats = {"requests": 0, "errors": 0}
+
+    def page(key: str, number: int) -> dict:
+        # Кожен запит (key) — своя детермінована перестановка фільмів
+        start = (zlib.crc32(key.encode()) + (number - 1) * PAGE_SIZE) % movies
+        return {
+            "page": number,
+            "results": [fake_movie((start + offset) % movies + 1) for offset in range(PAGE_SIZE)],
+            "total_pages": TOTAL_PAGES,
+            "total_results": TOTAL_PAGES * PAGE_SIZE,
+        }
+
+    async def respond(key: str, number: int, response: Response) -> dict:
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            response.status_code = 503
+            return {"status_message": "Service Unavailable"}
+        return page(key, number)
+
+    @app.get("/3/movie/popular")
+    async def popular(response: Response, page: int = 1):
+        return await respond("popular", page, response)
+
+    @app.get("/3/discover/movie")
+    async def discover(response: Response, primary_release_year: int | None = None, page: int = 1):
+        return await respond(f"discover:{primary_release_year}", page, response)
+
+    @app.get("/3/search/movie")
+    async def search(response: Response, query: str = "", year: int | None = None, page: int = 1):
+        return await respond(f"search:{query.lower()}:{year}", page, response)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заміна TMDB для benchmarks/run.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--movies", type=int, default=10000, help="id фільмів 1..N (як у seed)")
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0, help="± до затримки, рівномірно")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="частка відповідей 503")
+    args = parser.parse_args()
+
+    app = create_app(args.movies, args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
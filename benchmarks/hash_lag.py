@@ -0,0 +1,92 @@
+"""Затримка event loop під час хешування паролів: argon2 прямо в loop
+(як було до PasswordHasherPool) проти пулу потоків.
+
+    python -m benchmarks.hash_lag --logins 64 --concurrency 16 --workers 4
+
+Для кожного режиму --concurrency корутин по черзі виконують verify
+(справжній argon2, PasswordHash.recommended()), поки не наберуть
+--logins перевірок. Паралельно тікер засинає на 5 мс і міряє, наскільки
+пізніше прокинувся — так само, як benchmarks/app.py під навантаженням.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from pwdlib import PasswordHash
+
+from auth import PasswordHasherPool
+
+TICK = 0.005
+
+
+async def _ticker(samples: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        samples.append(max(0.0, time.perf_counter() - started - TICK))
+
+
+async def measure(mode: str, logins: int, concurrency: int, workers: int) -> dict:
+    password_hash = PasswordHash.recommended()
+    hashed = password_hash.hash("bench-password")
+    pool = PasswordHasherPool(password_hash, workers) if mode == "pool" else None
+    remaining = logins
+    latencies: list[float] = []
+
+    async def verify() -> bool:
+        if pool is not None:
+            return await pool.verify("bench-password", hashed)
+        return password_hash.verify("bench-password", hashed)
+
+    async def client() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            assert await verify()
+            latencies.append(time.perf_counter() - started)
+
+    samples: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.ensure_future(_ticker(samples, stop))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await ticker
+        if pool is not None:
+            pool.shutdown()
+
+    samples.sort()
+    latencies.sort()
+    return {
+        "logins_per_s": logins / elapsed,
+        "login_p50": statistics.median(latencies),
+        "login_p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "lag_p50": statistics.median(samples) if samples else 0.0,
+        "lag_p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))] if samples else 0.0,
+        "lag_max": samples[-1] if samples else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Затримка event loop: argon2 в loop проти пулу потоків")
+    parser.add_argument("--logins", type=int, default=64, help="перевірок пароля на режим")
+    parser.add_argument("--concurrency", type=int, default=16, help="одночасних логінів")
+    parser.add_argument("--workers", type=int, default=4, help="потоків пулу (PASSWORD_HASH_WORKERS)")
+    args = parser.parse_args()
+
+    print(f"{args.logins} logins, concurrency {args.concurrency}, pool of {args.workers} (ms)")
+    print(f"{'mode':<8}{'logins/s':>10}{'login p50':>11}{'login p99':>11}{'lag p50':>9}{'lag p99':>9}{'lag max':>9}")
+    for mode in ("inline", "pool"):
+        result = asyncio.run(measure(mode, args.logins, args.concurrency, args.workers))
+        print(f"{mode:<8}{result['logins_per_s']:>10.1f}"
+              + "".join(f"{result[key] * 1000:>{width}.1f}" for key, width in
+                        (("login_p50", 11), ("login_p99", 11), ("lag_p50", 9), ("lag_p99", 9), ("lag_max", 9))))
+
+
+if __name__ == "__main__":
+    main()
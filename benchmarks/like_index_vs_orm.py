@@ -0,0 +1,137 @@
+"""Пам'ять і затримка: індекс лайків (like_index.py) проти ORM шляху.
+
+    python -m benchmarks.seed bench.db --users 2000 --movies 100000 --likes-per-user 60
+    python -m benchmarks.like_index_vs_orm bench.db --users 8 --likes 10000
+
+Працює на копії БД, куди додаються --users юзерів з рівно --likes лайків
+(benchmarks.seed.add_power_users). Для кожного шляху:
+  * load — завантаження лайків усіх юзерів і пам'ять, що лишається після
+    нього (tracemalloc): ORM — selectinload(User.liked_movies), як було до
+    індексу; індекс — LikeIndex.get_many через сесію. Час load виміряно
+    під tracemalloc, тож він завищений — порівнювати лише між собою;
+  * has liked / common / count — медіана одного виклику на вже
+    завантажених даних: `movie in user.liked_movies`, перетин множин
+    Movie і len() проти LikeIndex.has_liked / common / count.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+
+
+async def _timed(call, repeat: int) -> float:
+    """Медіана одного виклику, у мікросекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+
+async def _measure_load(load) -> tuple[object, float, int]:
+    """(результат, секунди, байти, що лишились зайнятими після load)."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = await load()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+
+async def run(args, db_path: str) -> None:
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    import models
+    from benchmarks.seed import add_power_users
+    from database import dispose_engines, get_write_engine, new_session
+    from like_index import LikeIndex
+    from migrations import upgrade_schema
+
+    try:
+        async with get_write_engine().begin() as conn:
+            await upgrade_schema(conn)
+        user_ids = add_power_users(db_path, [args.likes] * args.users, args.seed)
+        first, second = user_ids[0], user_ids[1]
+        rows = []
+
+        # ── ORM: як до індексу ──
+        async with new_session() as session:
+            async def load_orm():
+                result = await session.execute(
+                    select(models.User).where(models.User.id.in_(user_ids))
+                    .options(selectinload(models.User.liked_movies))
+                )
+                return {user.id: user for user in result.scalars().all()}
+
+            users, load_seconds, retained = await _measure_load(load_orm)
+            # Середина списку: `in` по списку ORM об'єктів — лінійний пошук
+            movie = users[first].liked_movies[args.likes // 2]
+            movie_id = movie.id
+
+            async def orm_has_liked():
+                return movie in users[first].liked_movies
+
+            async def orm_common():
+                return set(users[first].liked_movies) & set(users[second].liked_movies)
+
+            async def orm_count():
+                return len(users[first].liked_movies)
+
+            rows.append(("ORM", load_seconds, retained, await _timed(orm_has_liked, args.repeat),
+                         await _timed(orm_common, args.repeat), await _timed(orm_count, args.repeat)))
+            del users, movie
+
+        # ── індекс лайків ──
+        index = LikeIndex(maxsize=args.users * 2, ttl=3600)
+        async with new_session() as session:
+            _, load_seconds, retained = await _measure_load(lambda: index.get_many(user_ids, session))
+            rows.append((
+                "LikeIndex", load_seconds, retained,
+                await _timed(lambda: index.has_liked(first, movie_id, session), args.repeat),
+                await _timed(lambda: index.common(first, second, session), args.repeat),
+                await _timed(lambda: index.count(first, session), args.repeat),
+            ))
+        array_bytes = index.stats()["bytes"]
+    finally:
+        await dispose_engines()
+
+    print(f"{args.users} users x {args.likes} likes")
+    print(f"{'path':<10} {'load':>9} {'retained':>10} {'has liked':>11} {'common':>11} {'count':>9}")
+    for name, load_seconds, retained, has_liked, common, count in rows:
+        print(f"{name:<10} {load_seconds * 1000:7.1f} ms {retained / 2**20:7.2f} MiB"
+              f" {has_liked:8.1f} us {common:8.1f} us {count:6.1f} us")
+    print(f"LikeIndex arrays: {array_bytes / 2**20:.2f} MiB ({array_bytes / (args.users * args.likes):.1f} B/like)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Індекс лайків проти ORM: пам'ять і затримка")
+    parser.add_argument("db", help="БД з python -m benchmarks.seed (не змінюється, береться копія)")
+    parser.add_argument("--users", type=int, default=8, help="юзерів з --likes лайків (не менше 2)")
+    parser.add_argument("--likes", type=int, default=10000, help="лайків у кожного")
+    parser.add_argument("--repeat", type=int, default=200, help="викликів кожного запиту")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="moviematch-like-index-") as directory:
+        copy = os.path.join(directory, "bench.db")
+        shutil.copyfile(args.db, copy)
+        # До першого get_settings — рушії створюються з цим URL
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{copy}"
+        asyncio.run(run(args, copy))
+
+
+if __name__ == "__main__":
+    main()
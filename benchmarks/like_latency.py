@@ -0,0 +1,117 @@
+"""Затримка одного лайку залежно від кількості вже наявних лайків юзера.
+
+    python -m benchmarks.seed bench.db --users 2000 --movies 100000 --likes-per-user 60
+    python -m benchmarks.like_latency bench.db --counts 0 100 1000 10000 --likes 50
+
+Працює на копії БД. Для кожного значення --counts додаються два юзери з
+рівно стількома лайками (benchmarks.seed.add_power_users): один лайкає
+старим шляхом, інший — MovieService.like_movie. Кожен лайк — окрема
+сесія запису з commit, як окремий запит:
+  * old — як до upsert: SELECT фільму, selectinload(User.liked_movies),
+    `movie not in user.liked_movies`, append;
+  * upsert — INSERT ... ON CONFLICT по PK likes, без завантаження лайків.
+Медіана і p95 на --likes нових для юзера фільмів.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def _like_old(session, movie_id: int, user_id: int) -> None:
+    """Лайк, як його робив like_movie до upsert (поля фільму вже заповнені)."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    import models
+
+    movie = (await session.execute(select(models.Movie).where(models.Movie.id == movie_id))).scalars().first()
+    user = (await session.execute(
+        select(models.User).options(selectinload(models.User.liked_movies)).where(models.User.id == user_id)
+    )).scalars().first()
+    if movie not in user.liked_movies:
+        user.liked_movies.append(movie)
+        await session.commit()
+
+
+async def run(args, db_path: str) -> None:
+    from sqlalchemy import select
+
+    import models
+    from benchmarks.seed import add_power_users
+    from database import dispose_engines, get_engine, get_write_engine, new_write_session
+    from migrations import upgrade_schema
+    from schemas import MoviePublic
+    from services.movie_service import MovieService
+
+    rng = random.Random(args.seed)
+    try:
+        async with get_write_engine().begin() as conn:
+            await upgrade_schema(conn)
+        user_ids = add_power_users(db_path, [count for count in args.counts for _ in range(2)], args.seed)
+        async with get_engine().connect() as conn:
+            names = dict((await conn.execute(select(models.Movie.id, models.Movie.movie_name))).all())
+            movie_ids = list(names)
+            liked = {}
+            for user_id in user_ids:
+                rows = await conn.execute(select(models.likes.c.movie_id).where(models.likes.c.user_id == user_id))
+                liked[user_id] = set(rows.scalars().all())
+
+        print(f"{'likes':>7} {'old p50':>10} {'old p95':>10} {'upsert p50':>11} {'upsert p95':>11}")
+        for position, count in enumerate(args.counts):
+            old_user, new_user = user_ids[2 * position], user_ids[2 * position + 1]
+            timings = {}
+            for path, user_id in (("old", old_user), ("upsert", new_user)):
+                fresh = [movie_id for movie_id in rng.sample(movie_ids, args.likes * 2)
+                         if movie_id not in liked[user_id]][:args.likes]
+                timings[path] = []
+                for movie_id in fresh:
+                    started = time.perf_counter()
+                    async with new_write_session() as session:
+                        if path == "old":
+                            await _like_old(session, movie_id, user_id)
+                        else:
+                            # Юзер — як його дає get_current_user
+                            user = await session.get(models.User, user_id)
+                            await MovieService(session).like_movie(
+                                MoviePublic(id=movie_id, movie_name=names[movie_id]), user
+                            )
+                    timings[path].append(time.perf_counter() - started)
+            print(f"{count:>7} "
+                  f"{statistics.median(timings['old']) * 1000:7.2f} ms {_percentile(timings['old'], 0.95) * 1000:7.2f} ms "
+                  f"{statistics.median(timings['upsert']) * 1000:8.2f} ms {_percentile(timings['upsert'], 0.95) * 1000:8.2f} ms")
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Затримка лайку проти кількості лайків юзера")
+    parser.add_argument("db", help="БД з python -m benchmarks.seed (не змінюється, береться копія)")
+    parser.add_argument("--counts", type=int, nargs="+", default=[0, 100, 1000, 10000],
+                        help="скільки лайків вже має юзер")
+    parser.add_argument("--likes", type=int, default=50, help="лайків, що міряються, на кожне значення")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="moviematch-like-latency-") as directory:
+        copy = os.path.join(directory, "bench.db")
+        shutil.copyfile(args.db, copy)
+        # До першого get_settings — рушії створюються з цим URL
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{copy}"
+        asyncio.run(run(args, copy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Інкрементальне оновлення рекомендацій на великій таблиці likes.
+
+    python -m benchmarks.seed rec.db --users 20000 --movies 100000 --likes-per-user 50
+    python -m benchmarks.recommend_refresh rec.db --sample 200 --users 50
+
+Працює на копії БД. Міряє:
+  * full count — колишній прохід SELECT movie_id, count(*) ... GROUP BY
+    по всій likes, який раніше виконувався на кожне оновлення (довідково);
+  * compute_neighbors для --sample фільмів: половина — найпопулярніші
+    (найдорожчі), половина — випадкові; медіана, p95 і максимум на фільм;
+  * refresh — RecommendationRefresher: --users випадкових юзерів
+    позначено як щойно лайкнувших, пакети до спорожнення черги.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(args) -> None:
+    from sqlalchemy import func, select
+
+    import models
+    from config import get_settings
+    from database import dispose_engines, get_engine, get_write_engine, new_write_session
+    from migrations import upgrade_schema
+    from recommender import compute_neighbors
+    from services.recommendation_service import get_recommendation_refresher
+
+    settings = get_settings()
+    rng = random.Random(args.seed)
+    likes = models.likes
+    try:
+        async with get_write_engine().begin() as conn:
+            await upgrade_schema(conn)
+        async with get_engine().connect() as conn:
+            total = await conn.scalar(select(func.count()).select_from(likes))
+            started = time.perf_counter()
+            counts = (await conn.execute(select(likes.c.movie_id, func.count()).group_by(likes.c.movie_id))).all()
+            full_count = time.perf_counter() - started
+            print(f"{total} likes, {len(counts)} liked movies")
+            print(f"full count (per refresh before):  {full_count * 1000:8.1f} ms")
+
+            by_popularity = sorted(counts, key=lambda row: row[1], reverse=True)
+            popular = [movie_id for movie_id, _ in by_popularity[:args.sample // 2]]
+            sample = popular + rng.sample([movie_id for movie_id, _ in counts], args.sample - len(popular))
+            timings = []
+            for movie_id in sample:
+                started = time.perf_counter()
+                await compute_neighbors(conn, [movie_id], settings.recommend_top_k, settings.recommend_min_support)
+                timings.append(time.perf_counter() - started)
+        print(f"compute_neighbors, {len(sample)} movies ({len(popular)} most popular):")
+        print(f"  per movie  median {statistics.median(timings) * 1000:7.1f} ms"
+              f"   p95 {_percentile(timings, 0.95) * 1000:7.1f} ms   max {max(timings) * 1000:7.1f} ms")
+
+        refresher = get_recommendation_refresher()
+        async with get_engine().connect() as conn:
+            user_ids = (await conn.execute(select(likes.c.user_id).distinct())).scalars().all()
+        marked = rng.sample(user_ids, min(args.users, len(user_ids)))
+        async with new_write_session() as session:
+            for user_id in marked:
+                latest = await session.scalar(
+                    select(likes.c.movie_id).where(likes.c.user_id == user_id)
+                    .order_by(likes.c.liked_at.desc()).limit(1)
+                )
+                await refresher.mark(session, user_id, [latest])
+            await session.commit()
+        started = time.perf_counter()
+        batches = []
+        while True:
+            batch_started = time.perf_counter()
+            done = await refresher.refresh()
+            if not done:
+                break
+            batches.append(time.perf_counter() - batch_started)
+        elapsed = time.perf_counter() - started
+        print(f"refresh, {len(marked)} users marked: {refresher.refreshed} movies in {len(batches)} batches"
+              f" of {refresher.batch_size}, {elapsed:.2f} s"
+              f" (batch median {statistics.median(batches or [0]) * 1000:.0f} ms)")
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк інкрементального оновлення рекомендацій")
+    parser.add_argument("db", help="БД з python -m benchmarks.seed (не змінюється, береться копія)")
+    parser.add_argument("--sample", type=int, default=200, help="фільмів для compute_neighbors")
+    parser.add_argument("--users", type=int, default=50, help="юзерів у черзі для refresh")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="moviematch-recommend-") as directory:
+        copy = os.path.join(directory, "bench.db")
+        shutil.copyfile(args.db, copy)
+        # До першого get_settings — рушії створюються з цим URL
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{copy}"
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+"""Навантажувальний тест: додаток + fake TMDB + суміші запитів.
+
+    python -m benchmarks.seed bench.db --users 2000
+    python -m benchmarks.run bench.db --mix swipe profile --concurrency 32 --duration 30
+    python -m benchmarks.run bench.db --save-baseline laptop
+    python -m benchmarks.run bench.db --compare laptop
+
+Для кожної суміші (mix): копія БД із seed, свіжий uvicorn з
+benchmarks.app:app, прогрів (не рахується), потім --duration секунд
+замкненого циклу: --concurrency клієнтів, кожен шле наступний запит
+одразу після відповіді на попередній. Звіт по ендпоінтах (шаблонах
+маршрутів): RPS, p50/p95/p99, помилки (не 2xx) і затримка event loop
+сервера (p99 найбільшої затримки, що припала на запит).
+
+Токени підписуються тут тим самим SECRET_KEY, що й у сервера: вхід
+(argon2) є лише в сумішах login і mixed. Результати — benchmarks/results/,
+базові лінії — benchmarks/baselines/<name>.json. --compare порівнює
+p95 і RPS з базовою лінією і завершується з кодом 1, якщо щось
+погіршилось більше ніж на --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+import httpx
+import jwt
+
+from benchmarks.seed import load_sidecar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINES_DIR = os.path.join(BENCH_DIR, "baselines")
+
+SECRET_KEY = "benchmark-secret-key-not-for-production"
+RECORD_HEADERS = {"X-Bench-Record": "1"}
+
+
+# ── стан віртуальних юзерів ─────────────────────
+@dataclass
+class Population:
+    users: int
+    movies: int
+    password: str
+    username_format: str
+    friends: dict[int, list[int]]
+    tokens: dict[int, str] = field(default_factory=dict)
+    # Картки з останньої колоди юзера — їх і лайкаємо, як choose.html
+    decks: dict[int, list[dict]] = field(default_factory=dict)
+
+    def token(self, user_id: int) -> str:
+        token = self.tokens.get(user_id)
+        if token is None:
+            payload = {"sub": str(user_id), "exp": int(time.time()) + 24 * 3600}
+            token = self.tokens[user_id] = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+        return token
+
+    def auth(self, user_id: int) -> dict:
+        return {"Authorization": f"Bearer {self.token(user_id)}"}
+
+
+def load_population(db_path: str) -> Population:
+    info = load_sidecar(db_path)
+    friends: dict[int, list[int]] = {}
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        for user_id, friend_id in conn.execute("SELECT user_id, friend_id FROM user_friends WHERE is_accepted = 1"):
+            friends.setdefault(user_id, []).append(friend_id)
+    finally:
+        conn.close()
+    return Population(info["users"], info["movies"], info["password"], info["username_format"], friends)
+
+
+def _movie_payload(card: dict) -> dict:
+    return {
+        "id": card["id"],
+        "movie_name": card.get("title") or card.get("movie_name") or "",
+        "poster_path": card.get("poster_path"),
+        "overview": card.get("overview"),
+        "release_date": card.get("release_date"),
+        "vote_average": card.get("vote_average"),
+        "genre_ids": card.get("genre_ids"),
+    }
+
+
+def _random_movie(population: Population, rng: random.Random) -> dict:
+    movie_id = rng.randint(1, population.movies)
+    return {"id": movie_id, "movie_name": f"Bench Movie {movie_id}"}
+
+
+# ── дії: (мітка ендпоінту, запит) ───────────────
+# Мітка — як шаблон маршруту в metrics.route_template, щоб збігалась
+# із затримкою event loop з боку сервера
+async def login(client, population, rng, user_id):
+    return "POST /users/login", await client.post("/users/login", data={
+        "username": population.username_format.format(user_id), "password": population.password,
+    })
+
+
+async def me(client, population, rng, user_id):
+    return "GET /users/me", await client.get("/users/me", headers=population.auth(user_id))
+
+
+async def deck(client, population, rng, user_id):
+    response = await client.get("/movies/deck", params={"size": 10}, headers=population.auth(user_id))
+    if response.status_code == 200:
+        population.decks[user_id] = response.json()["results"]
+    return "GET /movies/deck", response
+
+
+async def like(client, population, rng, user_id):
+    cards = population.decks.get(user_id)
+    movie = _movie_payload(cards.pop()) if cards else _random_movie(population, rng)
+    return "POST /movies/like-movie", await client.post(
+        "/movies/like-movie", json=movie, headers=population.auth(user_id),
+    )
+
+
+async def likes_batch(client, population, rng, user_id):
+    cards = population.decks.get(user_id) or []
+    to_like = [_movie_payload(cards.pop()) for _ in range(min(5, len(cards)))]
+    to_like = to_like or [_random_movie(population, rng) for _ in range(5)]
+    body = {"like": to_like, "unlike": [rng.randint(1, population.movies)]}
+    return "POST /movies/likes:batch", await client.post(
+        "/movies/likes:batch", json=body, headers=population.auth(user_id),
+    )
+
+
+async def friends_overview(client, population, rng, user_id):
+    return "GET /users/friends/overview", await client.get(
+        "/users/friends/overview", params={"sort": "match"}, headers=population.auth(user_id),
+    )
+
+
+async def liked(client, population, rng, user_id):
+    # Профіль друга (або свій, якщо друзів немає)
+    owner = rng.choice(population.friends.get(user_id) or [user_id])
+    return "GET /movies/{user_id}/liked", await client.get(f"/movies/{owner}/liked", params={"limit": 50})
+
+
+async def common(client, population, rng, user_id):
+    friends = population.friends.get(user_id)
+    if not friends:
+        return await friends_overview(client, population, rng, user_id)
+    return "GET /movies/common/{friend_id}", await client.get(
+        f"/movies/common/{rng.choice(friends)}", params={"limit": 50}, headers=population.auth(user_id),
+    )
+
+
+async def recommended(client, population, rng, user_id):
+    return "GET /movies/recommended", await client.get("/movies/recommended", headers=population.auth(user_id))
+
+
+async def search_users(client, population, rng, user_id):
+    # Шматок імені іншого юзера: "er_0012" — і префікс, і підрядок
+    name = population.username_format.format(rng.randint(1, population.users))
+    start = rng.randint(0, len(name) - 4)
+    return "GET /users/search", await client.get(
+        "/users/search", params={"query": name[start:start + rng.randint(3, 6)]},
+    )
+
+
+async def search_movies(client, population, rng, user_id):
+    # Обмежений словник запитів — частина влучає в кеш TMDB, як у житті
+    return "GET /movies/", await client.get("/movies/", params={"name": f"bench {rng.randint(1, 300)}"})
+
+
+async def popular(client, population, rng, user_id):
+    return "GET /movies/", await client.get("/movies/", params={"page": rng.randint(1, 50)})
+
+
+MIXES: dict[str, list[tuple]] = {
+    "login": [(login, 1)],
+    "swipe": [(deck, 5), (like, 4), (likes_batch, 1)],
+    "profile": [(me, 2), (friends_overview, 3), (liked, 3), (common, 3), (recommended, 1)],
+    "search": [(search_users, 5), (search_movies, 4), (popular, 1)],
+    "mixed": [
+        (login, 1), (me, 4), (deck, 10), (like, 8), (likes_batch, 2), (friends_overview, 4),
+        (liked, 4), (common, 4), (recommended, 2), (search_users, 3), (search_movies, 3), (popular, 1),
+    ],
+}
+
+
+# ── процеси ─────────────────────────────────────
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"процес завершився з кодом {process.returncode}: {' '.join(process.args)}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} не відповів за {timeout:.0f} с")
+
+
+def _stop(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def start_fake_tmdb(args, movies: int) -> subprocess.Popen:
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_tmdb", "--port", str(args.tmdb_port), "--movies", str(movies),
+        "--latency-ms", str(args.tmdb_latency_ms), "--jitter-ms", str(args.tmdb_jitter_ms),
+        "--error-rate", str(args.tmdb_error_rate),
+    ], cwd=ROOT)
+    _wait_ready(f"http://127.0.0.1:{args.tmdb_port}/stats", process)
+    return process
+
+
+def start_app(args, db_path: str, lag_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "SECRET_KEY": SECRET_KEY,
+        "TMDB_API_KEY": "benchmark",
+        "TMDB_BASE_URL": f"http://127.0.0.1:{args.tmdb_port}/3",
+        "BENCH_LAG_DIR": lag_dir,
+    }
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "benchmarks.app:app", "--host", "127.0.0.1", "--port", str(args.port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ], cwd=ROOT, env=env)
+    _wait_ready(f"http://127.0.0.1:{args.port}/openapi.json", process)
+    return process
+
+
+# ── навантаження ────────────────────────────────
+async def drive(base_url: str, population: Population, mix: list[tuple], concurrency: int,
+                duration: float, record: bool, seed: int) -> dict[str, dict]:
+    """Замкнений цикл: concurrency клієнтів протягом duration секунд.
+    Повертає мітка → {"latencies": [...], "errors": N, "statuses": {...}}."""
+    actions = [action for action, _ in mix]
+    weights = [weight for _, weight in mix]
+    results: dict[str, dict] = {}
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0,
+                                 headers=RECORD_HEADERS if record else None) as client:
+        async def worker(number: int) -> None:
+            rng = random.Random(seed * 1000 + number)
+            while time.perf_counter() < deadline:
+                action = rng.choices(actions, weights)[0]
+                user_id = rng.randint(1, population.users)
+                started = time.perf_counter()
+                try:
+                    label, response = await action(client, population, rng, user_id)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    label, status = action.__name__, type(e).__name__
+                elapsed = time.perf_counter() - started
+
+                entry = results.setdefault(label, {"latencies": [], "errors": 0, "statuses": {}})
+                entry["latencies"].append(elapsed)
+                entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+                if not (isinstance(status, int) and 200 <= status < 300):
+                    entry["errors"] += 1
+
+        await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    return results
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank перцентиль; values відсортовані."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(latencies: list[float], errors: int, duration: float, lags: list[float] | None = None) -> dict:
+    latencies = sorted(latencies)
+    summary = {
+        "count": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+    if lags is not None:
+        summary["lag_p99_ms"] = round(percentile(sorted(lags), 0.99) * 1000, 2)
+    return summary
+
+
+def read_lag(lag_dir: str) -> tuple[list[float], dict[str, list[float]]]:
+    samples: list[float] = []
+    per_route: dict[str, list[float]] = {}
+    for name in os.listdir(lag_dir):
+        with open(os.path.join(lag_dir, name), encoding="utf-8") as file:
+            data = json.load(file)
+        samples.extend(data["samples"])
+        for route, values in data["per_route"].items():
+            per_route.setdefault(route, []).extend(values)
+    return samples, per_route
+
+
+def run_mix(args, name: str, population: Population) -> dict:
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        # Кожна суміш — з тієї самої БД: записи попередньої не впливають
+        db_path = os.path.join(workdir, "bench.db")
+        shutil.copyfile(args.db, db_path)
+        lag_dir = os.path.join(workdir, "lag")
+
+        app = start_app(args, db_path, lag_dir)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            if args.warmup:
+                asyncio.run(drive(base_url, population, MIXES[name], args.concurrency, args.warmup, False, args.seed))
+            started = time.perf_counter()
+            results = asyncio.run(drive(base_url, population, MIXES[name], args.concurrency, args.duration,
+                                        True, args.seed + 1))
+            elapsed = time.perf_counter() - started
+        finally:
+            _stop(app)
+        samples, per_route = read_lag(lag_dir) if os.path.isdir(lag_dir) else ([], {})
+
+    endpoints = {
+        label: {**summarize(entry["latencies"], entry["errors"], elapsed, per_route.get(label, [])),
+                "statuses": entry["statuses"]}
+        for label, entry in sorted(results.items())
+    }
+    total = summarize(
+        [value for entry in results.values() for value in entry["latencies"]],
+        sum(entry["errors"] for entry in results.values()), elapsed,
+    )
+    samples.sort()
+    loop_lag = {
+        "samples": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+    }
+    return {"duration": round(elapsed, 2), "endpoints": endpoints, "total": total, "loop_lag": loop_lag}
+
+
+# ── звіт і базові лінії ─────────────────────────
+def print_mix(name: str, result: dict) -> None:
+    print(f"\n== {name} ({result['duration']:.0f} с) ==")
+    print(f"{'endpoint':<34} {'count':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5} {'lag p99':>8}")
+    rows = [*result["endpoints"].items(), ("TOTAL", result["total"])]
+    for label, stats in rows:
+        lag = f"{stats['lag_p99_ms']:8.1f}" if "lag_p99_ms" in stats else f"{'':>8}"
+        print(f"{label:<34} {stats['count']:>7} {stats['rps']:>8.1f} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['errors']:>5} {lag}")
+    lag = result["loop_lag"]
+    print(f"event loop lag: p50 {lag['p50_ms']:.1f} ms, p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Погіршення p95 або RPS більше ніж на tolerance (частка)."""
+    regressions = []
+    for setting in ("concurrency", "workers", "tmdb_latency_ms"):
+        if report["settings"].get(setting) != baseline["settings"].get(setting):
+            print(f"УВАГА: {setting} відрізняється від базової лінії "
+                  f"({baseline['settings'].get(setting)} → {report['settings'].get(setting)})")
+    if report["seed"] != baseline["seed"]:
+        print("УВАГА: БД згенеровано з іншими параметрами seed, ніж для базової лінії")
+
+    print(f"\n{'mix / endpoint':<44} {'p95 base':>9} {'p95 now':>9} {'rps base':>9} {'rps now':>9}")
+    for name, result in report["mixes"].items():
+        old_mix = baseline["mixes"].get(name)
+        if old_mix is None:
+            continue
+        rows = [*result["endpoints"].items(), ("TOTAL", result["total"])]
+        old_rows = {**old_mix["endpoints"], "TOTAL": old_mix["total"]}
+        for label, stats in rows:
+            old = old_rows.get(label)
+            if old is None:
+                continue
+            marks = []
+            if stats["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+                marks.append("p95")
+            if stats["rps"] < old["rps"] * (1 - tolerance):
+                marks.append("rps")
+            key = f"{name} / {label}"
+            print(f"{key:<44} {old['p95_ms']:>9.1f} {stats['p95_ms']:>9.1f} {old['rps']:>9.1f} {stats['rps']:>9.1f}"
+                  + (f"  ← гірше: {', '.join(marks)}" if marks else ""))
+            if marks:
+                regressions.append(f"{key}: {', '.join(marks)}")
+    return regressions
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Навантажувальний тест MovieMatch")
+    parser.add_argument("db", help="БД з python -m benchmarks.seed (не змінюється)")
+    parser.add_argument("--mix", nargs="+", choices=list(MIXES), default=list(MIXES))
+    parser.add_argument("--concurrency", type=int, default=32, help="одночасних клієнтів")
+    parser.add_argument("--duration", type=float, default=30.0, help="секунд вимірювання на суміш")
+    parser.add_argument("--warmup", type=float, default=5.0, help="секунд прогріву (не рахуються)")
+    parser.add_argument("--workers", type=int, default=1, help="воркерів uvicorn")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--tmdb-port", type=int, default=8765)
+    parser.add_argument("--tmdb-latency-ms", type=float, default=80.0)
+    parser.add_argument("--tmdb-jitter-ms", type=float, default=40.0)
+    parser.add_argument("--tmdb-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1, help="seed вибору дій і юзерів")
+    parser.add_argument("--save-baseline", metavar="NAME", help="зберегти як benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="порівняти з benchmarks/baselines/NAME.json")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="допустиме погіршення p95/RPS, частка")
+    args = parser.parse_args()
+
+    population = load_population(args.db)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": _git_revision(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "seed": load_sidecar(args.db),
+        "settings": {name: value for name, value in vars(args).items()
+                     if name not in ("db", "mix", "save_baseline", "compare", "tolerance")},
+        "mixes": {},
+    }
+
+    tmdb = start_fake_tmdb(args, population.movies)
+    try:
+        for name in args.mix:
+            report["mixes"][name] = run_mix(args, name, population)
+            print_mix(name, report["mixes"][name])
+    finally:
+        _stop(tmdb)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(result_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"\nРезультати: {os.path.relpath(result_path, ROOT)}")
+
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        baseline_path = os.path.join(BASELINES_DIR, f"{args.save_baseline}.json")
+        shutil.copyfile(result_path, baseline_path)
+        print(f"Базова лінія: {os.path.relpath(baseline_path, ROOT)}")
+
+    if args.compare:
+        with open(os.path.join(BASELINES_DIR, f"{args.compare}.json"), encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\nПогіршення понад {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nПогіршень понад {args.tolerance:.0%} немає")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Синтетична БД для навантажувальних тестів.
+
+    python -m benchmarks.seed bench.db --users 5000 --movies 20000 \\
+        --likes-per-user 80 --friends-per-user 20
+
+Схема створюється тими самими upgrade_schema, що й при старті додатку,
+дані вставляються напряму через sqlite3 (мільйони рядків за секунди).
+Популярність фільмів — за законом Ципфа: кілька хітів лайкнули майже
+всі, довгий хвіст — одиниці, як у реальних лайках. Усі юзери мають
+однаковий пароль (один argon2 хеш на всю БД). Параметри зберігаються
+поруч у <db>.seed.json — їх читає benchmarks/run.py.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sqlite3
+import time
+
+# Налаштування вимагають ключів (get_settings); для бенчмарку
+# справжні ключі не потрібні
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+
+from genres import GENRE_BITS
+
+PASSWORD = "bench-password"
+USERNAME = "bench_user_{:06d}"
+LIKED_AT_START = 1704067200  # 2024-01-01, лайки розкидані на рік уперед
+
+
+def sidecar_path(db_path: str) -> str:
+    return db_path + ".seed.json"
+
+
+def load_sidecar(db_path: str) -> dict:
+    with open(sidecar_path(db_path), encoding="utf-8") as file:
+        return json.load(file)
+
+
+async def _create_schema() -> None:
+    from database import dispose_engines, get_write_engine
+    from migrations import upgrade_schema
+
+    try:
+        async with get_write_engine().begin() as conn:
+            await upgrade_schema(conn)
+    finally:
+        await dispose_engines()
+
+
+async def _build_recommendations() -> int:
+    from config import get_settings
+    from database import dispose_engines
+    from recommender import build
+
+    settings = get_settings()
+    try:
+        return await build(settings.recommend_top_k, settings.recommend_min_support)
+    finally:
+        await dispose_engines()
+
+
+def _zipf_weights(count: int, exponent: float) -> list[float]:
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _sample_distinct(rng: random.Random, population: range, cum_weights: list[float], k: int) -> set[int]:
+    chosen: set[int] = set()
+    while len(chosen) < k:
+        chosen.update(rng.choices(population, cum_weights=cum_weights, k=k - len(chosen)))
+    return chosen
+
+
+def seed(db_path: str, users: int, movies: int, likes_per_user: int, friends_per_user: int,
+         pending_per_user: int, zipf: float, random_seed: int) -> dict:
+    from auth import auth_service
+    from migrations import FRIEND_COMPATIBILITY_BACKFILL
+
+    rng = random.Random(random_seed)
+    password_hash = auth_service.password_hash.hash(PASSWORD)
+    genre_bits = list(GENRE_BITS.values())
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    timings = {}
+
+    with conn:
+        started = time.perf_counter()
+        conn.executemany(
+            "INSERT INTO users (id, username, username_normalized, password_hash) VALUES (?, ?, ?, ?)",
+            ((user_id, USERNAME.format(user_id), USERNAME.format(user_id), password_hash)
+             for user_id in range(1, users + 1)),
+        )
+        conn.executemany(
+            "INSERT INTO movies (id, movie_name, poster_path, overview, release_date, vote_average, genre_mask)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((movie_id, f"Bench Movie {movie_id}", f"/bench{movie_id}.jpg", "Synthetic movie",
+              f"{1980 + movie_id % 45}-01-01", round(rng.uniform(3, 9), 1),
+              sum(rng.sample(genre_bits, rng.randint(1, 3))))
+             for movie_id in range(1, movies + 1)),
+        )
+        timings["users_movies"] = time.perf_counter() - started
+
+        # Ранг популярності не збігається з id, інакше хіти — перші сторінки popular
+        started = time.perf_counter()
+        by_rank = list(range(1, movies + 1))
+        rng.shuffle(by_rank)
+        cum_weights = _zipf_weights(movies, zipf)
+        like_count = 0
+        for user_id in range(1, users + 1):
+            # Кількість лайків різна (експоненційний розподіл із заданим середнім)
+            k = min(movies, max(1, int(rng.expovariate(1 / likes_per_user))))
+            ranks = _sample_distinct(rng, range(movies), cum_weights, k)
+            liked_at = sorted(rng.randrange(LIKED_AT_START, LIKED_AT_START + 365 * 86400) for _ in ranks)
+            conn.executemany(
+                "INSERT INTO likes (user_id, movie_id, liked_at) VALUES (?, ?, ?)",
+                ((user_id, by_rank[rank], time.strftime("%Y-%m-%d %H:%M:%S.000000", time.gmtime(at)))
+                 for rank, at in zip(ranks, liked_at)),
+            )
+            like_count += k
+        timings["likes"] = time.perf_counter() - started
+
+        # Дружба — випадкові пари; прийнята = два рядки, запит = один
+        started = time.perf_counter()
+        pairs: set[tuple[int, int]] = set()
+        for user_id in range(1, users + 1):
+            for friend_id in rng.sample(range(1, users + 1), min(users, friends_per_user // 2 + 1)):
+                if friend_id != user_id:
+                    pairs.add((min(user_id, friend_id), max(user_id, friend_id)))
+        conn.executemany(
+            "INSERT INTO user_friends (user_id, friend_id, is_accepted) VALUES (?, ?, 1)",
+            itertools.chain.from_iterable(((a, b), (b, a)) for a, b in pairs),
+        )
+        pending = set()
+        for user_id in range(1, users + 1):
+            for friend_id in rng.sample(range(1, users + 1), min(users, pending_per_user)):
+                pair = (min(user_id, friend_id), max(user_id, friend_id))
+                if friend_id != user_id and pair not in pairs:
+                    pairs.add(pair)
+                    pending.add((user_id, friend_id))
+        conn.executemany("INSERT INTO user_friends (user_id, friend_id, is_accepted) VALUES (?, ?, 0)", pending)
+        timings["friendships"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        conn.execute(FRIEND_COMPATIBILITY_BACKFILL)
+        timings["friend_compatibility"] = time.perf_counter() - started
+
+    conn.execute("ANALYZE")
+    conn.close()
+
+    return {
+        "users": users,
+        "movies": movies,
+        "likes": like_count,
+        "friendships": len(pairs) - len(pending),
+        "pending_requests": len(pending),
+        "likes_per_user": likes_per_user,
+        "friends_per_user": friends_per_user,
+        "zipf": zipf,
+        "seed": random_seed,
+        "password": PASSWORD,
+        "username_format": USERNAME,
+        "seconds": {name: round(value, 2) for name, value in timings.items()},
+    }
+
+
+def add_power_users(db_path: str, like_counts: list[int], random_seed: int = 1) -> list[int]:
+    """Додає юзерів з рівно like_counts[i] лайків (фільми рівномірно з усієї
+    таблиці movies) до вже заповненої БД; повертає їхні id. Для бенчмарків
+    шляхів, час яких залежить від кількості лайків одного юзера."""
+    rng = random.Random(random_seed)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        movie_ids = [row[0] for row in conn.execute("SELECT id FROM movies")]
+        first_id = conn.execute("SELECT coalesce(max(id), 0) + 1 FROM users").fetchone()[0]
+        password_hash = conn.execute("SELECT password_hash FROM users LIMIT 1").fetchone()[0]
+        user_ids = list(range(first_id, first_id + len(like_counts)))
+        conn.executemany(
+            "INSERT INTO users (id, username, username_normalized, password_hash) VALUES (?, ?, ?, ?)",
+            ((user_id, USERNAME.format(user_id), USERNAME.format(user_id), password_hash) for user_id in user_ids),
+        )
+        for user_id, count in zip(user_ids, like_counts):
+            liked_at = sorted(rng.randrange(LIKED_AT_START, LIKED_AT_START + 365 * 86400) for _ in range(count))
+            conn.executemany(
+                "INSERT INTO likes (user_id, movie_id, liked_at) VALUES (?, ?, ?)",
+                ((user_id, movie_id, time.strftime("%Y-%m-%d %H:%M:%S.000000", time.gmtime(at)))
+                 for movie_id, at in zip(rng.sample(movie_ids, min(count, len(movie_ids))), liked_at)),
+            )
+    conn.close()
+    return user_ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Синтетична БД для benchmarks/run.py")
+    parser.add_argument("db", help="шлях до нової SQLite БД (існуюча перезаписується)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--movies", type=int, default=10000)
+    parser.add_argument("--likes-per-user", type=int, default=60, help="середнє; розподіл експоненційний")
+    parser.add_argument("--friends-per-user", type=int, default=20, help="приблизно, прийнятих")
+    parser.add_argument("--pending-per-user", type=int, default=1, help="надісланих запитів дружби без відповіді")
+    parser.add_argument("--zipf", type=float, default=1.0, help="показник популярності фільмів")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--build-recommendations", action="store_true",
+                        help="одразу порахувати movie_neighbors (python recommender.py build)")
+    args = parser.parse_args()
+
+    for path in (args.db, args.db + "-wal", args.db + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    # До першого get_write_engine — рушії створюються з цим URL
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{args.db}"
+    asyncio.run(_create_schema())
+    info = seed(args.db, args.users, args.movies, args.likes_per_user, args.friends_per_user,
+                args.pending_per_user, args.zipf, args.seed)
+
+    if args.build_recommendations:
+        started = time.perf_counter()
+        asyncio.run(_build_recommendations())
+        info["seconds"]["recommendations"] = round(time.perf_counter() - started, 2)
+
+    with open(sidecar_path(args.db), "w", encoding="utf-8") as file:
+        json.dump(info, file, indent=2)
+    print(json.dumps(info, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Змішане читання/запис у SQLite: профіль database.py проти налаштувань
+за замовчуванням, з якими додаток працював раніше.
+
+    python -m benchmarks.seed bench.db --users 2000 --movies 10000 --likes-per-user 60
+    python -m benchmarks.sqlite_concurrency bench.db --concurrency 32 --duration 10 --write-ratio 0.2
+
+Без HTTP: --concurrency корутин протягом --duration секунд виконують
+операції напряму через сесії, кожна операція — окрема сесія, як запит:
+  * read — сторінка лайкнутих фільмів юзера і кількість його друзів;
+  * write — перемикання лайку: SELECT наявного рядка, потім INSERT або
+    DELETE і commit (читання → запис в одній транзакції, як у сервісах).
+Профілі (кожен на своїй копії БД):
+  * default — rollback journal, один рушій з налаштуваннями за
+    замовчуванням для читання і запису, транзакції DEFERRED;
+  * tuned — get_engine / get_write_engine: WAL і PRAGMA з database.py,
+    пул читачів і один писач з BEGIN IMMEDIATE.
+Звіт: операцій за секунду, p50/p99 для read і write, помилки
+("database is locked" тощо).
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def _read(session, user_id: int) -> None:
+    from sqlalchemy import func, select
+
+    import models
+
+    await session.execute(
+        select(models.Movie).join(models.likes, models.likes.c.movie_id == models.Movie.id)
+        .where(models.likes.c.user_id == user_id)
+        .order_by(models.likes.c.liked_at.desc()).limit(20)
+    )
+    await session.scalar(
+        select(func.count()).select_from(models.Friendship)
+        .where(models.Friendship.user_id == user_id, models.Friendship.is_accepted == True)
+    )
+
+
+async def _write(session, user_id: int, movie_id: int) -> None:
+    from sqlalchemy import delete, insert, select
+
+    import models
+
+    likes = models.likes
+    liked = await session.scalar(
+        select(likes.c.movie_id).where(likes.c.user_id == user_id, likes.c.movie_id == movie_id)
+    )
+    if liked is None:
+        await session.execute(insert(likes).values(user_id=user_id, movie_id=movie_id))
+    else:
+        await session.execute(delete(likes).where(likes.c.user_id == user_id, likes.c.movie_id == movie_id))
+    await session.commit()
+
+
+async def _workload(name: str, read_session, write_session, args, user_ids: list[int], movie_ids: list[int]) -> None:
+    timings: dict[str, list[float]] = {"read": [], "write": []}
+    errors: Counter[str] = Counter()
+    deadline = time.perf_counter() + args.duration
+
+    async def client(seed: int) -> None:
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            kind = "write" if rng.random() < args.write_ratio else "read"
+            user_id = rng.choice(user_ids)
+            started = time.perf_counter()
+            try:
+                if kind == "read":
+                    async with read_session() as session:
+                        await _read(session, user_id)
+                else:
+                    async with write_session() as session:
+                        await _write(session, user_id, rng.choice(movie_ids))
+            except Exception as exception:
+                # Перший рядок: "(sqlite3.OperationalError) database is locked"
+                errors[f"{kind}: {str(exception).splitlines()[0][:80]}"] += 1
+                continue
+            timings[kind].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(args.seed + number) for number in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    done = len(timings["read"]) + len(timings["write"])
+    print(f"{name:<8} {done / elapsed:8.1f} ops/s", end="")
+    for kind, values in timings.items():
+        print(f"   {kind} {len(values) / elapsed:7.1f}/s p50 {_percentile(values, 0.5) * 1000:7.1f} ms"
+              f" p99 {_percentile(values, 0.99) * 1000:7.1f} ms", end="")
+    print(f"   errors {sum(errors.values())}")
+    for message, count in errors.most_common(5):
+        print(f"           {count:6d}  {message}")
+
+
+async def run(args, tuned_path: str, default_path: str) -> None:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from database import dispose_engines, get_write_engine, new_session, new_write_session
+    from migrations import upgrade_schema
+
+    async with get_write_engine().begin() as conn:
+        await upgrade_schema(conn)
+    await dispose_engines()
+
+    # Та сама схема й дані, але в rollback journal — режим нової БД без PRAGMA
+    shutil.copyfile(tuned_path, default_path)
+    conn = sqlite3.connect(default_path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    movie_ids = [row[0] for row in conn.execute("SELECT id FROM movies")]
+    conn.close()
+
+    print(f"{args.concurrency} clients, {args.duration:.0f} s, write ratio {args.write_ratio}")
+    # Як database.py раніше: один рушій з налаштуваннями за замовчуванням
+    default_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{default_path}", connect_args={"check_same_thread": False},
+    )
+    default_sessions = async_sessionmaker(default_engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await _workload("default", default_sessions, default_sessions, args, user_ids, movie_ids)
+    finally:
+        await default_engine.dispose()
+    try:
+        await _workload("tuned", new_session, new_write_session, args, user_ids, movie_ids)
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Змішане читання/запис: профіль SQLite database.py проти типового")
+    parser.add_argument("db", help="БД з python -m benchmarks.seed (не змінюється, береться копія)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд на профіль")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="частка операцій запису")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="moviematch-sqlite-") as directory:
+        tuned_path = os.path.join(directory, "tuned.db")
+        shutil.copyfile(args.db, tuned_path)
+        # До першого get_settings — рушії створюються з цим URL
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tuned_path}"
+        asyncio.run(run(args, tuned_path, os.path.join(directory, "default.db")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Час старту: імпорт main і перша відповідь свіжого воркера.
+
+    python -m benchmarks.startup --runs 5 --top 15
+
+Кожен замір — окремий процес Python (кеш модулів не переживає запуск):
+  * import — `import main` без змінних оточення: імпорт не повинен
+    читати налаштування, створювати рушії чи пули;
+  * first request — від запуску `uvicorn main:app` до першої відповіді
+    2xx на --path (опитування кожні 10 мс); у цей час входять імпорт,
+    lifespan (upgrade_schema на порожній БД) і сам запит.
+--top показує найповільніші модулі з `python -X importtime`.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.run import ROOT, SECRET_KEY, _stop
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started)"
+)
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _clean_env() -> dict:
+    # Без налаштувань додатку: імпорт, що їх читає, впаде
+    return {name: value for name, value in os.environ.items()
+            if name not in ("SECRET_KEY", "TMDB_API_KEY", "DATABASE_URL")}
+
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=_clean_env(),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list[tuple[str, float]]:
+    """Модулі верхнього рівня (імпортовані напряму з main) за сумарним часом."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=_clean_env(),
+        capture_output=True, text=True, check=True,
+    ).stderr
+    cumulative: dict[str, float] = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            _self_us, cumulative_us, indent, name = match.groups()
+            # Один рівень відступу — модуль, імпортований верхнім рівнем
+            if len(indent) <= 3:
+                cumulative[name] = int(cumulative_us) / 1e6
+    return sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def measure_first_request(port: int, path: str, timeout: float = 60.0) -> float:
+    with tempfile.TemporaryDirectory(prefix="moviematch-startup-") as directory:
+        env = {
+            **_clean_env(),
+            "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(directory, 'startup.db')}",
+            "SECRET_KEY": SECRET_KEY,
+            "TMDB_API_KEY": "benchmark",
+        }
+        started = time.perf_counter()
+        process = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--log-level", "warning", "--no-access-log",
+        ], cwd=ROOT, env=env)
+        try:
+            url = f"http://127.0.0.1:{port}{path}"
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn завершився з кодом {process.returncode}")
+                try:
+                    if httpx.get(url, timeout=1.0).is_success:
+                        return time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.01)
+            raise RuntimeError(f"{url} не відповів за {timeout:.0f} с")
+        finally:
+            _stop(process)
+
+
+def _summary(values: list[float]) -> str:
+    return (f"median {statistics.median(values) * 1000:7.1f} ms   "
+            f"min {min(values) * 1000:7.1f} ms   max {max(values) * 1000:7.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Час імпорту й першого запиту MovieMatch")
+    parser.add_argument("--runs", type=int, default=5, help="замірів кожного виду")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--path", default="/openapi.json", help="перший запит (очікується 2xx)")
+    parser.add_argument("--top", type=int, default=0, help="показати N найповільніших імпортів")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    print(f"import main       {_summary(imports)}")
+    first = [measure_first_request(args.port, args.path) for _ in range(args.runs)]
+    print(f"first request     {_summary(first)}   ({args.path})")
+
+    if args.top:
+        print("\nНайповільніші імпорти (сумарно, -X importtime):")
+        for name, seconds in slowest_imports(args.top):
+            print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
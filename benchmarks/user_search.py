@@ -0,0 +1,144 @@
+"""Пошук юзерів (/users/search) на великій таблиці users.
+
+    python -m benchmarks.user_search search.db --users 1000000
+
+Створює БД з --users випадковими іменами (або бере існуючу з тією ж
+кількістю), прогріває кеш і міряє UserService.search для запитів різної
+довжини й частоти — медіана та максимум з --repeat повторів, перша
+сторінка і сторінка за курсором. Для порівняння — колишній повний
+перебір ILIKE '%q%'.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+
+SYLLABLES = ["an", "bo", "ka", "li", "mar", "ne", "ol", "pe", "ri", "sa", "to", "vi", "zu", "dra", "en", "ko"]
+
+# (опис, запит): короткі — префікс + входження, довгі — trigram індекс
+QUERIES = [
+    ("1 char", "k"),
+    ("2 chars, common", "an"),
+    ("2 chars, rare", "qx"),
+    ("3 chars, common", "mar"),
+    ("rare 4+ chars", "zudra"),
+    ("exact name", None),  # ім'я першого юзера
+]
+
+
+def random_name(rng: random.Random, user_id: int) -> str:
+    base = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+    return f"{base.capitalize()}{user_id}"
+
+
+def create_users(db_path: str, users: int, seed: int) -> None:
+    from benchmarks.seed import _create_schema
+
+    asyncio.run(_create_schema())
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    with conn:
+        names = (random_name(rng, user_id) for user_id in range(1, users + 1))
+        conn.executemany(
+            "INSERT INTO users (username, username_normalized, password_hash) VALUES (?, ?, 'x')",
+            ((name, name.casefold()) for name in names),
+        )
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+async def measure(query: str, limit: int, repeat: int) -> dict:
+    from database import new_session
+    from services.user_service import UserService
+
+    first, next_page = [], []
+    found = 0
+    for _ in range(repeat):
+        async with new_session() as session:
+            service = UserService(session)
+            started = time.perf_counter()
+            users, cursor = await service.search(query, limit)
+            first.append(time.perf_counter() - started)
+            found = len(users)
+            if cursor:
+                started = time.perf_counter()
+                await service.search(query, limit, cursor)
+                next_page.append(time.perf_counter() - started)
+    return {"found": found, "first": first, "next": next_page}
+
+
+async def measure_ilike(query: str, limit: int, repeat: int) -> list[float]:
+    from sqlalchemy import select
+
+    import models
+    from database import new_session
+
+    timings = []
+    for _ in range(repeat):
+        async with new_session() as session:
+            started = time.perf_counter()
+            await session.execute(
+                select(models.User).where(models.User.username.ilike(f"%{query}%")).limit(limit)
+            )
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _ms(values: list[float]) -> str:
+    if not values:
+        return "      —"
+    return f"{statistics.median(values) * 1000:7.2f}"
+
+
+async def run(args) -> None:
+    from sqlalchemy import func, select
+
+    import models
+    from database import dispose_engines, new_session
+
+    try:
+        async with new_session() as session:
+            first_name = (await session.execute(select(models.User.username).limit(1))).scalar_one()
+            total = (await session.execute(select(func.count()).select_from(models.User))).scalar_one()
+            # Прогрів: індекси імен і FTS у кеші сторінок
+            await session.execute(select(func.count(models.User.username_normalized)))
+        print(f"{total} users, limit {args.limit}, median of {args.repeat} (ms)")
+        print(f"{'query':<22}{'q':<14}{'found':>6}{'first':>9}{'cursor':>9}{'ILIKE':>9}")
+        for label, query in QUERIES:
+            query = query or first_name
+            result = await measure(query, args.limit, args.repeat)
+            ilike = await measure_ilike(query, args.limit, args.repeat) if args.ilike else []
+            print(f"{label:<22}{query:<14}{result['found']:>6}{_ms(result['first']):>9}"
+                  f"{_ms(result['next']):>9}{_ms(ilike):>9}")
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк пошуку юзерів")
+    parser.add_argument("db", help="SQLite БД; створюється, якщо немає")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-ilike", dest="ilike", action="store_false", help="без повного перебору ILIKE")
+    args = parser.parse_args()
+
+    # До першого get_settings — рушії створюються з цим URL
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{args.db}"
+    if not os.path.exists(args.db):
+        started = time.perf_counter()
+        create_users(args.db, args.users, args.seed)
+        print(f"Створено {args.users} юзерів за {time.perf_counter() - started:.1f} с")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """In-process LRU кеш з TTL на кожен запис та лічильниками hit/miss/eviction.
+
+    Після закінчення TTL запис ще stale_ttl секунд лежить у кеші як
+    "протухлий": get() його не повертає, а get_stale() — повертає.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[Any, float, float]] = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _entry(self, key: Hashable) -> tuple[Any, float, float] | None:
+        entry = self._data.get(key)
+        if entry is not None and entry[2] <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return None
+        return entry
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entry(key)
+        if entry is None or entry[1] <= time.monotonic():
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def get_stale(self, key: Hashable) -> Any | None:
+        """Повертає запис навіть якщо його TTL минув (але не stale-вікно)."""
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        self.stale_hits += 1
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: float, stale_ttl: float = 0.0) -> None:
+        now = time.monotonic()
+        self._data[key] = (value, now + ttl, now + ttl + stale_ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def peek(self, key: Hashable) -> Any | None:
+        """Живий запис без оновлення порядку LRU і лічильників."""
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def values(self) -> list[Any]:
+        return [entry[0] for entry in self._data.values()]
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteCacheTier:
+    """Дисковий рівень кешу (окремий SQLite файл), переживає перезапуск сервера.
+
+    Значення зберігаються як JSON. Всі операції блокуючі, тому
+    викликаються через asyncio.to_thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " stale_until REAL NOT NULL)"
+        )
+        # Прибираємо записи, що протухли поки сервер був вимкнений
+        self._conn.execute("DELETE FROM cache WHERE stale_until <= ?", (time.time(),))
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: str) -> tuple[Any, float, float] | None:
+        """Повертає (значення, секунд до кінця TTL, секунд до кінця stale-вікна) або None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, stale_until FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        # time.time(), а не monotonic — записи мають пережити перезапуск
+        now = time.time()
+        if row is None or row[2] <= now:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1] - now, row[2] - now
+
+    def _set(self, key: str, value: Any, ttl: float, stale_ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now + ttl + stale_ttl),
+            )
+
+    async def get(self, key: str) -> tuple[Any, float, float] | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Any, ttl: float, stale_ttl: float = 0.0) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl, stale_ttl)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """Двохрівневий кеш: LRU в пам'яті → (опційно) SQLite на диску.
+
+    Ключ — кортеж (endpoint, query, year, page). TTL задається окремо
+    для кожного endpoint; невідомі endpoint-и отримують default_ttl.
+    Після TTL запис ще stale_ttl секунд доступний через get_stale().
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttls: Optional[dict[str, float]] = None,
+        default_ttl: float = 300.0,
+        stale_ttl: float = 0.0,
+        disk_path: Optional[str] = None,
+    ):
+        self.memory = LRUCache(maxsize)
+        self.disk = SQLiteCacheTier(disk_path) if disk_path else None
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+
+    def ttl_for(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    @staticmethod
+    def _disk_key(key: tuple) -> str:
+        return json.dumps(key, ensure_ascii=False)
+
+    async def _promote(self, key: tuple) -> tuple[Any, bool] | None:
+        """Піднімає запис з диска в пам'ять на залишок його TTL.
+
+        Повертає (значення, чи ще свіже) або None.
+        """
+        if self.disk is None:
+            return None
+        found = await self.disk.get(self._disk_key(key))
+        if found is None:
+            return None
+        value, ttl_left, stale_left = found
+        ttl_left = max(ttl_left, 0.0)
+        self.memory.set(key, value, ttl_left, stale_left - ttl_left)
+        return value, ttl_left > 0
+
+    async def get(self, key: tuple) -> Any | None:
+        value = self.memory.get(key)
+        if value is None:
+            found = await self._promote(key)
+            if found is not None and found[1]:
+                value = found[0]
+        return value
+
+    async def get_stale(self, key: tuple) -> Any | None:
+        value = self.memory.get_stale(key)
+        if value is None:
+            found = await self._promote(key)
+            if found is not None:
+                value = found[0]
+        return value
+
+    async def set(self, key: tuple, value: Any) -> None:
+        ttl = self.ttl_for(key[0])
+        self.memory.set(key, value, ttl, self.stale_ttl)
+        if self.disk is not None:
+            await self.disk.set(self._disk_key(key), value, ttl, self.stale_ttl)
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+class SingleFlight:
+    """Дедуплікація однакових запитів, що виконуються одночасно.
+
+    Перший виклик з ключем запускає корутину, усі наступні з тим самим
+    ключем чекають на той самий результат (або ту саму помилку).
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _task: self._inflight.pop(key, None))
+        else:
+            self.followers += 1
+        # shield: скасування одного клієнта не скасовує спільний запит
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
@@ -0,0 +1,347 @@
+"""Локальний каталог фільмів (окремий SQLite файл) — дзеркало TMDB.
+
+Наповнюється з дампу (JSON масив, {"results": [...]} або NDJSON — один
+фільм на рядок) і сторінками, що приходять з TMDB. Відповідає на ті самі
+запити, що й TMDBClient.get_movies (popular / discover за роком / пошук
+за назвою), у тому ж форматі.
+
+Імпорт дампу:
+    python catalog.py import movies.ndjson [--path movie_catalog.db]
+"""
+import argparse
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
+
+from genres import genre_ids_from_mask, genre_mask
+
+PAGE_SIZE = 20      # як у TMDB
+MAX_PAGE = 500      # TMDB не віддає сторінки після 500
+IMPORT_BATCH = 5000
+SEARCH_SCAN_THRESHOLD = 2000  # збігів, після яких пошук іде індексом популярності
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS catalog_movies ("
+    " id INTEGER PRIMARY KEY,"
+    " title TEXT NOT NULL,"
+    " original_title TEXT,"
+    " original_language TEXT,"
+    " overview TEXT,"
+    " poster_path TEXT,"
+    " backdrop_path TEXT,"
+    " release_date TEXT,"
+    " year INTEGER,"
+    " vote_average REAL,"
+    " vote_count INTEGER,"
+    " popularity REAL NOT NULL DEFAULT 0,"
+    " genre_mask INTEGER NOT NULL DEFAULT 0,"
+    " updated_at REAL NOT NULL)",
+    # popular — за популярністю; discover — рік + популярність
+    "CREATE INDEX IF NOT EXISTS ix_catalog_popularity ON catalog_movies (popularity DESC, id)",
+    "CREATE INDEX IF NOT EXISTS ix_catalog_year_popularity ON catalog_movies (year, popularity DESC, id)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5("
+    "title, original_title, content='catalog_movies', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+]
+
+FTS_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS catalog_fts_ai AFTER INSERT ON catalog_movies BEGIN"
+    " INSERT INTO catalog_fts (rowid, title, original_title)"
+    " VALUES (new.id, new.title, new.original_title); END",
+    "CREATE TRIGGER IF NOT EXISTS catalog_fts_ad AFTER DELETE ON catalog_movies BEGIN"
+    " INSERT INTO catalog_fts (catalog_fts, rowid, title, original_title)"
+    " VALUES ('delete', old.id, old.title, old.original_title); END",
+    "CREATE TRIGGER IF NOT EXISTS catalog_fts_au AFTER UPDATE OF title, original_title ON catalog_movies BEGIN"
+    " INSERT INTO catalog_fts (catalog_fts, rowid, title, original_title)"
+    " VALUES ('delete', old.id, old.title, old.original_title);"
+    " INSERT INTO catalog_fts (rowid, title, original_title)"
+    " VALUES (new.id, new.title, new.original_title); END",
+]
+
+UPSERT = (
+    "INSERT INTO catalog_movies (id, title, original_title, original_language, overview,"
+    " poster_path, backdrop_path, release_date, year, vote_average, vote_count,"
+    " popularity, genre_mask, updated_at)"
+    " VALUES (:id, :title, :original_title, :original_language, :overview,"
+    " :poster_path, :backdrop_path, :release_date, :year, :vote_average, :vote_count,"
+    " :popularity, :genre_mask, :updated_at)"
+    " ON CONFLICT (id) DO UPDATE SET"
+    " title = excluded.title,"
+    " original_title = coalesce(excluded.original_title, original_title),"
+    " original_language = coalesce(excluded.original_language, original_language),"
+    " overview = coalesce(excluded.overview, overview),"
+    " poster_path = coalesce(excluded.poster_path, poster_path),"
+    " backdrop_path = coalesce(excluded.backdrop_path, backdrop_path),"
+    " release_date = coalesce(excluded.release_date, release_date),"
+    " year = coalesce(excluded.year, year),"
+    " vote_average = coalesce(excluded.vote_average, vote_average),"
+    " vote_count = coalesce(excluded.vote_count, vote_count),"
+    " popularity = excluded.popularity,"
+    " genre_mask = coalesce(nullif(excluded.genre_mask, 0), genre_mask),"
+    " updated_at = excluded.updated_at"
+)
+
+COLUMNS = (
+    "id, title, original_title, original_language, overview, poster_path,"
+    " backdrop_path, release_date, vote_average, vote_count, popularity, genre_mask"
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def _row_from_tmdb(movie: dict, now: float) -> Optional[dict]:
+    """Рядок каталогу з фільму у форматі TMDB; None — пропустити (немає назви, 18+)."""
+    title = movie.get("title") or movie.get("original_title")
+    if not movie.get("id") or not title or movie.get("adult"):
+        return None
+    release_date = movie.get("release_date") or None
+    year = int(release_date[:4]) if release_date and release_date[:4].isdigit() else None
+    return {
+        "id":                int(movie["id"]),
+        "title":             title,
+        "original_title":    movie.get("original_title"),
+        "original_language": movie.get("original_language"),
+        "overview":          movie.get("overview") or None,
+        "poster_path":       movie.get("poster_path"),
+        "backdrop_path":     movie.get("backdrop_path"),
+        "release_date":      release_date,
+        "year":              year,
+        "vote_average":      movie.get("vote_average"),
+        "vote_count":        movie.get("vote_count"),
+        "popularity":        movie.get("popularity") or 0.0,
+        "genre_mask":        genre_mask(movie.get("genre_ids")),
+        "updated_at":        now,
+    }
+
+
+def _movie_from_row(row: tuple) -> dict:
+    (movie_id, title, original_title, original_language, overview, poster_path,
+     backdrop_path, release_date, vote_average, vote_count, popularity, mask) = row
+    return {
+        "id":                movie_id,
+        "title":             title,
+        "original_title":    original_title,
+        "original_language": original_language,
+        "overview":          overview or "",
+        "poster_path":       poster_path,
+        "backdrop_path":     backdrop_path,
+        "release_date":      release_date or "",
+        "vote_average":      vote_average or 0.0,
+        "vote_count":        vote_count or 0,
+        "popularity":        popularity,
+        "genre_ids":         genre_ids_from_mask(mask),
+        "adult":             False,
+    }
+
+
+def _match_query(name: str) -> Optional[str]:
+    """FTS5 запит: кожне слово назви як префікс ("matr reloa" → "matr"* "reloa"*)."""
+    words = _WORD.findall(name)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def read_dump(path: str) -> Iterator[dict]:
+    """Фільми з дампу: JSON масив, об'єкт з "results" або NDJSON."""
+    with open(path, encoding="utf-8") as dump:
+        first_line = dump.readline()
+        try:
+            first = json.loads(first_line)
+        except ValueError:
+            first = None
+        # NDJSON — кожен рядок окремий фільм; інакше весь файл один JSON
+        if isinstance(first, dict) and "results" not in first:
+            yield first
+            for line in dump:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+        dump.seek(0)
+        data = json.load(dump)
+    yield from data["results"] if isinstance(data, dict) else data
+
+
+class MovieCatalog:
+    """Локальний каталог фільмів. Запити блокуючі й дуже короткі (по індексах),
+    тому виконуються в потоці через asyncio.to_thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA + FTS_TRIGGERS:
+            self._conn.execute(statement)
+        self._total: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ── Читання ──────────────────────────────────
+
+    def _count(self) -> int:
+        if self._total is None:
+            self._total = self._conn.execute("SELECT count(*) FROM catalog_movies").fetchone()[0]
+        return self._total
+
+    def _query(self, name: Optional[str], year: Optional[int], page: int) -> Optional[dict]:
+        if page < 1 or page > MAX_PAGE:
+            return None
+        offset = (page - 1) * PAGE_SIZE
+
+        with self._lock:
+            if not self._count():
+                return None
+
+            hint = ""
+            if name:
+                match = _match_query(name)
+                if match is None:
+                    return None
+                # FTS рахує збіги без звернення до таблиці
+                matches = self._conn.execute(
+                    "SELECT count(*) FROM catalog_fts WHERE catalog_fts MATCH ?", (match,)
+                ).fetchone()[0]
+                if not matches:
+                    return None
+                where = "id IN (SELECT rowid FROM catalog_fts WHERE catalog_fts MATCH ?)"
+                params: list[Any] = [match]
+                if year:
+                    where += " AND year = ?"
+                    params.append(year)
+                # Мало збігів — беремо їх за rowid і сортуємо. Багато — йдемо
+                # індексом популярності до першої сторінки, перевіряючи збіг
+                # (статистики для FTS у планувальника немає, тож обираємо самі)
+                if matches > SEARCH_SCAN_THRESHOLD:
+                    hint = " INDEXED BY " + ("ix_catalog_year_popularity" if year else "ix_catalog_popularity")
+            elif year:
+                where, params = "year = ?", [year]
+            else:
+                where, params = "1", []  # popular — весь каталог
+
+            rows = self._conn.execute(
+                f"SELECT {COLUMNS} FROM catalog_movies{hint} WHERE {where}"
+                " ORDER BY popularity DESC, id LIMIT ? OFFSET ?",
+                (*params, PAGE_SIZE, offset),
+            ).fetchall()
+            if not rows:
+                return None
+
+            if not name and not year:
+                total = self._count()
+            elif name and not year:
+                total = matches
+            elif len(rows) < PAGE_SIZE:
+                total = offset + len(rows)
+            else:
+                total = self._conn.execute(
+                    f"SELECT count(*) FROM catalog_movies{hint} WHERE {where}", params
+                ).fetchone()[0]
+
+        return {
+            "page": page,
+            "results": [_movie_from_row(row) for row in rows],
+            "total_results": total,
+            "total_pages": min(-(-total // PAGE_SIZE), MAX_PAGE),
+        }
+
+    async def get_movies(self, name: Optional[str], year: Optional[int], page: int) -> Optional[dict]:
+        """Сторінка у форматі TMDB або None, якщо каталог не може відповісти
+        (порожній, нічого не знайдено, сторінка за межами) — тоді питаємо TMDB."""
+        data = await asyncio.to_thread(self._query, name, year, page)
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    # ── Запис ────────────────────────────────────
+
+    def _upsert(self, movies: Iterable[dict]) -> int:
+        now = time.time()
+        rows = [row for row in (_row_from_tmdb(movie, now) for movie in movies) if row]
+        if rows:
+            with self._lock:
+                with self._transaction():
+                    self._conn.executemany(UPSERT, rows)
+                self._total = None
+        return len(rows)
+
+    async def upsert(self, movies: list[dict]) -> int:
+        """Оновлює каталог фільмами, що прийшли з TMDB."""
+        return await asyncio.to_thread(self._upsert, movies)
+
+    def import_movies(self, movies: Iterable[dict]) -> int:
+        """Масовий імпорт: FTS тригери вимикаються, індекс перебудовується
+        один раз у кінці. Все в одній транзакції."""
+        imported = 0
+        now = time.time()
+        batch: list[dict] = []
+        with self._lock, self._transaction():
+            for statement in ("catalog_fts_ai", "catalog_fts_ad", "catalog_fts_au"):
+                self._conn.execute(f"DROP TRIGGER IF EXISTS {statement}")
+            for movie in movies:
+                row = _row_from_tmdb(movie, now)
+                if row is None:
+                    continue
+                batch.append(row)
+                if len(batch) >= IMPORT_BATCH:
+                    self._conn.executemany(UPSERT, batch)
+                    imported += len(batch)
+                    batch.clear()
+            if batch:
+                self._conn.executemany(UPSERT, batch)
+                imported += len(batch)
+            self._conn.execute("INSERT INTO catalog_fts (catalog_fts) VALUES ('rebuild')")
+            for statement in FTS_TRIGGERS:
+                self._conn.execute(statement)
+            self._total = None
+        return imported
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        return {"movies": self._total, "hits": self.hits, "misses": self.misses}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальний каталог фільмів")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="імпорт дампу TMDB (JSON / NDJSON)")
+    import_parser.add_argument("dump")
+    import_parser.add_argument("--path", default=None, help="файл каталогу (за замовчуванням CATALOG_PATH)")
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        from config import get_settings
+        path = get_settings().catalog_path or "movie_catalog.db"
+
+    catalog = MovieCatalog(path)
+    started = time.perf_counter()
+    imported = catalog.import_movies(read_dump(args.dump))
+    catalog.close()
+    print(f"Імпортовано {imported} фільмів у {path} за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
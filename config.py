@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -11,8 +13,73 @@ class Settings(BaseSettings):
     secret_key: SecretStr
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    password_hash_workers: int = 4      # потоків для argon2 (одночасних хешувань)
+    auth_cache_size: int = 10000        # токенів / юзерів у кеші воркера
+    auth_cache_ttl: float = 30.0        # секунд; 0 — кеш вимкнено
+
+    # База даних (SQLite)
+    database_url: str = "sqlite+aiosqlite:///./blog.db"
+    db_pool_size: int = 5               # з'єднань-читачів; писач завжди один
+    db_pool_timeout: float = 30.0       # секунд чекаємо на вільне з'єднання
+    sqlite_busy_timeout_ms: int = 5000  # скільки чекаємо на лок файлу
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size_kib: int = 65536  # кеш сторінок на з'єднання
+    sqlite_mmap_size: int = 268435456   # 256 MiB; 0 — без mmap
 
     tmdb_api_key: SecretStr
+    tmdb_base_url: str = "https://api.themoviedb.org/3"
+    tmdb_timeout: float = 5.0           # секунд на один запит до TMDB
+    tmdb_max_connections: int = 20      # розмір пулу з'єднань
+    tmdb_max_keepalive: int = 10        # скільки з'єднань тримаємо відкритими
+    tmdb_max_concurrency: int = 10      # одночасних запитів до TMDB
+
+    # Кеш відповідей TMDB (0 — вимкнено)
+    tmdb_cache_size: int = 2048         # сторінок у LRU в пам'яті
+    tmdb_cache_path: str | None = None  # напр. "tmdb_cache.db" — дисковий рівень
+    tmdb_cache_ttl_popular: float = 600.0
+    tmdb_cache_ttl_discover: float = 3600.0
+    tmdb_cache_ttl_search: float = 300.0
+    tmdb_cache_stale_ttl: float = 86400.0   # скільки ще віддаємо протухлі сторінки
+
+    # Локальний каталог фільмів (python catalog.py import dump.ndjson)
+    catalog_path: str | None = None     # напр. "movie_catalog.db"; None — лише TMDB
+    catalog_refresh_ttl: float = 3600.0 # як часто сторінку каталогу оновлюємо з TMDB
+
+    # Поведінка при збоях TMDB
+    tmdb_latency_budget: float = 2.0        # макс. очікування TMDB при промаху кешу
+    tmdb_breaker_failure_threshold: int = 5 # помилок підряд до відкриття запобіжника
+    tmdb_breaker_recovery_timeout: float = 30.0
+
+    # Рекомендації /movies/recommended (python recommender.py build — повний перерахунок)
+    recommend_top_k: int = 50               # сусідів на фільм у movie_neighbors
+    recommend_min_support: int = 1          # мін. юзерів, що лайкнули обидва фільми
+    recommend_seed_likes: int = 50          # скільки останніх лайків юзера враховуємо
+    recommend_refresh_interval: float = 30.0  # секунд між фоновими оновленнями
+    recommend_refresh_batch: int = 200      # фільмів за одне оновлення
+
+    # Індекс лайків у пам'яті воркера (like_index.py)
+    like_index_size: int = 10000        # юзерів у LRU
+    like_index_ttl: float = 30.0        # секунд; лайки з інших воркерів видно після TTL
+
+    # Метрики GET /metrics
+    metrics_query_budget: int = 10      # SQL запитів на HTTP запит; більше — попередження (0 — вимкнено)
+
+    # Профілювання окремих запитів (profiler.py); за замовчуванням вимкнено
+    profile_secret: SecretStr | None = None  # ключ підпису заголовка X-Profile
+    profile_sample_rate: float = 0.0    # частка всіх запитів, що профілюються
+    profile_interval: float = 0.002     # секунд між семплами стеку
+    profile_dir: str = "profiles"       # куди пишуться .collapsed файли
+    profile_max_files: int = 200        # старіші видаляються
+
+    # Колода свайпів /movies/deck
+    deck_buffer_size: int = 60          # скільки фільмів тримаємо наперед
+    deck_low_watermark: int = 20        # нижче — дозаповнюємо у фоні
+    deck_max_users: int = 1000          # буферів у пам'яті процесу
+    deck_max_page: int = 100            # з яких сторінок popular беремо фільми
+
 
+@lru_cache
+def get_settings() -> Settings:
+    """Налаштування читаються з .env при першому зверненні, а не при імпорті."""
+    return Settings()  # type: ignore[call-arg] # Loaded from .env file
 
-settings = Settings()  # type: ignore[call-arg] # Loaded from .env file
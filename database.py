@@ -1,18 +1,94 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
-SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./blog.db"
+from config import get_settings
 
-engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
 
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+def _apply_pragmas(dbapi_connection) -> None:
+    """Налаштування SQLite, що діють у межах одного з'єднання."""
+    settings = get_settings()
+    cursor = dbapi_connection.cursor()
+    # WAL: читачі не блокують писача і навпаки
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # У WAL режимі NORMAL не втрачає цілісність, лише останні коміти при збої ОС
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA cache_size={-settings.sqlite_cache_size_kib}")
+    cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+    # Замість миттєвого "database is locked" — чекаємо на лок
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _create_engine(pool_size: int) -> AsyncEngine:
+    settings = get_settings()
+    new_engine = create_async_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=settings.db_pool_timeout,
+    )
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, _connection_record):
+        _apply_pragmas(dbapi_connection)
+
+    return new_engine
+
+
+def _disable_implicit_begin(dbapi_connection, _connection_record):
+    # Транзакціями керуємо самі (див. _begin_immediate)
+    dbapi_connection.isolation_level = None
+
+
+def _begin_immediate(conn):
+    # Лок на запис береться на початку транзакції: без BEGIN IMMEDIATE
+    # читання → запис у WAL може впасти з SQLITE_BUSY, оминаючи busy_timeout
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+# Рушії й фабрики сесій створюються при першому зверненні, а не при
+# імпорті: налаштування читаються тоді ж (див. config.get_settings)
+_engine: AsyncEngine | None = None
+_write_engine: AsyncEngine | None = None
+_session_factory: async_sessionmaker[AsyncSession] | None = None
+_write_session_factory: async_sessionmaker[AsyncSession] | None = None
+
+
+def get_engine() -> AsyncEngine:
+    """Читачі: пул з'єднань, у WAL працюють паралельно."""
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(get_settings().db_pool_size)
+    return _engine
+
+
+def get_write_engine() -> AsyncEngine:
+    """Писач: одне з'єднання — запити на запис стають у чергу пулу,
+    а не змагаються за лок файлу."""
+    global _write_engine
+    if _write_engine is None:
+        _write_engine = _create_engine(1)
+        event.listen(_write_engine.sync_engine, "connect", _disable_implicit_begin)
+        event.listen(_write_engine.sync_engine, "begin", _begin_immediate)
+    return _write_engine
+
+
+def new_session() -> AsyncSession:
+    """Сесія читача: async with new_session() as session."""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _session_factory()
+
+
+def new_write_session() -> AsyncSession:
+    global _write_session_factory
+    if _write_session_factory is None:
+        _write_session_factory = async_sessionmaker(get_write_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _write_session_factory()
 
 
 class Base(DeclarativeBase):
@@ -20,5 +96,18 @@ class Base(DeclarativeBase):
 
 
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async with new_session() as session:
         yield session
+
+
+async def get_write_db():
+    """Сесія для ендпоінтів, що змінюють дані (серіалізований писач)."""
+    async with new_write_session() as session:
+        yield session
+
+
+async def dispose_engines() -> None:
+    # Лише створені рушії; після dispose вони відкривають з'єднання знову
+    for created in (_engine, _write_engine):
+        if created is not None:
+            await created.dispose()
@@ -0,0 +1,46 @@
+from typing import Iterable, Optional
+
+# Жанри TMDB (id, назва). Позиція в списку — номер біта в Movie.genre_mask,
+# тому порядок не змінюємо: нові жанри лише дописуємо в кінець.
+GENRES: list[tuple[int, str]] = [
+    (28, "Action"),
+    (12, "Abenteuer"),
+    (16, "Animation"),
+    (35, "Komödie"),
+    (80, "Krimi"),
+    (99, "Dokumentarfilm"),
+    (18, "Drama"),
+    (10751, "Familie"),
+    (14, "Fantasy"),
+    (36, "Historie"),
+    (27, "Horror"),
+    (10402, "Musik"),
+    (9648, "Mystery"),
+    (10749, "Liebesfilm"),
+    (878, "Science Fiction"),
+    (10770, "TV-Film"),
+    (53, "Thriller"),
+    (10752, "Kriegsfilm"),
+    (37, "Western"),
+]
+
+GENRE_NAMES: dict[int, str] = dict(GENRES)
+GENRE_BITS: dict[int, int] = {genre_id: 1 << bit for bit, (genre_id, _) in enumerate(GENRES)}
+
+
+def genre_mask(genre_ids: Optional[Iterable[int]]) -> int:
+    """Бітова маска жанрів; невідомі id пропускаються."""
+    mask = 0
+    for genre_id in genre_ids or ():
+        mask |= GENRE_BITS.get(genre_id, 0)
+    return mask
+
+
+def genre_ids_from_mask(mask: int) -> list[int]:
+    return [genre_id for genre_id, bit in GENRE_BITS.items() if mask & bit]
+
+
+def genre_names(genre_ids: Optional[Iterable[int]]) -> Optional[list[str]]:
+    """Назви жанрів у порядку genre_ids (TMDB віддає головний жанр першим)."""
+    names = [GENRE_NAMES[genre_id] for genre_id in genre_ids or () if genre_id in GENRE_NAMES]
+    return names or None
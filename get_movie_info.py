@@ -1,150 +1,276 @@
+import asyncio
+import time
 from typing import Optional, Dict, Any
 
-import requests
-from requests.exceptions import RequestException
+import httpx
 
-from config import settings
+import metrics
+from cache import LRUCache, SingleFlight, TieredCache
+from catalog import MovieCatalog
+from circuit_breaker import CircuitBreaker
+from config import get_settings
+from genres import GENRES, genre_names
 
 class TMDBClient:
-    GENERS_DICT = {
-        "genres": [
-            {
-            "id": 28,
-            "name": "Action"
-            },
-            {
-            "id": 12,
-            "name": "Abenteuer"
-            },
-            {
-            "id": 16,
-            "name": "Animation"
-            },
-            {
-            "id": 35,
-            "name": "Komödie"
-            },
-            {
-            "id": 80,
-            "name": "Krimi"
-            },
-            {
-            "id": 99,
-            "name": "Dokumentarfilm"
-            },
-            {
-            "id": 18,
-            "name": "Drama"
-            },
-            {
-            "id": 10751,
-            "name": "Familie"
-            },
-            {
-            "id": 14,
-            "name": "Fantasy"
-            },
-            {
-            "id": 36,
-            "name": "Historie"
-            },
-            {
-            "id": 27,
-            "name": "Horror"
-            },
-            {
-            "id": 10402,
-            "name": "Musik"
-            },
-            {
-            "id": 9648,
-            "name": "Mystery"
-            },
-            {
-            "id": 10749,
-            "name": "Liebesfilm"
-            },
-            {
-            "id": 878,
-            "name": "Science Fiction"
-            },
-            {
-            "id": 10770,
-            "name": "TV-Film"
-            },
-            {
-            "id": 53,
-            "name": "Thriller"
-            },
-            {
-            "id": 10752,
-            "name": "Kriegsfilm"
-            },
-            {
-            "id": 37,
-            "name": "Western"
-            }
-        ]
-    }
+    # Сумісність зі старим форматом; джерело — genres.GENRES
+    GENERS_DICT = {"genres": [{"id": genre_id, "name": name} for genre_id, name in GENRES]}
 
     BASE_URL = "https://api.themoviedb.org/3"
 
-    def __init__(self, api_key: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = BASE_URL,
+        timeout: float = 5.0,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        max_concurrency: int = 10,
+        cache: Optional[TieredCache] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        latency_budget: float = 2.0,
+        catalog: Optional[MovieCatalog] = None,
+        catalog_refresh_ttl: float = 3600.0,
+    ):
 
         self.__api_key = api_key
         if not self.__api_key:
             raise ValueError("API Key is missing! Set TMDB_API_KEY environment variable.")
 
-        self.session = requests.Session()
-        self.session.params = {'api_key': self.__api_key}
+        self.base_url = base_url.rstrip("/")
+
+        # Один AsyncClient на весь процес: keep-alive пул з'єднань замість
+        # нового TCP/TLS рукостискання на кожен запит
+        self.session = httpx.AsyncClient(
+            params={'api_key': self.__api_key},
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+            ),
+        )
+        # Обмежує кількість одночасних запитів до TMDB, решта чекає в черзі
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.cache = cache
+        self._single_flight = SingleFlight()
+        self.breaker = breaker or CircuitBreaker()
+        # Скільки максимум чекаємо на TMDB при промаху кешу
+        self.latency_budget = latency_budget
+        self._background: set[asyncio.Task] = set()
+        # Локальний каталог відповідає першим; TMDB лише оновлює його
+        # (не частіше ніж раз на catalog_refresh_ttl для кожного запиту)
+        self.catalog = catalog
+        self.catalog_refresh_ttl = catalog_refresh_ttl
+        self._catalog_refreshed = LRUCache(maxsize=10000)
 
-    def get_movies(self, name: Optional[str] = None, year: Optional[int] = None, page: int = 1) -> Dict[str, Any]:
+    @staticmethod
+    def _build_request(name: Optional[str], year: Optional[int], page: int) -> tuple[str, str, dict]:
+        """Повертає (назва endpoint-а, шлях, параметри) для запиту до TMDB."""
         if name:
-            endpoint = f"{self.BASE_URL}/search/movie"
-            params = {'query': name, 'year': year}
+            return "search", "/search/movie", {'query': name, 'year': year, 'page': page}
 
-        elif year:
-            endpoint = f"{self.BASE_URL}/discover/movie"
-            params = {
+        if year:
+            return "discover", "/discover/movie", {
                 'primary_release_year': year,
-                'sort_by': 'popularity.desc'
+                'sort_by': 'popularity.desc',
+                'page': page,
             }
 
-        else:
-            endpoint = f"{self.BASE_URL}/movie/popular"
-            params = {}
+        return "popular", "/movie/popular", {'page': page}
+
+    @classmethod
+    def cache_key(cls, name: Optional[str], year: Optional[int], page: int) -> tuple:
+        """Нормалізований ключ (endpoint, query, year, page)."""
+        query = name.strip().lower() if name else None
+        endpoint, _, _ = cls._build_request(query, year, page)
+        return endpoint, query, year, page
+
+    async def get_movies(self, name: Optional[str] = None, year: Optional[int] = None, page: int = 1) -> Dict[str, Any]:
+        name = name.strip() if name else None
+        key = self.cache_key(name, year, page)
+
+        if self.catalog is not None:
+            local = await self.catalog.get_movies(name, year, page)
+            if local is not None:
+                self._refresh_catalog(key, name, year, page)
+                return self._add_display_fields(local)
+
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+            # stale-while-revalidate: віддаємо протухлу копію одразу,
+            # а оновлюємо у фоні (якщо запобіжник дозволяє)
+            stale = await self.cache.get_stale(key)
+            if stale is not None:
+                if self.breaker.allow_request():
+                    self._refresh_in_background(key, name, year, page)
+                return {**stale, "stale": True}
+
+        if not self.breaker.allow_request():
+            # TMDB лежить — не чекаємо таймаут, відповідаємо одразу
+            return {"error": "TMDB is temporarily unavailable", "results": []}
 
-        params['page'] = page
+        # Однакові одночасні запити чекають на один запит до TMDB
         try:
-            clean_params = {k: v for k, v in params.items() if v is not None}
-            response = self.session.get(endpoint, params=clean_params)
-            response.raise_for_status()
+            return await asyncio.wait_for(
+                self._single_flight.do(key, lambda: self._load(key, name, year, page)),
+                timeout=self.latency_budget,
+            )
+        except asyncio.TimeoutError:
+            # Сам запит продовжується (shield у SingleFlight) і покладе
+            # результат у кеш для наступних клієнтів
+            return {"error": "TMDB response took too long", "results": []}
 
-            data = response.json()
+    def _refresh_in_background(self, key: tuple, name: Optional[str], year: Optional[int], page: int) -> None:
+        task = asyncio.ensure_future(
+            self._single_flight.do(key, lambda: self._load(key, name, year, page))
+        )
+        # Тримаємо посилання, щоб задачу не прибрав GC до завершення
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _refresh_catalog(self, key: tuple, name: Optional[str], year: Optional[int], page: int) -> None:
+        if self._catalog_refreshed.get(key) is not None or not self.breaker.allow_request():
+            return
+        self._catalog_refreshed.set(key, True, self.catalog_refresh_ttl)
+        self._refresh_in_background(key, name, year, page)
 
-            for movie in data.get("results", []):
+    async def _load(self, key: tuple, name: Optional[str], year: Optional[int], page: int) -> Dict[str, Any]:
+        data = await self._fetch(name, year, page)
+
+        # Помилки не кешуємо — наступний запит спробує ще раз
+        if "error" not in data:
+            if self.cache is not None:
+                await self.cache.set(key, data)
+            if self.catalog is not None:
+                await self.catalog.upsert(data.get("results", []))
+        return data
+
+    async def _fetch(self, name: Optional[str], year: Optional[int], page: int) -> Dict[str, Any]:
+        endpoint, path, params = self._build_request(name, year, page)
+        try:
+            clean_params = {k: v for k, v in params.items() if v is not None}
+            async with self._semaphore:
+                # Час самого запиту, без очікування в черзі семафора
+                outcome = "error"
+                started = time.perf_counter()
+                try:
+                    response = await self.session.get(f"{self.base_url}{path}", params=clean_params)
+                    outcome = str(response.status_code)
+                finally:
+                    metrics.TMDB_SECONDS.observe((endpoint, outcome), time.perf_counter() - started)
 
-                poster = movie.get("poster_path")
-                movie["poster_url"] = (
-                    f"https://image.tmdb.org/t/p/w500{poster}" if poster else None
-                )
+            # 4xx — помилка запиту, а не TMDB, тому запобіжник не рахує її
+            if response.status_code >= 500 or response.status_code == 429:
+                self.breaker.record_failure()
+            elif response.is_error:
+                self.breaker.record_success()
+            response.raise_for_status()
+            data = response.json()
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+            self.breaker.record_success()
 
-                movie_genres= movie['genre_ids']
-                movie['genres_str'] = self.convert_gener_id_to_gener_name(movie_genres)
-            return data
+        except httpx.HTTPStatusError as e:
+            print(f"Помилка при запиті до TMDB: {e}")
+            return {"error": str(e), "results": []}
 
-        except RequestException as e:
+        except httpx.HTTPError as e:
+            # Таймаут / обрив з'єднання
+            self.breaker.record_failure()
             print(f"Помилка при запиті до TMDB: {e}")
             return {"error": str(e), "results": []}
 
+        except ValueError as e:
+            # 200, але тіло не JSON (проксі, сторінка помилки) — TMDB несправний
+            self.breaker.record_failure()
+            print(f"Некоректна відповідь TMDB: {e}")
+            return {"error": f"Invalid TMDB response: {e}", "results": []}
+
+        return self._add_display_fields(data)
+
     @classmethod
-    def convert_gener_id_to_gener_name(cls, genre_ids: list[int]) -> str | None:
-        result = []
-        for genre in cls.GENERS_DICT["genres"]:
-            if genre['id'] in genre_ids:
-                result.append(genre['name'])
-        if result:
-            return result
-        return None
-
-client = TMDBClient(api_key = settings.tmdb_api_key.get_secret_value())
+    def _add_display_fields(cls, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Додає до карток poster_url і genres_str (для фронтенду)."""
+        for movie in data.get("results", []):
+
+            poster = movie.get("poster_path")
+            movie["poster_url"] = (
+                f"https://image.tmdb.org/t/p/w500{poster}" if poster else None
+            )
+
+            movie_genres= movie.get('genre_ids', [])
+            movie['genres_str'] = cls.convert_gener_id_to_gener_name(movie_genres)
+        return data
+
+    def stats(self) -> dict:
+        """Лічильники кешу та дедуплікації запитів."""
+        return {
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "single_flight": self._single_flight.stats(),
+            "circuit_breaker": self.breaker.stats(),
+            "catalog": self.catalog.stats() if self.catalog is not None else None,
+        }
+
+    async def aclose(self) -> None:
+        """Закриває пул з'єднань (викликається при зупинці додатку)."""
+        for task in list(self._background):
+            task.cancel()
+        await self.session.aclose()
+        if self.cache is not None:
+            self.cache.close()
+        if self.catalog is not None:
+            self.catalog.close()
+
+    @staticmethod
+    def convert_gener_id_to_gener_name(genre_ids: list[int]) -> list[str] | None:
+        # Пошук у словнику замість перебору всіх жанрів для кожного фільму
+        return genre_names(genre_ids)
+
+_client: Optional[TMDBClient] = None
+
+
+def _create_client() -> TMDBClient:
+    settings = get_settings()
+    return TMDBClient(
+        api_key         = settings.tmdb_api_key.get_secret_value(),
+        base_url        = settings.tmdb_base_url,
+        timeout         = settings.tmdb_timeout,
+        max_connections = settings.tmdb_max_connections,
+        max_keepalive   = settings.tmdb_max_keepalive,
+        max_concurrency = settings.tmdb_max_concurrency,
+        cache           = TieredCache(
+            maxsize     = settings.tmdb_cache_size,
+            ttls        = {
+                "popular":  settings.tmdb_cache_ttl_popular,
+                "discover": settings.tmdb_cache_ttl_discover,
+                "search":   settings.tmdb_cache_ttl_search,
+            },
+            stale_ttl   = settings.tmdb_cache_stale_ttl,
+            disk_path   = settings.tmdb_cache_path,
+        ) if settings.tmdb_cache_size > 0 else None,
+        breaker         = CircuitBreaker(
+            failure_threshold = settings.tmdb_breaker_failure_threshold,
+            recovery_timeout  = settings.tmdb_breaker_recovery_timeout,
+        ),
+        latency_budget  = settings.tmdb_latency_budget,
+        catalog         = MovieCatalog(settings.catalog_path) if settings.catalog_path else None,
+        catalog_refresh_ttl = settings.catalog_refresh_ttl,
+    )
+
+
+def get_client() -> TMDBClient:
+    """TMDB клієнт процесу. Створюється при першому запиті, а не при імпорті:
+    пул з'єднань, SSL контекст і дисковий кеш не гальмують старт воркера."""
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
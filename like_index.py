@@ -0,0 +1,193 @@
+"""Індекс лайків у пам'яті воркера: для кожного юзера — відсортований
+array('i') id фільмів (4 байти на лайк замість ~60 у set чи ORM об'єктах).
+
+Відповідає на "чи лайкнув юзер фільм", "спільні фільми двох юзерів" і
+"скільки лайків" без SQLite. Юзер завантажується при першому зверненні
+одним запитом по PK likes (рядки вже впорядковані за movie_id), далі
+масив оновлюється на місці після кожного commit лайків у цьому воркері.
+Лайки з інших воркерів стають видимими після TTL запису (як у UserCache).
+
+Викликач, що вже тримає сесію (db), передає її: завантаження йде тим
+самим з'єднанням. Окреме з'єднання з пулу під час запиту, що вже має
+своє, — взаємне блокування, щойно одночасних запитів більше, ніж
+DB_POOL_SIZE. Така сесія може читати зі знімка, старшого за лайки, вже
+записані цим воркером; тоді результат повертається, але не кешується.
+"""
+from array import array
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import Iterable
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+from cache import LRUCache
+from config import get_settings
+from database import get_engine
+
+
+# Лічильник змін лайків у воркері; сесія запам'ятовує його на початку
+# транзакції, щоб знати, чи новіші записи їй видно. Слухач один на модуль
+# (на всі сесії процесу), а не на кожен екземпляр LikeIndex
+_VERSION_KEY = "like_index_version"
+_changes = 0
+
+
+def _transaction_started(session, transaction, connection) -> None:
+    session.info[_VERSION_KEY] = _changes
+
+
+event.listen(Session, "after_begin", _transaction_started)
+
+
+def contains(movie_ids: array, movie_id: int) -> bool:
+    position = bisect_left(movie_ids, movie_id)
+    return position < len(movie_ids) and movie_ids[position] == movie_id
+
+
+def intersect(first: array, second: array) -> list[int]:
+    """Перетин двох відсортованих масивів, відсортований."""
+    small, big = (first, second) if len(first) <= len(second) else (second, first)
+    # Малий проти дуже великого — бінарний пошук, інакше — set у C
+    if len(small) * 16 < len(big):
+        return [movie_id for movie_id in small if contains(big, movie_id)]
+    return sorted(set(small).intersection(big))
+
+
+class LikeIndex:
+    """LRU юзерів → відсортовані масиви лайкнутих фільмів.
+
+    Масиви з get_many() — живі записи кешу: їх не можна тримати через
+    await, бо запис лайку змінює їх на місці.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self.users = LRUCache(maxsize)
+        # Завантаження в процесі: якщо під час нього юзер лайкнув щось,
+        # результат запиту вже застарів і в кеш не кладеться
+        self._loading: dict[int, int] = {}
+        self._raced: set[int] = set()
+        self.loads = 0
+
+    async def get_many(self, user_ids: Iterable[int], db: AsyncSession | None = None) -> dict[int, array]:
+        found: dict[int, array] = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            movie_ids = self.users.get(user_id)
+            if movie_ids is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = movie_ids
+        if missing:
+            found.update(await self._load(missing, db))
+        return found
+
+    async def get(self, user_id: int, db: AsyncSession | None = None) -> array:
+        return (await self.get_many([user_id], db))[user_id]
+
+    async def _load(self, user_ids: list[int], db: AsyncSession | None) -> dict[int, array]:
+        for user_id in user_ids:
+            self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        loaded = {user_id: array("i") for user_id in user_ids}
+        # Діапазони PK (user_id, movie_id) — вже в порядку movie_id
+        query = (
+            select(models.likes.c.user_id, models.likes.c.movie_id)
+            .where(models.likes.c.user_id.in_(user_ids))
+            .order_by(models.likes.c.user_id, models.likes.c.movie_id)
+        )
+        # Знімок транзакції сесії почався раніше — записи після нього
+        # могли не потрапити в результат, такий результат не кешуємо
+        if db is not None and db.in_transaction():
+            fresh = db.info.get(_VERSION_KEY) == _changes
+        else:
+            fresh = True
+        try:
+            if db is not None:
+                rows = (await db.execute(query)).all()
+            else:
+                async with get_engine().connect() as conn:
+                    rows = (await conn.execute(query)).all()
+            for user_id, movie_id in rows:
+                loaded[user_id].append(movie_id)
+        finally:
+            raced = self._raced.intersection(user_ids)
+            for user_id in user_ids:
+                self._loading[user_id] -= 1
+                if not self._loading[user_id]:
+                    del self._loading[user_id]
+                    self._raced.discard(user_id)
+
+        for user_id, movie_ids in loaded.items():
+            if fresh and user_id not in raced:
+                self.users.set(user_id, movie_ids, self.ttl)
+        self.loads += 1
+        return loaded
+
+    # ── запити ──────────────────────────────────────
+    async def has_liked(self, user_id: int, movie_id: int, db: AsyncSession | None = None) -> bool:
+        return contains(await self.get(user_id, db), movie_id)
+
+    async def liked_among(self, user_id: int, movie_ids: Iterable[int], db: AsyncSession | None = None) -> set[int]:
+        """Які з movie_ids юзер вже лайкнув."""
+        liked = await self.get(user_id, db)
+        return {movie_id for movie_id in movie_ids if contains(liked, movie_id)}
+
+    async def common(self, user_id: int, other_id: int, db: AsyncSession | None = None) -> list[int]:
+        """Спільні лайки двох юзерів, за зростанням id."""
+        likes = await self.get_many([user_id, other_id], db)
+        return intersect(likes[user_id], likes[other_id])
+
+    async def count(self, user_id: int, db: AsyncSession | None = None) -> int:
+        return len(await self.get(user_id, db))
+
+    async def counts(self, user_ids: Iterable[int], db: AsyncSession | None = None) -> dict[int, int]:
+        """Кількість лайків кількох юзерів; відсутні в кеші — одним запитом."""
+        return {user_id: len(movie_ids) for user_id, movie_ids in (await self.get_many(user_ids, db)).items()}
+
+    # ── синхронізація із записами (після commit) ────
+    def added(self, user_id: int, movie_ids: Iterable[int]) -> None:
+        self._changed(user_id)
+        liked = self.users.peek(user_id)
+        if liked is not None:
+            for movie_id in movie_ids:
+                if not contains(liked, movie_id):
+                    insort(liked, movie_id)
+
+    def removed(self, user_id: int, movie_ids: Iterable[int]) -> None:
+        self._changed(user_id)
+        liked = self.users.peek(user_id)
+        if liked is not None:
+            for movie_id in movie_ids:
+                position = bisect_left(liked, movie_id)
+                if position < len(liked) and liked[position] == movie_id:
+                    del liked[position]
+
+    def forget(self, user_id: int) -> None:
+        self._changed(user_id)
+        self.users.delete(user_id)
+
+    def _changed(self, user_id: int) -> None:
+        global _changes
+        _changes += 1
+        if user_id in self._loading:
+            self._raced.add(user_id)
+
+    def stats(self) -> dict:
+        arrays = self.users.values()
+        likes = sum(len(movie_ids) for movie_ids in arrays)
+        return {
+            **self.users.stats(),
+            "loads": self.loads,
+            "likes": likes,
+            "bytes": sum(movie_ids.buffer_info()[1] * movie_ids.itemsize for movie_ids in arrays),
+        }
+
+
+@lru_cache
+def get_like_index() -> LikeIndex:
+    """Індекс воркера; створюється при першому зверненні."""
+    settings = get_settings()
+    return LikeIndex(settings.like_index_size, settings.like_index_ttl)
@@ -2,8 +2,16 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from database import Base, engine
+import metrics
+from auth import auth_service
+from config import get_settings
+from database import dispose_engines, get_engine, get_write_engine
+from get_movie_info import close_client
+from migrations import upgrade_schema
+from profiler import ProfilerMiddleware
+from services.recommendation_service import get_recommendation_refresher
 
 from routers import users, movies
 
@@ -15,11 +23,19 @@ from routers import users, movies
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     # Startup
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Час, статус і кількість SQL запитів кожного запиту → GET /metrics
+    metrics.instrument_engine(get_engine(), "reader")
+    metrics.instrument_engine(get_write_engine(), "writer")
+    async with get_write_engine().begin() as conn:
+        await upgrade_schema(conn)
+    refresher = get_recommendation_refresher()
+    refresher.start()
     yield
     # Shutdown
-    await engine.dispose()
+    await refresher.stop()
+    await close_client()
+    auth_service.shutdown()
+    await dispose_engines()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -30,7 +46,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # курсор пагінації /movies/{id}/liked
 )
 
+# Middleware збираються Starlette при першому запиті (або lifespan), тож
+# налаштування читаються тоді ж, а не при імпорті main
+
+
+def profiler_middleware(app):
+    # Профайлер запитів — лише якщо оператор його увімкнув (PROFILE_*)
+    settings = get_settings()
+    if settings.profile_secret is None and settings.profile_sample_rate <= 0:
+        return app
+    return ProfilerMiddleware(
+        app,
+        secret      = settings.profile_secret.get_secret_value() if settings.profile_secret else None,
+        sample_rate = settings.profile_sample_rate,
+        interval    = settings.profile_interval,
+        directory   = settings.profile_dir,
+        max_files   = settings.profile_max_files,
+    )
+
+
+def metrics_middleware(app):
+    return metrics.MetricsMiddleware(app, query_budget=get_settings().metrics_query_budget)
+
+
+app.add_middleware(profiler_middleware)
+app.add_middleware(metrics_middleware)
+
+
+# GET /metrics — для Prometheus (text exposition format)
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(movies.router, prefix="/movies", tags=["movies"])
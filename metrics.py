@@ -0,0 +1,210 @@
+"""Метрики процесу у форматі Prometheus (GET /metrics).
+
+Без prometheus_client: гістограми й лічильники — словники в пам'яті
+воркера, формат тексту — exposition format 0.0.4. Кожен воркер віддає
+свої числа; Prometheus підсумовує їх по instance.
+
+MetricsMiddleware міряє кожен HTTP запит: час, кількість SQL запитів і
+час у SQLite (лічильник у contextvar, його наповнюють події рушіїв з
+instrument_engine). Запити понад бюджет SQL позначаються як підозра на N+1.
+"""
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_number(value)}"
+
+
+class Histogram:
+    """Гістограма з фіксованими межами кошиків (le), як у Prometheus."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # labels → [кількість у кожному кошику (+Inf останній), сума]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="' + (bound if bound == "+Inf" else _format_number(bound)) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_number(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+HTTP_SECONDS = Histogram(
+    "http_request_duration_seconds", "Час обробки HTTP запиту",
+    ("method", "route", "status"),
+)
+HTTP_QUERIES = Histogram(
+    "http_request_db_queries", "SQL запитів на один HTTP запит",
+    ("method", "route"), QUERY_BUCKETS,
+)
+HTTP_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Сумарний час SQL запитів одного HTTP запиту",
+    ("method", "route"),
+)
+QUERY_BUDGET_EXCEEDED = Counter(
+    "http_request_query_budget_exceeded_total", "HTTP запити з кількістю SQL понад бюджет (підозра на N+1)",
+    ("method", "route"),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Час одного SQL запиту (включно з фоновими задачами)",
+    ("engine",),
+)
+TMDB_SECONDS = Histogram(
+    "tmdb_request_duration_seconds", "Час запиту до TMDB (без очікування в черзі семафора)",
+    ("endpoint", "outcome"),
+)
+
+REGISTRY = [HTTP_SECONDS, HTTP_QUERIES, HTTP_DB_SECONDS, QUERY_BUDGET_EXCEEDED, DB_QUERY_SECONDS, TMDB_SECONDS]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# ── SQL запити поточного HTTP запиту ─────────────
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# SQLAlchemy виконує драйвер у greenlet з контекстом викликача,
+# тож події рушія бачать contextvar поточного запиту
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+_instrumented: weakref.WeakSet = weakref.WeakSet()
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Рахує кожен SQL запит рушія: у гістограму і в статистику HTTP запиту.
+    Повторний виклик для того самого рушія нічого не робить."""
+    if engine.sync_engine in _instrumented:
+        return
+    _instrumented.add(engine.sync_engine)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        DB_QUERY_SECONDS.observe((name,), elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Новіші FastAPI кладуть у scope маршрут роутера без префікса
+    # include_router; повний шаблон — у контексті маршруту
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(context, "path", None) or route.path
+
+
+class MetricsMiddleware:
+    """ASGI middleware: час, статус і SQL статистика кожного HTTP запиту.
+
+    Маршрут береться з шаблону шляху (/movies/{user_id}/liked), а не з
+    URL, щоб кількість рядів метрик не росла з кількістю юзерів.
+    """
+
+    def __init__(self, app, query_budget: int = 0):
+        self.app = app
+        self.query_budget = query_budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            labels = (scope["method"], route_template(scope))
+            HTTP_SECONDS.observe((*labels, status), elapsed)
+            HTTP_QUERIES.observe(labels, stats.queries)
+            HTTP_DB_SECONDS.observe(labels, stats.db_seconds)
+            if self.query_budget and stats.queries > self.query_budget:
+                QUERY_BUDGET_EXCEEDED.inc(labels)
+                print(f"УВАГА: {labels[0]} {labels[1]} — {stats.queries} SQL запитів "
+                      f"(бюджет {self.query_budget}), можливо N+1")
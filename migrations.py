@@ -0,0 +1,148 @@
+from typing import Awaitable, Callable
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import models  # реєструє таблиці в Base.metadata
+from database import Base
+
+async def _backfill_username_normalized(conn: AsyncConnection) -> None:
+    """Заповнює username_normalized і звітує про імена, що відрізняються
+    лише регістром. Якщо такі є — індекс створюється неунікальним,
+    щоб міграція не впала; нові дублікати все одно не пройдуть реєстрацію."""
+    rows = (await conn.execute(text(
+        "SELECT id, username FROM users WHERE username_normalized IS NULL"
+    ))).all()
+    if rows:
+        await conn.execute(
+            text("UPDATE users SET username_normalized = :normalized WHERE id = :id"),
+            [{"id": user_id, "normalized": models.normalize_username(username)} for user_id, username in rows],
+        )
+
+    duplicates = (await conn.execute(text(
+        "SELECT group_concat(id || ':' || username, ', ') FROM users"
+        " GROUP BY username_normalized HAVING count(*) > 1"
+    ))).scalars().all()
+    if duplicates:
+        for group in duplicates:
+            print(f"УВАГА: імена відрізняються лише регістром (id:username): {group}")
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_users_username_normalized ON users (username_normalized)"
+        ))
+    else:
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_username_normalized ON users (username_normalized)"
+        ))
+
+
+# Перерахунок friend_compatibility з усіх прийнятих дружб (міграція 8,
+# а також benchmarks/seed.py після масової вставки)
+FRIEND_COMPATIBILITY_BACKFILL = (
+    "INSERT OR REPLACE INTO friend_compatibility"
+    " (user_id, friend_id, common_count, union_count, score)"
+    " SELECT user_id, friend_id, common, total - common,"
+    " CASE WHEN total > common THEN common * 1.0 / (total - common) ELSE 0 END"
+    " FROM (SELECT f.user_id, f.friend_id,"
+    " (SELECT count(*) FROM likes AS mine JOIN likes AS theirs"
+    " ON theirs.movie_id = mine.movie_id AND theirs.user_id = f.friend_id"
+    " WHERE mine.user_id = f.user_id) AS common,"
+    " (SELECT count(*) FROM likes WHERE user_id = f.user_id)"
+    " + (SELECT count(*) FROM likes WHERE user_id = f.friend_id) AS total"
+    " FROM user_friends AS f WHERE f.is_accepted = 1)"
+)
+
+
+# Міграції схеми для вже існуючих blog.db.
+# Нова БД одразу отримує актуальну схему через create_all і номер
+# останньої міграції. Номер зберігається в PRAGMA user_version.
+# Крок міграції — SQL рядок або async функція (conn) -> None.
+Step = str | Callable[[AsyncConnection], Awaitable[None]]
+
+MIGRATIONS: list[list[Step]] = [
+    # 1: індекс для перетину лайків (/movies/common)
+    [
+        "CREATE INDEX IF NOT EXISTS ix_likes_movie_user ON likes (movie_id, user_id)",
+    ],
+    # 2: час лайку для keyset-пагінації; старі лайки вважаються найдавнішими
+    [
+        "ALTER TABLE likes ADD COLUMN liked_at DATETIME",
+        "UPDATE likes SET liked_at = '1970-01-01 00:00:00.000000' WHERE liked_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_likes_user_liked_at ON likes (user_id, liked_at, movie_id)",
+    ],
+    # 3: прийнята дружба — два рядки (A→B, B→A); індекс для вхідних запитів
+    [
+        "INSERT OR IGNORE INTO user_friends (user_id, friend_id, is_accepted)"
+        " SELECT friend_id, user_id, 1 FROM user_friends WHERE is_accepted = 1",
+        "UPDATE user_friends SET is_accepted = 1 WHERE is_accepted = 0 AND EXISTS ("
+        " SELECT 1 FROM user_friends AS reverse"
+        " WHERE reverse.user_id = user_friends.friend_id"
+        " AND reverse.friend_id = user_friends.user_id AND reverse.is_accepted = 1)",
+        "CREATE INDEX IF NOT EXISTS ix_user_friends_friend_accepted"
+        " ON user_friends (friend_id, is_accepted, user_id)",
+    ],
+    # 4: FTS5 trigram індекс для /users/search + заповнення з users
+    [
+        *models.USERS_FTS_DDL,
+        "INSERT INTO users_fts (users_fts) VALUES ('rebuild')",
+    ],
+    # 5: нормалізоване ім'я для логіну/реєстрації без урахування регістру
+    [
+        "ALTER TABLE users ADD COLUMN username_normalized VARCHAR(50)",
+        _backfill_username_normalized,
+    ],
+    # 6: жанри фільму бітовою маскою (старі фільми — 0, жанри невідомі)
+    [
+        "ALTER TABLE movies ADD COLUMN genre_mask INTEGER NOT NULL DEFAULT 0",
+    ],
+    # 7: movie_neighbors (рекомендації) — нова таблиця, її створює create_all
+    [],
+    # 8: friend_compatibility — таблицю створює create_all, тут заповнення
+    #    для вже прийнятих дружб
+    [
+        FRIEND_COMPATIBILITY_BACKFILL,
+    ],
+    # 9: лічильники лайків фільмів (тригери + заповнення), черга оновлення
+    #    рекомендацій і оренди фонових задач (таблиці створює create_all)
+    [
+        *models.MOVIE_LIKE_COUNTS_DDL,
+        "INSERT OR REPLACE INTO movie_like_counts (movie_id, like_count)"
+        " SELECT movie_id, count(*) FROM likes GROUP BY movie_id",
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+async def get_schema_version(conn: AsyncConnection) -> int:
+    result = await conn.execute(text("PRAGMA user_version"))
+    return result.scalar_one()
+
+
+async def set_schema_version(conn: AsyncConnection, version: int) -> None:
+    await conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+async def upgrade_schema(conn: AsyncConnection) -> int:
+    """Доводить схему БД до SCHEMA_VERSION. Повертає кількість виконаних міграцій."""
+    # Схема актуальна — жодних інспекцій і create_all, старт не залежить від розміру БД
+    version = await get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return 0
+
+    tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+
+    # Нові таблиці (і порожня БД) створюються з моделей
+    await conn.run_sync(Base.metadata.create_all)
+
+    if not tables:
+        await set_schema_version(conn, SCHEMA_VERSION)
+        return 0
+
+    for number, steps in enumerate(MIGRATIONS[version:], start=version + 1):
+        for step in steps:
+            if callable(step):
+                await step(conn)
+            else:
+                await conn.execute(text(step))
+        await set_schema_version(conn, number)
+    return SCHEMA_VERSION - version
@@ -1,15 +1,111 @@
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, Integer, String, Float, Table, Column, Boolean
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import UTC, datetime
+
+from sqlalchemy import DDL, ForeignKey, Integer, String, Float, Table, Column, Boolean, Index, DateTime, event
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
+from sqlalchemy.sql import column, table
 
 from database import Base
+from genres import genre_ids_from_mask, genre_names
+
+def utcnow() -> datetime:
+    """Поточний час UTC без tzinfo (SQLite зберігає дати як текст)."""
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def normalize_username(username: str) -> str:
+    """Ключ для порівняння імен без урахування регістру ("Ann" == "ann")."""
+    return username.casefold()
+
+
+def _default_username_normalized(context) -> str:
+    return normalize_username(context.get_current_parameters()["username"])
+
 
 likes = Table(
     'likes',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('movie_id', Integer, ForeignKey('movies.id'), primary_key=True)
+    Column('movie_id', Integer, ForeignKey('movies.id'), primary_key=True),
+    Column('liked_at', DateTime, nullable=False, default=utcnow),
+    # PK (user_id, movie_id) покриває "лайки юзера"; цей індекс — "хто лайкнув фільм"
+    Index('ix_likes_movie_user', 'movie_id', 'user_id'),
+    # Keyset-пагінація /movies/{user_id}/liked: нові лайки першими
+    Index('ix_likes_user_liked_at', 'user_id', 'liked_at', 'movie_id'),
+)
+
+# Рекомендації: для кожного фільму top-K схожих (косинусна схожість
+# стовпців матриці юзер×фільм). Рахує recommender.py, оновлює у фоні
+# services/recommendation_service.py
+movie_neighbors = Table(
+    'movie_neighbors',
+    Base.metadata,
+    Column('movie_id', Integer, ForeignKey('movies.id'), primary_key=True),
+    Column('neighbor_id', Integer, ForeignKey('movies.id'), primary_key=True),
+    Column('score', Float, nullable=False),
+)
+
+# Кількість лайків фільму (n_j для косинуса в recommender.compute_neighbors).
+# Підтримується тригерами на likes — будь-який INSERT/DELETE лайків, з ORM
+# чи сирим SQL, змінює лічильник у тій самій транзакції
+movie_like_counts = Table(
+    'movie_like_counts',
+    Base.metadata,
+    Column('movie_id', Integer, primary_key=True),
+    Column('like_count', Integer, nullable=False),
+)
+
+MOVIE_LIKE_COUNTS_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS likes_count_ai AFTER INSERT ON likes BEGIN"
+    " INSERT INTO movie_like_counts (movie_id, like_count) VALUES (new.movie_id, 1)"
+    " ON CONFLICT (movie_id) DO UPDATE SET like_count = like_count + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS likes_count_ad AFTER DELETE ON likes BEGIN"
+    " UPDATE movie_like_counts SET like_count = like_count - 1 WHERE movie_id = old.movie_id; END",
+]
+
+for _statement in MOVIE_LIKE_COUNTS_DDL:
+    event.listen(likes, "after_create", DDL(_statement))
+
+# Черга інкрементального оновлення movie_neighbors: лайк позначає юзера
+# і фільми в тій самій транзакції, перераховує один процес (оренда нижче).
+# version зростає при кожному повторному позначенні — фільм, позначений
+# знову під час перерахунку, лишається в черзі
+recommendation_dirty_users = Table(
+    'recommendation_dirty_users',
+    Base.metadata,
+    Column('user_id', Integer, primary_key=True),
+)
+
+recommendation_dirty_movies = Table(
+    'recommendation_dirty_movies',
+    Base.metadata,
+    Column('movie_id', Integer, primary_key=True),
+    Column('version', Integer, nullable=False, default=0),
+)
+
+# Оренди фонових задач: задачу виконує лише власник, поки не минув expires_at
+background_leases = Table(
+    'background_leases',
+    Base.metadata,
+    Column('name', String(50), primary_key=True),
+    Column('owner', String(100), nullable=False),
+    Column('expires_at', Float, nullable=False),
+)
+
+# Схожість смаків друзів (Jaccard по лайках): спільні / всі різні фільми
+# пари. Два рядки на прийняту дружбу (A→B і B→A), як у user_friends;
+# оновлюється разом з лайками і дружбою (services/compatibility_service.py)
+friend_compatibility = Table(
+    'friend_compatibility',
+    Base.metadata,
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('friend_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('common_count', Integer, nullable=False, default=0),
+    Column('union_count', Integer, nullable=False, default=0),
+    Column('score', Float, nullable=False, default=0.0),   # common / union, 0 — без лайків
+    # Друзі за % збігу: діапазон індексу, без сортування
+    Index('ix_friend_compatibility_user_score', 'user_id', 'score', 'friend_id'),
 )
 
 class User(Base):
@@ -17,6 +113,16 @@ class User(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     username: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    # Заповнюється автоматично з username (ORM — _set_username, Core
+    # insert — default); унікальний індекс — логін і реєстрація шукають
+    # по ньому точковим запитом
+    username_normalized: Mapped[str] = mapped_column(
+        String(50),
+        unique=True,
+        index=True,
+        nullable=False,
+        default=_default_username_normalized,
+    )
     password_hash: Mapped[str] = mapped_column(String(200), nullable=False)
 
     liked_movies: Mapped[list[Movie]] = relationship(
@@ -24,6 +130,36 @@ class User(Base):
         back_populates='liked_by'
     )
 
+    @validates("username")
+    def _set_username(self, _key: str, username: str) -> str:
+        # Лише коли змінюється саме ім'я: UPDATE інших колонок його не чіпає
+        self.username_normalized = normalize_username(username)
+        return username
+
+# ── Повнотекстовий пошук юзерів (SQLite FTS5, trigram) ──────────
+# Віртуальна таблиця з external content = users: індекс тримає лише
+# триграми імен, синхронізується тригерами на INSERT/UPDATE/DELETE.
+# create_all її не знає, тому для нової БД DDL виконується після
+# створення users, а для старої — міграцією (ті самі оператори).
+USERS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "username, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN"
+    " INSERT INTO users_fts (rowid, username) VALUES (new.id, new.username); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN"
+    " INSERT INTO users_fts (users_fts, rowid, username) VALUES ('delete', old.id, old.username); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF username ON users BEGIN"
+    " INSERT INTO users_fts (users_fts, rowid, username) VALUES ('delete', old.id, old.username);"
+    " INSERT INTO users_fts (rowid, username) VALUES (new.id, new.username); END",
+]
+
+for _statement in USERS_FTS_DDL:
+    event.listen(User.__table__, "after_create", DDL(_statement))
+
+# Для запитів: SELECT rowid FROM users_fts WHERE username MATCH ...
+users_fts = table("users_fts", column("rowid", Integer), column("username", String))
+
+
 class Movie(Base):
     __tablename__ = 'movies'
 
@@ -38,14 +174,30 @@ class Movie(Base):
     overview     = mapped_column(String,  nullable=True)  # опис фільму
     release_date = mapped_column(String,  nullable=True)  # дата виходу "2024-11-26"
     vote_average = mapped_column(Float,   nullable=True)  # рейтинг 0.0–10.0
+    # Жанри бітами (див. genres.GENRES); 0 — невідомо (збережено до появи поля)
+    genre_mask   = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     liked_by: Mapped[list[User]] = relationship(
         secondary=likes,
         back_populates='liked_movies'
     )
 
+    @property
+    def genre_ids(self) -> list[int]:
+        return genre_ids_from_mask(self.genre_mask or 0)
+
+    @property
+    def genres_str(self) -> list[str] | None:
+        return genre_names(self.genre_ids)
+
 class Friendship(Base):
+    """Запит дружби — один рядок (відправник → отримувач, is_accepted=False).
+    Прийнята дружба — два рядки A→B і B→A з is_accepted=True."""
     __tablename__ = 'user_friends'
+    __table_args__ = (
+        # Вхідні запити: WHERE friend_id = ? AND is_accepted = 0
+        Index('ix_user_friends_friend_accepted', 'friend_id', 'is_accepted', 'user_id'),
+    )
 
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), primary_key=True)
     friend_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), primary_key=True)
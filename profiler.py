@@ -0,0 +1,216 @@
+"""Семплюючий профайлер окремих HTTP запитів (вмикається оператором).
+
+Запит профілюється, якщо:
+  * у ньому є заголовок X-Profile з підписом адміністратора
+    (python profiler.py token — друкує значення, дійсне --ttl секунд), або
+  * він потрапив у частку PROFILE_SAMPLE_RATE.
+
+Поки є хоч один такий запит, окремий потік кожні PROFILE_INTERVAL секунд
+дивиться на задачу запиту: якщо вона виконується — бере стек потоку
+event loop, якщо чекає (SQLite, TMDB, лок) — ланцюжок корутин до місця
+очікування з позначкою "(await ...)". Тобто профіль — за реальним часом,
+а не лише CPU. Результат — collapsed stacks (flamegraph.pl, speedscope)
+у PROFILE_DIR, старі файли видаляються понад PROFILE_MAX_FILES.
+
+Вимкнений профайлер не встановлює middleware і не запускає потік.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from metrics import route_template
+
+HEADER = b"x-profile"
+
+
+def sign(secret: str, expires: int) -> str:
+    """Значення заголовка X-Profile: "<unix час закінчення>.<HMAC-SHA256>"."""
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify(secret: str, value: str) -> bool:
+    expires, _, signature = value.partition(".")
+    # Лише ASCII цифри: isdigit() пропускає "²", а int() на ньому падає
+    if not re.fullmatch(r"[0-9]+", expires) or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sign(secret, int(expires)), value)
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    # ";" розділяє кадри в collapsed форматі
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class ProfileSession:
+    """Семпли однієї задачі (одного HTTP запиту)."""
+
+    def __init__(self, task: asyncio.Task, loop: asyncio.AbstractEventLoop):
+        self.task = task
+        self.loop = loop
+        self.thread_id = threading.get_ident()
+        self.root = task.get_coro().cr_frame
+        self.stacks: Counter[str] = Counter()
+
+    def sample(self, frames: dict) -> None:
+        if asyncio.current_task(self.loop) is self.task:
+            stack = self._running_stack(frames.get(self.thread_id))
+        else:
+            stack = self._awaiting_stack()
+        if stack:
+            self.stacks[";".join(stack)] += 1
+
+    def _running_stack(self, frame) -> list[str]:
+        # Стек потоку від кореня корутини задачі (кадри event loop відкидаємо)
+        labels = []
+        while frame is not None:
+            labels.append(_label(frame))
+            if frame is self.root:
+                break
+            frame = frame.f_back
+        labels.reverse()
+        return labels
+
+    def _awaiting_stack(self) -> list[str]:
+        labels = []
+        awaitable = self.task.get_coro()
+        while awaitable is not None:
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+            if frame is None:
+                labels.append(f"(await {type(awaitable).__name__})")
+                break
+            labels.append(_label(frame))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+        return labels
+
+
+class Sampler:
+    """Один потік на процес; працює лише поки є активні сесії."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._sessions: set[ProfileSession] = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def add(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self) -> None:
+        while True:
+            # Семпл під локом: після remove() сесію вже ніхто не змінює
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for session in self._sessions:
+                    session.sample(frames)
+                del frames
+            time.sleep(self.interval)
+
+
+class ProfileStore:
+    """Каталог з collapsed stacks; найстаріші файли видаляються."""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    @staticmethod
+    def file_name(method: str, route: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        return f"{int(time.time() * 1000)}-{method}-{slug}.collapsed"
+
+    def save(self, name: str, stacks: Counter) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        # Імена починаються з часу — сортування за іменем = за віком
+        files = sorted(entry for entry in os.listdir(self.directory) if entry.endswith(".collapsed"))
+        for old in files[:max(0, len(files) - self.max_files)]:
+            os.remove(os.path.join(self.directory, old))
+
+
+class ProfilerMiddleware:
+    """ASGI middleware: профілює запити з підписаним X-Profile або за sample_rate.
+    Ім'я файлу профілю повертається в заголовку X-Profile-File."""
+
+    def __init__(self, app, secret: str | None, sample_rate: float, interval: float, directory: str, max_files: int):
+        self.app = app
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.sampler = Sampler(interval)
+        self.store = ProfileStore(directory, max_files)
+
+    def _wanted(self, scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.secret:
+            for name, value in scope["headers"]:
+                if name == HEADER:
+                    return verify(self.secret, value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(asyncio.current_task(), asyncio.get_running_loop())
+        name = None
+
+        async def send_with_file(message):
+            nonlocal name
+            if message["type"] == "http.response.start":
+                # Маршрут уже відомий — ім'я файлу віддаємо клієнту одразу
+                name = self.store.file_name(scope["method"], route_template(scope))
+                message["headers"] = [*message.get("headers", []), (b"x-profile-file", name.encode())]
+            await send(message)
+
+        self.sampler.add(session)
+        try:
+            await self.app(scope, receive, send_with_file)
+        finally:
+            self.sampler.remove(session)
+            if session.stacks:
+                name = name or self.store.file_name(scope["method"], route_template(scope))
+                await asyncio.to_thread(self.store.save, name, session.stacks)
+
+
+def main() -> None:
+    from config import get_settings
+
+    parser = argparse.ArgumentParser(description="Профілювання запитів")
+    commands = parser.add_subparsers(dest="command", required=True)
+    token_parser = commands.add_parser("token", help="значення заголовка X-Profile")
+    token_parser.add_argument("--ttl", type=int, default=900, help="секунд дії підпису")
+    args = parser.parse_args()
+
+    secret = get_settings().profile_secret
+    if secret is None:
+        parser.error("PROFILE_SECRET не задано в .env")
+    print(sign(secret.get_secret_value(), int(time.time()) + args.ttl))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,21 @@
 from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth import CurrentUser
-from database import get_db
+from auth import CurrentUser, CurrentWriteUser
+from database import get_db, get_write_db
+from genres import GENRES
+from services.deck_service import DeckService
 from services.movie_service import MovieService
-from schemas import MoviePublic, MovieInDB
+from services.recommendation_service import RecommendationService
+from schemas import GenreCount, LikeBatchResult, LikesBatch, MoviePublic, MovieInDB, MoviesCount
 
 router = APIRouter()
 
 DB = Annotated[AsyncSession, Depends(get_db)]
+WriteDB = Annotated[AsyncSession, Depends(get_write_db)]
 
 
 # GET /movies/
@@ -25,23 +30,102 @@ async def get_movies(
     return await service.get_all_movies(name=name, year=year, page=page)
 
 
+# GET /movies/cache/stats — лічильники кешу TMDB (hit/miss/eviction, single-flight)
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return MovieService.get_cache_stats()
+
+
+# GET /movies/deck?size=10  (потрібен токен)
+# choose.html — наступна порція карток без уже лайкнутих фільмів
+@router.get("/deck")
+async def get_deck(db: DB, current_user: CurrentUser, size: int = Query(10, ge=1, le=50)):
+    service = DeckService(db)
+    return await service.get_deck(current_user.id, size)
+
+
+# GET /movies/recommended?limit=20  (потрібен токен)
+# Схожі на останні лайки фільми (collaborative filtering по likes)
+@router.get("/recommended", response_model=list[MovieInDB])
+async def get_recommended(
+    db: DB,
+    current_user: CurrentUser,
+    limit: int = Query(20, ge=1, le=100),
+):
+    service = RecommendationService(db)
+    return await service.get_recommended(current_user.id, limit)
+
+
 # POST /movies/like-movie  (потрібен токен)
 @router.post("/like-movie")
-async def like_movie(movie_data: MoviePublic, db: DB, current_user: CurrentUser):
+async def like_movie(movie_data: MoviePublic, db: WriteDB, current_user: CurrentWriteUser):
     service = MovieService(db)
     return await service.like_movie(movie_data, current_user)
 
 
+# POST /movies/likes:batch  (потрібен токен)
+# Кілька лайків/анлайків однією транзакцією (швидкі свайпи, офлайн-черга)
+@router.post("/likes:batch", response_model=list[LikeBatchResult])
+async def apply_likes_batch(batch: LikesBatch, db: WriteDB, current_user: CurrentWriteUser):
+    service = MovieService(db)
+    return await service.apply_likes_batch(batch, current_user)
+
+
 # GET /movies/common/{friend_id}  (потрібен токен)
 # СТОЇТЬ ВИЩЕ /{user_id}/liked — інакше "common" трактується як user_id
-@router.get("/common/{friend_id}", response_model=list[MovieInDB])
-async def get_common_movies(friend_id: int, db: DB, current_user: CurrentUser):
+# ?limit=&offset= — пагінація, ?count_only=true — лише {"count": N}
+# ?genre=27 — лише спільні фільми цього жанру (id жанру TMDB)
+@router.get("/common/{friend_id}", response_model=list[MovieInDB] | MoviesCount)
+async def get_common_movies(
+    friend_id: int,
+    db: DB,
+    current_user: CurrentUser,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    count_only: bool = False,
+    genre: Optional[int] = None,
+):
     service = MovieService(db)
-    return await service.get_common_movies(current_user, friend_id)
+    return await service.get_common_movies(
+        current_user, friend_id, limit=limit, offset=offset, count_only=count_only, genre=genre,
+    )
 
 
-# GET /movies/{user_id}/liked
+# GET /movies/{user_id}/liked?limit=50&cursor=...
+# Нові лайки першими. Без limit — весь список (як раніше).
+# ?genre=27 — лише фільми цього жанру.
+# Курсор наступної сторінки — в заголовку X-Next-Cursor.
 @router.get("/{user_id}/liked", response_model=list[MovieInDB])
-async def get_liked_movies(user_id: int, db: DB):
+async def get_liked_movies(
+    user_id: int,
+    db: DB,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    genre: Optional[int] = None,
+):
     service = MovieService(db)
-    return await service.get_user_liked_movies(user_id)
+    movies, next_cursor = await service.get_user_liked_movies(user_id, limit=limit, cursor=cursor, genre=genre)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return movies
+
+
+# GET /movies/{user_id}/genres?limit=5
+# Улюблені жанри: кількість лайкнутих фільмів кожного жанру, найбільші першими
+@router.get("/{user_id}/genres", response_model=list[GenreCount])
+async def get_top_genres(
+    user_id: int,
+    db: DB,
+    limit: int = Query(5, ge=1, le=len(GENRES)),
+):
+    service = MovieService(db)
+    return await service.get_top_genres(user_id, limit)
+
+
+# GET /movies/{user_id}/liked/export — NDJSON, один фільм на рядок
+@router.get("/{user_id}/liked/export")
+async def export_liked_movies(user_id: int):
+    # Без DB: сесії відкриває сам стрім (див. stream_user_liked_movies)
+    rows = await MovieService.stream_user_liked_movies(user_id)
+    return StreamingResponse(rows, media_type="application/x-ndjson")
@@ -1,19 +1,18 @@
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-import models
-from auth import auth_service, CurrentUser
-from database import get_db
-from schemas import Token, UserCreate, UserPublic
+from auth import auth_service, CurrentUser, CurrentWriteUser
+from database import get_db, get_write_db
+from schemas import FriendsOverviewPage, Token, UserCreate, UserPublic
 from services.user_service import UserService, FriendshipService
 
 router = APIRouter()
 
 DB = Annotated[AsyncSession, Depends(get_db)]
+WriteDB = Annotated[AsyncSession, Depends(get_write_db)]
 
 
 # ══════════════════════════════════════════════
@@ -26,7 +25,7 @@ DB = Annotated[AsyncSession, Depends(get_db)]
 # POST /users/registration
 # signup.html надсилає JSON: { "username": "...", "password": "..." }
 @router.post("/registration", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: DB):
+async def register(user_data: UserCreate, db: WriteDB):
     service = UserService(db)
     return await service.register(user_data)
 
@@ -50,6 +49,12 @@ async def login(
     return {"access_token": token, "token_type": "bearer"}
 
 
+# GET /users/auth/stats — черга пулу хешування паролів (argon2)
+@router.get("/auth/stats")
+async def get_auth_stats():
+    return auth_service.hasher_pool.stats()
+
+
 # GET /users/me
 # Повертає профіль залогіненого юзера. Потрібен токен.
 @router.get("/me", response_model=UserPublic)
@@ -57,20 +62,24 @@ async def get_me(current_user: CurrentUser):
     return current_user
 
 
-# GET /users/search?query=Tom
+# GET /users/search?query=Tom&limit=20&cursor=...
 # search_friends.html використовує цей ендпоінт.
+# Спочатку імена, що починаються з query, далі — що містять query.
+# Курсор наступної сторінки — в заголовку X-Next-Cursor.
 # СТОЇТЬ ВИЩЕ /{user_id} — інакше слово "search" трактується як user_id
 @router.get("/search", response_model=list[UserPublic])
 async def search_users(
+    db: DB,
+    response: Response,
     query: str = Query(..., min_length=1),
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
 ):
-    result = await db.execute(
-        select(models.User)
-        .where(models.User.username.ilike(f"%{query}%"))
-        .limit(20)
-    )
-    return result.scalars().all()
+    service = UserService(db)
+    users, next_cursor = await service.search(query, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
 
 
 # GET /users/friends/my
@@ -81,6 +90,22 @@ async def get_my_friends(db: DB, current_user: CurrentUser):
     return await service.get_friends(current_user.id)
 
 
+# GET /users/friends/overview?limit=20&offset=0&sort=match
+# profile.html — друзі з кількістю лайків, спільних лайків, % збігу і постерами.
+# Замінює запити /movies/{id}/liked + /movies/common/{id} на кожного друга.
+# sort=match — найбільший збіг смаків першим, інакше за іменем
+@router.get("/friends/overview", response_model=FriendsOverviewPage)
+async def get_friends_overview(
+    db: DB,
+    current_user: CurrentUser,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    sort: Literal["username", "match"] = "username",
+):
+    service = FriendshipService(db)
+    return await service.get_overview(current_user.id, limit, offset, sort=sort)
+
+
 # GET /users/friends/requests/incoming
 # Вхідні запити дружби. Потрібен токен.
 @router.get("/friends/requests/incoming", response_model=list[UserPublic])
@@ -92,7 +117,7 @@ async def get_incoming_requests(db: DB, current_user: CurrentUser):
 # POST /users/friends/request/{friend_id}
 # search_friends.html — кнопка "Add". Потрібен токен.
 @router.post("/friends/request/{friend_id}", status_code=status.HTTP_201_CREATED)
-async def send_friend_request(friend_id: int, db: DB, current_user: CurrentUser):
+async def send_friend_request(friend_id: int, db: WriteDB, current_user: CurrentWriteUser):
     service = FriendshipService(db)
     return await service.send_request(current_user.id, friend_id)
 
@@ -100,7 +125,7 @@ async def send_friend_request(friend_id: int, db: DB, current_user: CurrentUser)
 # POST /users/friends/accept/{sender_id}
 # Прийняти запит дружби. Потрібен токен.
 @router.post("/friends/accept/{sender_id}")
-async def accept_friend_request(sender_id: int, db: DB, current_user: CurrentUser):
+async def accept_friend_request(sender_id: int, db: WriteDB, current_user: CurrentWriteUser):
     service = FriendshipService(db)
     return await service.accept_request(current_user.id, sender_id)
 
@@ -108,7 +133,7 @@ async def accept_friend_request(sender_id: int, db: DB, current_user: CurrentUse
 # DELETE /users/friends/{user_id}
 # Видалити друга або відхилити запит. Потрібен токен.
 @router.delete("/friends/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def remove_friend(user_id: int, db: DB, current_user: CurrentUser):
+async def remove_friend(user_id: int, db: WriteDB, current_user: CurrentWriteUser):
     service = FriendshipService(db)
     await service.remove_friendship(current_user.id, user_id)
 
@@ -124,6 +149,6 @@ async def get_user(user_id: int, db: DB):
 # DELETE /users/{user_id}
 # Видалити свій акаунт. Потрібен токен.
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(user_id: int, db: DB, current_user: CurrentUser):
+async def delete_user(user_id: int, db: WriteDB, current_user: CurrentWriteUser):
     service = UserService(db)
     await service.delete_user(user_id, current_user.id)
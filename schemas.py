@@ -22,6 +22,19 @@ class UserPublic(BaseModel):
     id: int
     username: str
 
+# GET /users/friends/overview — друг зі статистикою лайків
+class FriendOverview(BaseModel):
+    id:             int
+    username:       str
+    likes_count:    int
+    common_count:   int
+    match_percent:  float       # збіг смаків: спільні / всі різні лайки пари, 0–100
+    common_posters: list[str]   # кілька постерів спільних фільмів (нові першими)
+
+class FriendsOverviewPage(BaseModel):
+    items:       list[FriendOverview]
+    next_offset: Optional[int] = None
+
 
 # ── Схеми для фільмів ───────────────────────────────
 
@@ -34,6 +47,20 @@ class MoviePublic(BaseModel):
     overview:     Optional[str] = None   # опис
     release_date: Optional[str] = None   # "2024-11-26"
     vote_average: Optional[float] = None # рейтинг 0.0–10.0
+    genre_ids:    Optional[list[int]] = None  # genre_ids з TMDB, зберігаються маскою
+
+# POST /movies/likes:batch — накопичені свайпи (швидкі або офлайн)
+# Спочатку застосовуються like, потім unlike.
+LIKES_BATCH_MAX = 200
+
+class LikesBatch(BaseModel):
+    like:   list[MoviePublic] = Field(default_factory=list, max_length=LIKES_BATCH_MAX)
+    unlike: list[int]         = Field(default_factory=list, max_length=LIKES_BATCH_MAX)
+
+class LikeBatchResult(BaseModel):
+    id:     int
+    action: str   # "like" | "unlike"
+    status: str   # "added" | "already" | "removed" | "not_liked"
 
 # Те що backend повертає з бази (GET /movies/{id}/liked)
 class MovieInDB(BaseModel):
@@ -45,3 +72,15 @@ class MovieInDB(BaseModel):
     overview:     Optional[str] = None
     release_date: Optional[str] = None
     vote_average: Optional[float] = None
+    genre_ids:    list[int] = []
+    genres_str:   Optional[list[str]] = None
+
+# GET /movies/{user_id}/genres — жанр і кількість лайкнутих фільмів
+class GenreCount(BaseModel):
+    id:    int
+    name:  str
+    count: int
+
+# Відповідь з count_only=true (GET /movies/common/{friend_id})
+class MoviesCount(BaseModel):
+    count: int
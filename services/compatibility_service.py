@@ -0,0 +1,116 @@
+from collections import Counter
+
+from sqlalchemy import and_, bindparam, delete, func, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+
+def _score(common_count: int, union_count: int) -> float:
+    """Jaccard: спільні / всі різні лайки пари; 0, якщо лайків немає."""
+    return common_count / union_count if union_count else 0.0
+
+
+class CompatibilityService:
+    """Підтримує friend_compatibility в тій самій транзакції, що й зміна
+    лайків чи дружби; commit робить викликач.
+
+    Лайк (u, m) змінює пару (u, f) так: якщо f теж лайкнув m — +1 до
+    спільних, інакше +1 до об'єднання. Анлайк — навпаки. Тож на зміну
+    досить перевірити змінені фільми у лайках друзів, без перерахунку
+    перетинів.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def likes_changed(self, user_id: int, added: list[int], removed: list[int]) -> None:
+        """Враховує нові (added) і видалені (removed) лайки юзера."""
+        if not added and not removed:
+            return
+        fc = models.friend_compatibility
+        rows = (await self.db.execute(
+            select(fc.c.friend_id, fc.c.common_count, fc.c.union_count).where(fc.c.user_id == user_id)
+        )).all()
+        if not rows:
+            return
+
+        # Які зі змінених фільмів лайкнули друзі — один запит по PK likes
+        hits = await self.db.execute(
+            select(models.likes.c.user_id, models.likes.c.movie_id)
+            .join(fc, and_(fc.c.friend_id == models.likes.c.user_id, fc.c.user_id == user_id))
+            .where(models.likes.c.movie_id.in_([*added, *removed]))
+        )
+        added_set = set(added)
+        common_delta: Counter[int] = Counter()
+        for friend_id, movie_id in hits.all():
+            common_delta[friend_id] += 1 if movie_id in added_set else -1
+
+        params = []
+        for friend_id, common_count, union_count in rows:
+            delta = common_delta[friend_id]
+            common_count += delta
+            union_count += len(added) - len(removed) - delta
+            values = {"common_count": common_count, "union_count": union_count,
+                      "score": _score(common_count, union_count)}
+            # Обидва напрямки пари мають однакові значення
+            params.append({"owner": user_id, "friend": friend_id, **values})
+            params.append({"owner": friend_id, "friend": user_id, **values})
+
+        await self.db.execute(
+            update(fc)
+            .where(fc.c.user_id == bindparam("owner"), fc.c.friend_id == bindparam("friend"))
+            .values(common_count=bindparam("common_count"), union_count=bindparam("union_count"),
+                    score=bindparam("score")),
+            params,
+        )
+
+    async def friendship_accepted(self, user_id: int, friend_id: int) -> None:
+        """Рахує перетин і об'єднання лайків пари та записує обидва рядки."""
+        mine = models.likes.alias("mine")
+        theirs = models.likes.alias("theirs")
+        common = (
+            select(func.count())
+            .select_from(mine)
+            .join(theirs, and_(theirs.c.movie_id == mine.c.movie_id, theirs.c.user_id == friend_id))
+            .where(mine.c.user_id == user_id)
+            .scalar_subquery()
+        )
+        total = (
+            select(func.count())
+            .where(models.likes.c.user_id.in_([user_id, friend_id]))
+            .scalar_subquery()
+        )
+        common_count, total_count = (await self.db.execute(select(common, total))).one()
+        union_count = total_count - common_count
+
+        values = {"common_count": common_count, "union_count": union_count,
+                  "score": _score(common_count, union_count)}
+        statement = sqlite_insert(models.friend_compatibility).values([
+            {"user_id": user_id, "friend_id": friend_id, **values},
+            {"user_id": friend_id, "friend_id": user_id, **values},
+        ])
+        await self.db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "friend_id"],
+                set_={name: statement.excluded[name] for name in values},
+            )
+        )
+
+    async def friendship_removed(self, user_id: int, friend_id: int) -> None:
+        fc = models.friend_compatibility
+        await self.db.execute(delete(fc).where(
+            or_(
+                and_(fc.c.user_id == user_id, fc.c.friend_id == friend_id),
+                and_(fc.c.user_id == friend_id, fc.c.friend_id == user_id),
+            )
+        ))
+
+    async def user_deleted(self, user_id: int) -> None:
+        """Видаляє обидва напрямки всіх пар юзера. Рядки друзів (f → user)
+        шукаються через його власні рядки — пошук по PK, без скану по friend_id."""
+        fc = models.friend_compatibility
+        friends = select(fc.c.friend_id).where(fc.c.user_id == user_id)
+        await self.db.execute(delete(fc).where(fc.c.user_id.in_(friends), fc.c.friend_id == user_id))
+        await self.db.execute(delete(fc).where(fc.c.user_id == user_id))
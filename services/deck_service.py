@@ -0,0 +1,120 @@
+import asyncio
+import random
+from collections import OrderedDict, deque
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from get_movie_info import get_client
+from like_index import get_like_index
+
+
+class DeckBuffer:
+    """Буфер фільмів для свайпів одного юзера.
+
+    Наповнюється сторінками TMDB у випадковому порядку, вже лайкнуті
+    та вже показані фільми відкидаються.
+    """
+
+    def __init__(self, user_id: int, max_page: int):
+        self.user_id = user_id
+        self.queue: deque[dict] = deque()
+        self.seen: set[int] = set()
+        self.pages = random.sample(range(1, max_page + 1), max_page)
+        self.lock = asyncio.Lock()
+        self.refill_task: asyncio.Task | None = None
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.pages
+
+    async def fill(self, target: int, db: AsyncSession | None = None) -> None:
+        """Дозаповнює буфер до target фільмів (або поки не скінчаться сторінки).
+        db — сесія запиту; фонове дозаповнення бере з'єднання з пулу."""
+        async with self.lock:
+            while len(self.queue) < target and self.pages:
+                page = self.pages.pop()
+                data = await get_client().get_movies(page=page)
+                if "error" in data:
+                    # TMDB недоступний — сторінку не втрачаємо, спробуємо пізніше
+                    self.pages.append(page)
+                    break
+
+                candidates = [
+                    movie for movie in data.get("results", [])
+                    if movie["id"] not in self.seen
+                ]
+                if not candidates:
+                    continue
+
+                # Перевірка всієї сторінки по індексу лайків у пам'яті
+                ids = [movie["id"] for movie in candidates]
+                liked = await get_like_index().liked_among(self.user_id, ids, db)
+
+                self.seen.update(ids)
+                self.queue.extend(movie for movie in candidates if movie["id"] not in liked)
+
+    def take(self, size: int) -> list[dict]:
+        return [self.queue.popleft() for _ in range(min(size, len(self.queue)))]
+
+
+class DeckManager:
+    """Буфери всіх юзерів процесу (LRU: найстаріші викидаються)."""
+
+    def __init__(self, max_users: int, buffer_size: int, low_watermark: int, max_page: int):
+        self.max_users = max_users
+        self.buffer_size = buffer_size
+        self.low_watermark = low_watermark
+        self.max_page = max_page
+        self._buffers: OrderedDict[int, DeckBuffer] = OrderedDict()
+
+    def get(self, user_id: int) -> DeckBuffer:
+        buffer = self._buffers.get(user_id)
+        if buffer is None or (buffer.exhausted and not buffer.queue):
+            buffer = DeckBuffer(user_id, self.max_page)
+            self._buffers[user_id] = buffer
+        self._buffers.move_to_end(user_id)
+        while len(self._buffers) > self.max_users:
+            _, evicted = self._buffers.popitem(last=False)
+            if evicted.refill_task is not None:
+                evicted.refill_task.cancel()
+        return buffer
+
+    def schedule_refill(self, buffer: DeckBuffer) -> None:
+        """Фонове дозаповнення, щоб наступний батч віддався миттєво."""
+        if buffer.refill_task is not None and not buffer.refill_task.done():
+            return
+        buffer.refill_task = asyncio.ensure_future(buffer.fill(self.buffer_size))
+
+
+@lru_cache
+def get_deck_manager() -> DeckManager:
+    settings = get_settings()
+    return DeckManager(
+        max_users     = settings.deck_max_users,
+        buffer_size   = settings.deck_buffer_size,
+        low_watermark = settings.deck_low_watermark,
+        max_page      = settings.deck_max_page,
+    )
+
+
+class DeckService:
+    def __init__(self, db: AsyncSession | None = None, manager: DeckManager | None = None):
+        self.db = db
+        self.manager = manager or get_deck_manager()
+
+    # ── GET /movies/deck ────────────────────────────
+    async def get_deck(self, user_id: int, size: int):
+        buffer = self.manager.get(user_id)
+
+        # Буфер порожній (перший запит) — заповнюємо в запиті
+        if len(buffer.queue) < size:
+            await buffer.fill(max(size, self.manager.low_watermark), self.db)
+
+        batch = buffer.take(size)
+
+        if len(buffer.queue) < self.manager.low_watermark and not buffer.exhausted:
+            self.manager.schedule_refill(buffer)
+
+        return {"results": batch, "remaining": len(buffer.queue)}
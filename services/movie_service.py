@@ -1,107 +1,346 @@
+import base64
+import json
+from datetime import datetime
 from fastapi import HTTPException, status
-from typing import Optional
+from typing import AsyncIterator, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy import select
+from sqlalchemy import and_, delete, exists, func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from get_movie_info import client
+from database import new_session
+from genres import GENRE_BITS, GENRE_NAMES, GENRES, genre_mask
+from get_movie_info import get_client
+from like_index import get_like_index
 import models
-from schemas import MoviePublic
+from services.compatibility_service import CompatibilityService
+from services.recommendation_service import get_recommendation_refresher
+from schemas import LikesBatch, MovieInDB, MoviePublic
 
 
 class MovieService:
+    IN_CHUNK = 500      # id в одному WHERE ... IN (...)
+
     def __init__(self, db: AsyncSession):
         self.db = db
 
     # ── GET /movies/ ────────────────────────────────
     async def get_all_movies(self, name: Optional[str], year: Optional[int], page: int):
-        return client.get_movies(name=name, year=year, page=page)
+        return await get_client().get_movies(name=name, year=year, page=page)
+
+    # ── GET /movies/cache/stats ─────────────────────
+    @staticmethod
+    def get_cache_stats():
+        return {**get_client().stats(), "like_index": get_like_index().stats()}
 
     # ── POST /movies/like-movie ──────────────────────
     async def like_movie(self, movie_data: MoviePublic, current_user: models.User):
 
-        # 1. Шукаємо фільм в нашій БД
-        result = await self.db.execute(
-            select(models.Movie).where(models.Movie.id == movie_data.id)
-        )
-        movie = result.scalars().first()
-
-        if not movie:
-            # Фільму ще немає — створюємо з усіма полями
-            movie = models.Movie(
-                id           = movie_data.id,
-                movie_name   = movie_data.movie_name,
-                poster_path  = movie_data.poster_path,
-                poster_url   = movie_data.poster_url,
-                overview     = movie_data.overview,
-                release_date = movie_data.release_date,
-                vote_average = movie_data.vote_average,
-            )
-            self.db.add(movie)
-            await self.db.flush()
-        else:
-            # Фільм вже є — оновлюємо поля якщо вони були порожні
-            # (могли бути збережені раніше без нових полів)
-            if not movie.poster_url   and movie_data.poster_url:
-                movie.poster_url   = movie_data.poster_url
-            if not movie.overview     and movie_data.overview:
-                movie.overview     = movie_data.overview
-            if not movie.release_date and movie_data.release_date:
-                movie.release_date = movie_data.release_date
-            if not movie.vote_average and movie_data.vote_average:
-                movie.vote_average = movie_data.vote_average
-
-        # 2. Завантажуємо поточного юзера з його лайками
+        # 1. Фільм: вставка або доповнення порожніх полів — один запит
+        await self._upsert_movies([movie_data])
+
+        # 2. Лайк: INSERT ... ON CONFLICT DO NOTHING по PK (user_id, movie_id),
+        #    без завантаження всіх лайків юзера
         result = await self.db.execute(
-            select(models.User)
-            .options(selectinload(models.User.liked_movies))
-            .where(models.User.id == current_user.id)
+            sqlite_insert(models.likes)
+            .values(user_id=current_user.id, movie_id=movie_data.id)
+            .on_conflict_do_nothing()
         )
-        user = result.scalars().first()
+        if result.rowcount:
+            await CompatibilityService(self.db).likes_changed(current_user.id, [movie_data.id], [])
+            await get_recommendation_refresher().mark(self.db, current_user.id, [movie_data.id])
+        await self.db.commit()
 
-        # 3. Додаємо лайк якщо ще немає
-        if movie not in user.liked_movies:
-            user.liked_movies.append(movie)
-            await self.db.commit()
+        if result.rowcount:
+            get_like_index().added(current_user.id, [movie_data.id])
             return {"message": "Movie added to favorites"}
 
         return {"message": "Movie already in favorites"}
 
-    # ── GET /movies/{user_id}/liked ──────────────────
-    async def get_user_liked_movies(self, user_id: int):
-        result = await self.db.execute(
-            select(models.User).where(models.User.id == user_id)
+    # ── POST /movies/likes:batch ─────────────────────
+    async def apply_likes_batch(self, batch: LikesBatch, current_user: models.User):
+        # Якщо один фільм прийшов кілька разів — беремо останню версію
+        to_like = {movie.id: movie for movie in batch.like}
+        to_unlike = list(dict.fromkeys(batch.unlike))
+
+        # Які з фільмів вже лайкнуті — один запит на весь батч
+        touched = set(to_like) | set(to_unlike)
+        liked_before = set()
+        if touched:
+            result = await self.db.execute(
+                select(models.likes.c.movie_id).where(
+                    models.likes.c.user_id == current_user.id,
+                    models.likes.c.movie_id.in_(touched),
+                )
+            )
+            liked_before = set(result.scalars().all())
+
+        await self._upsert_movies(list(to_like.values()))
+
+        new_likes = [movie_id for movie_id in to_like if movie_id not in liked_before]
+        if new_likes:
+            await self.db.execute(
+                sqlite_insert(models.likes)
+                .values([{"user_id": current_user.id, "movie_id": movie_id} for movie_id in new_likes])
+                .on_conflict_do_nothing()
+            )
+
+        liked_after = liked_before | set(to_like)
+        removed = [movie_id for movie_id in to_unlike if movie_id in liked_after]
+        if removed:
+            await self.db.execute(
+                delete(models.likes).where(
+                    models.likes.c.user_id == current_user.id,
+                    models.likes.c.movie_id.in_(removed),
+                )
+            )
+
+        # Лайк і анлайк одного фільму в батчі взаємно скасовуються
+        unliked = set(removed)
+        await CompatibilityService(self.db).likes_changed(
+            current_user.id,
+            [movie_id for movie_id in new_likes if movie_id not in unliked],
+            [movie_id for movie_id in removed if movie_id in liked_before],
         )
-        user = result.scalars().first()
+        await get_recommendation_refresher().mark(self.db, current_user.id, new_likes + removed)
+        await self.db.commit()
+        like_index = get_like_index()
+        like_index.added(current_user.id, new_likes)
+        like_index.removed(current_user.id, removed)
+
+        results = [
+            {"id": movie_id, "action": "like",
+             "status": "already" if movie_id in liked_before else "added"}
+            for movie_id in to_like
+        ]
+        results += [
+            {"id": movie_id, "action": "unlike",
+             "status": "removed" if movie_id in liked_after else "not_liked"}
+            for movie_id in to_unlike
+        ]
+        return results
+
+    async def _upsert_movies(self, movies: list[MoviePublic]) -> None:
+        """Вставляє фільми; для вже існуючих заповнює лише порожні поля
+        (могли бути збережені раніше без нових полів)."""
+        if not movies:
+            return
+
+        statement = sqlite_insert(models.Movie).values([
+            {
+                "id":           movie.id,
+                "movie_name":   movie.movie_name,
+                "poster_path":  movie.poster_path,
+                "poster_url":   movie.poster_url,
+                "overview":     movie.overview,
+                "release_date": movie.release_date,
+                "vote_average": movie.vote_average,
+                "genre_mask":   genre_mask(movie.genre_ids),
+            }
+            for movie in movies
+        ])
+        excluded = statement.excluded
+        await self.db.execute(statement.on_conflict_do_update(
+            index_elements=[models.Movie.id],
+            set_={
+                "poster_url":   func.coalesce(func.nullif(models.Movie.poster_url, ""), excluded.poster_url),
+                "overview":     func.coalesce(func.nullif(models.Movie.overview, ""), excluded.overview),
+                "release_date": func.coalesce(func.nullif(models.Movie.release_date, ""), excluded.release_date),
+                "vote_average": func.coalesce(func.nullif(models.Movie.vote_average, 0), excluded.vote_average),
+                "genre_mask":   func.coalesce(func.nullif(models.Movie.genre_mask, 0), excluded.genre_mask),
+            },
+        ))
+
+    # ── GET /movies/{user_id}/liked ──────────────────
+    async def get_user_liked_movies(
+        self,
+        user_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        genre: Optional[int] = None,
+    ) -> tuple[list[models.Movie], Optional[str]]:
+        """Лайкнуті фільми, нові першими. Повертає (фільми, курсор наступної сторінки)."""
+        await self._ensure_user_exists(user_id)
+
+        query = self._liked_query(user_id)
+        if genre is not None:
+            query = query.where(self._has_genre(genre))
+        if cursor:
+            liked_at, movie_id = self._decode_cursor(cursor)
+            query = query.where(
+                tuple_(models.likes.c.liked_at, models.likes.c.movie_id) < (liked_at, movie_id)
+            )
+        if limit is not None:
+            # +1 рядок — щоб знати, чи є наступна сторінка
+            query = query.limit(limit + 1)
+
+        rows = (await self.db.execute(query)).all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            movie, liked_at = rows[-1]
+            next_cursor = self._encode_cursor(liked_at, movie.id)
 
-        if not user:
+        return [movie for movie, _ in rows], next_cursor
+
+    # ── GET /movies/{user_id}/liked/export ───────────
+    @classmethod
+    async def stream_user_liked_movies(cls, user_id: int) -> AsyncIterator[str]:
+        """NDJSON експорт усіх лайків: рядки читаються з БД порціями,
+        тому пам'ять не залежить від кількості лайків.
+
+        Без сесії запиту (get_db): вона тримала б своє з'єднання до кінця
+        стріму поруч із з'єднанням rows(), і DB_POOL_SIZE одночасних
+        експортів вичерпували б пул. Перевірка й стрім — кожен у своїй
+        сесії, що повертає з'єднання одразу після використання."""
+        async with new_session() as session:
+            await cls(session)._ensure_user_exists(user_id)
+
+        async def rows():
+            # Відповідь стрімиться вже після виходу з роуту
+            async with new_session() as session:
+                result = await session.stream(
+                    cls._liked_query(user_id).execution_options(yield_per=500)
+                )
+                async for movie, liked_at in result:
+                    item = MovieInDB.model_validate(movie).model_dump()
+                    item["liked_at"] = liked_at.isoformat()
+                    yield json.dumps(item, ensure_ascii=False) + "\n"
+
+        return rows()
+
+    async def _ensure_user_exists(self, user_id: int) -> None:
+        user_exists = await self.db.scalar(
+            select(exists().where(models.User.id == user_id))
+        )
+        if not user_exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
 
-        await self.db.refresh(user, ["liked_movies"])
-        return user.liked_movies
+    # ── GET /movies/{user_id}/genres ─────────────────
+    async def get_top_genres(self, user_id: int, limit: int) -> list[dict]:
+        """Улюблені жанри юзера: скільки лайкнутих фільмів кожного жанру.
+        Всі жанри рахуються одним проходом по лайках юзера."""
+        await self._ensure_user_exists(user_id)
 
-    # ── GET /movies/common/{friend_id} ──────────────
-    async def get_common_movies(self, current_user: models.User, friend_id: int):
-        # Лайки поточного юзера
-        await self.db.refresh(current_user, ["liked_movies"])
-        my_ids = {movie.id for movie in current_user.liked_movies}
+        mask = models.Movie.genre_mask
+        row = (await self.db.execute(
+            select(*(func.count().filter(mask.op("&")(GENRE_BITS[genre_id]) != 0) for genre_id, _ in GENRES))
+            .select_from(models.likes)
+            .join(models.Movie, models.Movie.id == models.likes.c.movie_id)
+            .where(models.likes.c.user_id == user_id, mask != 0)
+        )).one()
 
-        # Лайки друга
-        result = await self.db.execute(
-            select(models.User).where(models.User.id == friend_id)
+        counts = [
+            {"id": genre_id, "name": name, "count": count}
+            for (genre_id, name), count in zip(GENRES, row)
+            if count
+        ]
+        counts.sort(key=lambda item: item["count"], reverse=True)
+        return counts[:limit]
+
+    @staticmethod
+    def _has_genre(genre: int):
+        """Умова "фільм має жанр genre" — побітове І по Movie.genre_mask."""
+        if genre not in GENRE_NAMES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unknown genre"
+            )
+        return models.Movie.genre_mask.op("&")(GENRE_BITS[genre]) != 0
+
+    @staticmethod
+    def _liked_query(user_id: int):
+        # Порядок (liked_at, movie_id) DESC стабільний і йде по ix_likes_user_liked_at
+        return (
+            select(models.Movie, models.likes.c.liked_at)
+            .join(models.likes, models.likes.c.movie_id == models.Movie.id)
+            .where(models.likes.c.user_id == user_id)
+            .order_by(models.likes.c.liked_at.desc(), models.likes.c.movie_id.desc())
         )
-        friend = result.scalars().first()
 
-        if not friend:
+    @staticmethod
+    def _encode_cursor(liked_at: datetime, movie_id: int) -> str:
+        raw = f"{liked_at.isoformat()}|{movie_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            liked_at, movie_id = raw.split("|")
+            return datetime.fromisoformat(liked_at), int(movie_id)
+        except ValueError as exception:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            ) from exception
+
+    # ── GET /movies/common/{friend_id} ──────────────
+    async def get_common_movies(
+        self,
+        current_user: models.User,
+        friend_id: int,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        count_only: bool = False,
+        genre: Optional[int] = None,
+    ):
+        friend_exists = await self.db.scalar(
+            select(exists().where(models.User.id == friend_id))
+        )
+        if not friend_exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Friend not found"
             )
 
-        await self.db.refresh(friend, ["liked_movies"])
+        if genre is None:
+            # Перетин — з індексу лайків у пам'яті; з БД лише сторінка фільмів
+            common_ids = await get_like_index().common(current_user.id, friend_id, self.db)
+            if count_only:
+                return {"count": len(common_ids)}
+            page = common_ids[offset:None if limit is None else offset + limit]
+            movies = []
+            for start in range(0, len(page), self.IN_CHUNK):
+                result = await self.db.execute(
+                    select(models.Movie)
+                    .where(models.Movie.id.in_(page[start:start + self.IN_CHUNK]))
+                    .order_by(models.Movie.id)
+                )
+                movies.extend(result.scalars().all())
+            return movies
+
+        # З жанром перетин рахує SQLite: self-join likes по PK (user_id, movie_id)
+        mine = models.likes.alias("mine")
+        theirs = models.likes.alias("theirs")
+        common = (
+            select(mine.c.movie_id)
+            .join(
+                theirs,
+                and_(theirs.c.movie_id == mine.c.movie_id, theirs.c.user_id == friend_id),
+            )
+            .where(mine.c.user_id == current_user.id)
+            .join(models.Movie, models.Movie.id == mine.c.movie_id)
+            .where(self._has_genre(genre))
+        )
+
+        if count_only:
+            count = await self.db.scalar(
+                select(func.count()).select_from(common.subquery())
+            )
+            return {"count": count}
+
+        query = (
+            select(models.Movie)
+            .where(models.Movie.id.in_(common))
+            .order_by(models.Movie.id)
+            .offset(offset)
+        )
+        if limit is not None:
+            query = query.limit(limit)
 
-        # Перетин
-        return [m for m in friend.liked_movies if m.id in my_ids]
+        result = await self.db.execute(query)
+        return result.scalars().all()
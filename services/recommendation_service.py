@@ -0,0 +1,219 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from functools import lru_cache
+from typing import Iterable
+
+from sqlalchemy import bindparam, delete, exists, func, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from config import get_settings
+from database import get_engine, get_write_engine
+from recommender import compute_neighbors, store_neighbors
+
+LEASE_NAME = "recommendations"
+
+
+class RecommendationRefresher:
+    """Інкрементальне оновлення movie_neighbors після нових лайків/анлайків.
+
+    Лайк (u, m) змінює схожість m з усіма фільмами юзера u, тому в запиті
+    лише ставимо юзера і фільм у чергу (таблиці recommendation_dirty_*,
+    у транзакції лайку), а у фоні перераховуємо списки для m та останніх
+    лайків u (пакетами, не частіше ніж раз на interval). Черга спільна для
+    всіх воркерів; перераховує лише той, хто тримає оренду в background_leases.
+    """
+
+    def __init__(self, interval: float, batch_size: int, seed_likes: int, top_k: int, min_support: int,
+                 lease_ttl: float | None = None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.seed_likes = seed_likes
+        self.top_k = top_k
+        self.min_support = min_support
+        # Лідер продовжує оренду щоінтервалу; якщо процес зник — її забере інший
+        self.lease_ttl = lease_ttl if lease_ttl is not None else 3 * interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.leader = False
+        self._task: asyncio.Task | None = None
+        self.refreshed = 0
+
+    async def mark(self, db: AsyncSession, user_id: int, movie_ids: Iterable[int]) -> None:
+        """Ставить юзера і фільми в чергу. Викликається до commit лайку —
+        черга і лайки змінюються однією транзакцією."""
+        movie_ids = list(movie_ids)
+        if not movie_ids:
+            return
+        await db.execute(
+            sqlite_insert(models.recommendation_dirty_users).values(user_id=user_id).on_conflict_do_nothing()
+        )
+        await self._mark_movies(db, [{"movie_id": movie_id} for movie_id in movie_ids])
+
+    @staticmethod
+    async def _mark_movies(db, rows) -> None:
+        movies = models.recommendation_dirty_movies
+        statement = sqlite_insert(movies)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[movies.c.movie_id], set_={"version": movies.c.version + 1}
+            ),
+            rows,
+        )
+
+    async def acquire_lease(self) -> bool:
+        """Бере або продовжує оренду перерахунку. True — цей процес лідер."""
+        leases = models.background_leases
+        now = time.time()
+        statement = sqlite_insert(leases).values(name=LEASE_NAME, owner=self.owner, expires_at=now + self.lease_ttl)
+        async with get_write_engine().begin() as conn:
+            await conn.execute(statement.on_conflict_do_update(
+                index_elements=[leases.c.name],
+                set_={"owner": statement.excluded.owner, "expires_at": statement.excluded.expires_at},
+                where=or_(leases.c.owner == self.owner, leases.c.expires_at < now),
+            ))
+            owner = await conn.scalar(select(leases.c.owner).where(leases.c.name == LEASE_NAME))
+        self.leader = owner == self.owner
+        return self.leader
+
+    async def release_lease(self) -> None:
+        leases = models.background_leases
+        async with get_write_engine().begin() as conn:
+            await conn.execute(
+                update(leases)
+                .where(leases.c.name == LEASE_NAME, leases.c.owner == self.owner)
+                .values(expires_at=0.0)
+            )
+        self.leader = False
+
+    async def _expand_users(self) -> None:
+        """Юзерів з черги — в їхні останні лайки (одна транзакція писача:
+        лайки, що прийдуть пізніше, знову поставлять юзера в чергу)."""
+        dirty_users = models.recommendation_dirty_users
+        async with get_write_engine().begin() as conn:
+            users = (await conn.execute(select(dirty_users.c.user_id))).scalars().all()
+            for user_id in users:
+                recent = await conn.execute(
+                    select(models.likes.c.movie_id)
+                    .where(models.likes.c.user_id == user_id)
+                    .order_by(models.likes.c.liked_at.desc())
+                    .limit(self.seed_likes)
+                )
+                rows = [{"movie_id": movie_id} for movie_id in recent.scalars()]
+                if rows:
+                    await self._mark_movies(conn, rows)
+            if users:
+                await conn.execute(delete(dirty_users).where(dirty_users.c.user_id.in_(users)))
+
+    async def refresh(self) -> int:
+        """Перераховує до batch_size фільмів з черги. Повертає скільки перераховано.
+        Якщо перерахунок впав, черга не змінюється."""
+        await self._expand_users()
+        dirty_movies = models.recommendation_dirty_movies
+        async with get_engine().connect() as conn:
+            batch = (await conn.execute(
+                select(dirty_movies.c.movie_id, dirty_movies.c.version).limit(self.batch_size)
+            )).all()
+            if not batch:
+                return 0
+            neighbors = await compute_neighbors(conn, [movie_id for movie_id, _ in batch], self.top_k, self.min_support)
+
+        async with get_write_engine().begin() as conn:
+            await store_neighbors(conn, neighbors)
+            # Лише ту версію, що перераховано: позначені під час перерахунку лишаються
+            await conn.execute(
+                delete(dirty_movies).where(
+                    dirty_movies.c.movie_id == bindparam("done_movie_id"),
+                    dirty_movies.c.version == bindparam("done_version"),
+                ),
+                [{"done_movie_id": movie_id, "done_version": version} for movie_id, version in batch],
+            )
+        self.refreshed += len(batch)
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # Інші воркери лише перевіряють оренду: черга в БД спільна
+                if not await self.acquire_lease():
+                    continue
+                while await self.refresh() == self.batch_size and await self.acquire_lease():
+                    pass
+            except Exception as exception:
+                # Наступна спроба — через interval; помилка не зупиняє цикл
+                print(f"Помилка оновлення рекомендацій: {exception!r}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.leader:
+            # Наступний лідер не чекатиме lease_ttl
+            try:
+                await self.release_lease()
+            except Exception as exception:
+                print(f"Не вдалося звільнити оренду рекомендацій: {exception!r}")
+
+    def stats(self) -> dict:
+        return {"leader": self.leader, "refreshed": self.refreshed}
+
+
+@lru_cache
+def get_recommendation_refresher() -> RecommendationRefresher:
+    settings = get_settings()
+    return RecommendationRefresher(
+        interval    = settings.recommend_refresh_interval,
+        batch_size  = settings.recommend_refresh_batch,
+        seed_likes  = settings.recommend_seed_likes,
+        top_k       = settings.recommend_top_k,
+        min_support = settings.recommend_min_support,
+    )
+
+
+class RecommendationService:
+    def __init__(self, db: AsyncSession, refresher: RecommendationRefresher | None = None):
+        self.db = db
+        self.refresher = refresher or get_recommendation_refresher()
+
+    # ── GET /movies/recommended ─────────────────────
+    async def get_recommended(self, user_id: int, limit: int) -> list[models.Movie]:
+        """Фільми, схожі на останні лайки юзера (ще не лайкнуті), найкращі першими.
+        Один запит: сусіди з movie_neighbors по PK, сума схожостей."""
+        neighbors = models.movie_neighbors
+        seeds = (
+            select(models.likes.c.movie_id)
+            .where(models.likes.c.user_id == user_id)
+            .order_by(models.likes.c.liked_at.desc())
+            .limit(self.refresher.seed_likes)
+        )
+        already_liked = exists().where(
+            models.likes.c.user_id == user_id,
+            models.likes.c.movie_id == neighbors.c.neighbor_id,
+        )
+        score = func.sum(neighbors.c.score).label("score")
+        ranked = (
+            select(neighbors.c.neighbor_id, score)
+            .where(neighbors.c.movie_id.in_(seeds), ~already_liked)
+            .group_by(neighbors.c.neighbor_id)
+            .order_by(score.desc(), neighbors.c.neighbor_id)
+            .limit(limit)
+            .subquery()
+        )
+        result = await self.db.execute(
+            select(models.Movie)
+            .join(ranked, ranked.c.neighbor_id == models.Movie.id)
+            .order_by(ranked.c.score.desc(), models.Movie.id)
+        )
+        return list(result.scalars().all())
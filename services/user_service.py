@@ -1,8 +1,15 @@
+import base64
+import json
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, delete, func, or_, and_, case, literal, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 import models
-from auth import auth_service
+from auth import auth_service, get_user_cache
+from like_index import get_like_index
+from services.compatibility_service import CompatibilityService
 
 class UserService:
     def __init__(self, db: AsyncSession):
@@ -12,12 +19,22 @@ class UserService:
     # ---------------- registration ----------------
 
     async def register(self, user_data):
-        result = await self.db.execute(select(models.User).where(models.User.username == user_data.username))
-        if result.scalars().first():
+        # Точковий запит по індексу; "Ann" і "ann" — одне ім'я
+        normalized = models.normalize_username(user_data.username)
+        result = await self.db.execute(select(models.User.id).where(models.User.username_normalized == normalized))
+        if result.first():
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists")
-        new_user = models.User(username=user_data.username, password_hash=auth_service.hash_password(user_data.password))
+        # Закриваємо транзакцію, щоб не тримати лок писача, поки рахується argon2
+        await self.db.rollback()
+        password_hash = await auth_service.hash_password(user_data.password)
+        new_user = models.User(username=user_data.username, password_hash=password_hash)
         self.db.add(new_user)
-        await self.db.commit()
+        try:
+            await self.db.commit()
+        except IntegrityError as exception:
+            # Паралельна реєстрація того самого імені
+            await self.db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists") from exception
         await self.db.refresh(new_user)
         return new_user
 
@@ -26,14 +43,87 @@ class UserService:
     # ---------------- login ----------------
 
     async def authenticate(self, username, password):
-        result = await self.db.execute(select(models.User).where(func.lower(models.User.username) == username.lower()))
+        result = await self.db.execute(
+            select(models.User).where(models.User.username_normalized == models.normalize_username(username))
+        )
         user = result.scalars().first()
-        if not user or not auth_service.verify_password(password, user.password_hash):
+        if not user or not await auth_service.verify_password(password, user.password_hash):
             return None
         return user
 
 
 
+    # ---------------- search ----------------
+
+    async def search(self, query: str, limit: int, cursor: str | None = None):
+        """Пошук за частиною імені. Повертає (юзери, курсор наступної сторінки)."""
+        query = query.strip()
+        if not query:
+            return [], None
+
+        # Префікс — діапазон по унікальному індексу username_normalized
+        prefix = models.normalize_username(query)
+        name = models.User.username_normalized
+        is_prefix = and_(name >= prefix, name < prefix + "\U0010ffff")
+        after = self._decode_search_cursor(cursor) if cursor else None
+
+        if len(query) >= 3:
+            # Кандидати з trigram індексу; фраза в лапках — без синтаксису FTS
+            phrase = '"' + query.replace('"', '""') + '"'
+            matches = models.User.id.in_(
+                select(models.users_fts.c.rowid).where(models.users_fts.c.username.op("MATCH")(phrase))
+            )
+            # 0 — ім'я починається з query, 1 — містить query
+            rank = case((is_prefix, 0), else_=1)
+            statement = select(models.User, rank, name).where(matches)
+            if after is not None:
+                statement = statement.where(tuple_(rank, name, models.User.id) > after)
+            result = await self.db.execute(statement.order_by(rank, name, models.User.id).limit(limit + 1))
+            rows = result.all()
+        else:
+            # 1–2 символи — триграм ще немає. Спершу імена, що починаються з
+            # query (діапазон індексу), далі сторінку добирають імена, що
+            # містять query (перебір індексу імен до limit збігів)
+            rows = []
+            if after is None or after[0] == 0:
+                rows = await self._search_rank(0, is_prefix, after, limit + 1)
+            if len(rows) <= limit:
+                # instr > 1 — збіг не на початку імені (префікси вже вище)
+                contains = func.instr(name, prefix) > 1
+                after_contains = after if after is not None and after[0] == 1 else None
+                rows += await self._search_rank(1, contains, after_contains, limit + 1 - len(rows))
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_user, last_rank, last_name = rows[-1]
+            raw = json.dumps([last_rank, last_name, last_user.id])
+            next_cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+
+        return [user for user, _, _ in rows], next_cursor
+
+    async def _search_rank(self, rank: int, matches, after: tuple[int, str, int] | None, limit: int):
+        """Рядки (юзер, rank, ім'я) одного рангу в порядку індексу імен."""
+        name = models.User.username_normalized
+        statement = select(models.User, literal(rank), name).where(matches)
+        if after is not None:
+            statement = statement.where(tuple_(name, models.User.id) > (after[1], after[2]))
+        result = await self.db.execute(statement.order_by(name, models.User.id).limit(limit))
+        return result.all()
+
+    @staticmethod
+    def _decode_search_cursor(cursor: str) -> tuple[int, str, int]:
+        """[rank, ім'я, id] з курсора search; будь-що інше — 400."""
+        try:
+            after_rank, after_name, after_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError) as exception:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from exception
+        if not (type(after_rank) is int and isinstance(after_name, str) and type(after_id) is int):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        return after_rank, after_name, after_id
+
+
+
     # ---------------- get_user ----------------
 
     async def get_by_id(self, user_id: int):
@@ -52,7 +142,13 @@ class UserService:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this user")
         user = await self.get_by_id(target_id)
         await self.db.delete(user)
+        # У тій самій транзакції: інакше у друзів лишаються рядки сумісності
+        # з видаленим акаунтом
+        await CompatibilityService(self.db).user_deleted(target_id)
         await self.db.commit()
+        # Видалений акаунт має одразу отримувати 401
+        get_user_cache().invalidate_user(target_id)
+        get_like_index().forget(target_id)
 
 
 
@@ -97,6 +193,17 @@ class FriendshipService:
         if not request:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pending request not found")
         request.is_accepted = True
+        # Прийнята дружба зберігається двома рядками (A→B і B→A),
+        # щоб список друзів читався одним запитом по PK (user_id, ...)
+        await self.db.execute(
+            sqlite_insert(models.Friendship)
+            .values(user_id=user_id, friend_id=sender_id, is_accepted=True)
+            .on_conflict_do_update(
+                index_elements=[models.Friendship.user_id, models.Friendship.friend_id],
+                set_={"is_accepted": True},
+            )
+        )
+        await CompatibilityService(self.db).friendship_accepted(user_id, sender_id)
         await self.db.commit()
         return {"message": "Friend request accepted"}
 
@@ -105,15 +212,90 @@ class FriendshipService:
     # ---------------- get_my_friends ----------------
 
     async def get_friends(self, user_id: int):
-        result = await self.db.execute(select(models.Friendship).where(
-            and_(models.Friendship.is_accepted == True, or_(models.Friendship.user_id == user_id, models.Friendship.friend_id == user_id))
-        ))
-        friendships = result.scalars().all()
-        ids = [friendship.friend_id if friendship.user_id == user_id else friendship.user_id for friendship in friendships]
-        if not ids:
-            return []
-        users_result = await self.db.execute(select(models.User).where(models.User.id.in_(ids)))
-        return users_result.scalars().all()
+        result = await self.db.execute(
+            select(models.User).join(models.Friendship, models.User.id == models.Friendship.friend_id)
+            .where(and_(models.Friendship.user_id == user_id, models.Friendship.is_accepted == True))
+        )
+        return result.scalars().all()
+
+
+
+    # ---------------- get_friends_overview ----------------
+
+    async def get_overview(self, user_id: int, limit: int, offset: int, posters: int = 3, sort: str = "username"):
+        # 1. Сторінка друзів (+1 рядок — щоб знати, чи є наступна) разом із
+        #    friend_compatibility: кількість спільних лайків і % збігу смаків
+        fc = models.friend_compatibility
+        if sort == "match":
+            # Рядки є лише для прийнятих дружб — діапазон індексу (user_id, score)
+            query = (
+                select(models.User, fc.c.common_count, fc.c.score)
+                .join(fc, fc.c.friend_id == models.User.id)
+                .where(fc.c.user_id == user_id)
+                .order_by(fc.c.score.desc(), fc.c.friend_id.desc())
+            )
+        else:
+            query = (
+                select(models.User, fc.c.common_count, fc.c.score)
+                .join(models.Friendship, models.User.id == models.Friendship.friend_id)
+                .outerjoin(fc, and_(fc.c.user_id == user_id, fc.c.friend_id == models.User.id))
+                .where(and_(models.Friendship.user_id == user_id, models.Friendship.is_accepted == True))
+                .order_by(models.User.username, models.User.id)
+            )
+        result = await self.db.execute(query.limit(limit + 1).offset(offset))
+        rows = result.all()
+        next_offset = offset + limit if len(rows) > limit else None
+        rows = rows[:limit]
+        if not rows:
+            return {"items": [], "next_offset": None}
+        friends = [friend for friend, _, _ in rows]
+        common_count = {friend.id: common or 0 for friend, common, _ in rows}
+        match = {friend.id: round((score or 0.0) * 100, 1) for friend, _, score in rows}
+        ids = [friend.id for friend in friends]
+
+        # 2. Кількість лайків кожного друга — з індексу лайків
+        #    (кого немає в пам'яті — один запит на всіх)
+        likes_count = await get_like_index().counts(ids, self.db)
+
+        mine = models.likes.alias("mine")
+        theirs = models.likes.alias("theirs")
+
+        # 3. Кілька постерів спільних фільмів — ROW_NUMBER() по кожному другу
+        rank = func.row_number().over(
+            partition_by=theirs.c.user_id,
+            order_by=(theirs.c.liked_at.desc(), theirs.c.movie_id.desc()),
+        ).label("rank")
+        ranked = (
+            select(theirs.c.user_id, models.Movie.poster_url, models.Movie.poster_path, rank)
+            .join(mine, and_(mine.c.movie_id == theirs.c.movie_id, mine.c.user_id == user_id))
+            .join(models.Movie, models.Movie.id == theirs.c.movie_id)
+            .where(theirs.c.user_id.in_(ids))
+            .where(or_(models.Movie.poster_url.is_not(None), models.Movie.poster_path.is_not(None)))
+            .subquery()
+        )
+        result = await self.db.execute(
+            select(ranked.c.user_id, ranked.c.poster_url, ranked.c.poster_path)
+            .where(ranked.c.rank <= posters)
+            .order_by(ranked.c.user_id, ranked.c.rank)
+        )
+        common_posters: dict[int, list[str]] = {}
+        for friend_id, poster_url, poster_path in result.all():
+            common_posters.setdefault(friend_id, []).append(
+                poster_url or f"https://image.tmdb.org/t/p/w500{poster_path}"
+            )
+
+        items = [
+            {
+                "id": friend.id,
+                "username": friend.username,
+                "likes_count": likes_count.get(friend.id, 0),
+                "common_count": common_count[friend.id],
+                "match_percent": match[friend.id],
+                "common_posters": common_posters.get(friend.id, []),
+            }
+            for friend in friends
+        ]
+        return {"items": items, "next_offset": next_offset}
 
 
 
@@ -131,14 +313,14 @@ class FriendshipService:
     # ---------------- remove_friendship ----------------
 
     async def remove_friendship(self, user_id: int, friend_id: int):
-        result = await self.db.execute(select(models.Friendship).where(
+        # Обидва напрямки: прийнята дружба — два рядки, запит — один
+        result = await self.db.execute(delete(models.Friendship).where(
             or_(
                 and_(models.Friendship.user_id == user_id, models.Friendship.friend_id == friend_id),
                 and_(models.Friendship.user_id == friend_id, models.Friendship.friend_id == user_id)
             )
         ))
-        friendship = result.scalars().first()
-        if not friendship:
+        if not result.rowcount:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Friendship not found")
-        await self.db.delete(friendship)
+        await CompatibilityService(self.db).friendship_removed(user_id, friend_id)
         await self.db.commit()
@@ -84,6 +84,7 @@ declare -A PACKAGES=(
     ["pydantic_settings"]="pydantic_settings==2.12.0"
     ["multipart"]="python-multipart==0.0.9"
     ["requests"]="requests==2.32.5"
+    ["httpx"]="httpx==0.28.1"
     ["greenlet"]="greenlet"
 )
 
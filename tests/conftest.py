@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+
+# Налаштування читаються при першому get_settings(); справжні ключі тестам не потрібні
+os.environ.setdefault("SECRET_KEY", "test-secret-key-not-for-production")
+os.environ.setdefault("TMDB_API_KEY", "test")
+
+import pytest
+import uvicorn
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import database
+from benchmarks import fake_tmdb
+from config import get_settings
+from migrations import upgrade_schema
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """Порожня БД з актуальною схемою (upgrade_schema, як при старті додатку)."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await upgrade_schema(conn)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def app_db(tmp_path, monkeypatch):
+    """Те саме, але через рушії додатку (get_engine / get_write_engine /
+    new_session) — для коду, що відкриває з'єднання сам."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    get_settings.cache_clear()
+    for name in ("_engine", "_write_engine", "_session_factory", "_write_session_factory"):
+        monkeypatch.setattr(database, name, None)
+    async with database.get_write_engine().begin() as conn:
+        await upgrade_schema(conn)
+    yield database.get_engine()
+    await database.dispose_engines()
+    get_settings.cache_clear()
+
+
+@pytest.fixture(scope="module")
+def fake_tmdb_server():
+    """benchmarks/fake_tmdb.py на вільному порту в окремому потоці:
+    власний event loop, тож затримки сервера не залежать від клієнта.
+    Повертає адресу сервера; TMDB API — під /3, лічильник запитів — /stats."""
+    app = fake_tmdb.create_app(movies=1000, latency=0.2, jitter=0.0, error_rate=0.0)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("fake TMDB не запустився")
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=10)
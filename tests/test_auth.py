@@ -0,0 +1,62 @@
+"""Видалений акаунт: ендпоінти запису перечитують рядок юзера в сесії
+писача, тож кеш рядків іншого воркера не пропускає видаленого юзера."""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete
+
+import database
+import models
+from auth import auth_service, get_current_user, get_current_write_user, get_user_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def user_token(app_db):
+    get_user_cache.cache_clear()
+    async with database.new_write_session() as session:
+        user = models.User(username="alice", password_hash="x")
+        session.add(user)
+        await session.commit()
+        user_id = user.id
+    yield user_id, auth_service.create_access_token({"sub": str(user_id)})
+    get_user_cache.cache_clear()
+
+
+async def delete_elsewhere(user_id: int) -> None:
+    """Видалення в іншому воркері: кеш цього процесу про нього не знає."""
+    async with database.get_write_engine().begin() as conn:
+        await conn.execute(delete(models.User).where(models.User.id == user_id))
+
+
+async def test_write_user_bypasses_row_cache(user_token):
+    user_id, token = user_token
+    async with database.new_session() as session:
+        assert (await get_current_user(token, session)).id == user_id
+    assert get_user_cache().get_user(user_id) is not None
+
+    await delete_elsewhere(user_id)
+
+    async with database.new_write_session() as session:
+        with pytest.raises(HTTPException) as raised:
+            await get_current_write_user(token, session)
+    assert raised.value.status_code == 401
+
+
+async def test_write_user_loads_row_in_writer_session(user_token):
+    user_id, token = user_token
+    async with database.new_write_session() as session:
+        user = await get_current_write_user(token, session)
+        assert user.id == user_id
+        assert user in session
+
+
+async def test_tombstone_rejects_both_paths(user_token):
+    user_id, token = user_token
+    get_user_cache().invalidate_user(user_id)
+    async with database.new_session() as session:
+        with pytest.raises(HTTPException):
+            await get_current_user(token, session)
+    async with database.new_write_session() as session:
+        with pytest.raises(HTTPException):
+            await get_current_write_user(token, session)
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import catalog
+from benchmarks.fake_tmdb import fake_movie
+from catalog import PAGE_SIZE, MovieCatalog, read_dump
+from get_movie_info import TMDBClient
+
+pytestmark = pytest.mark.anyio
+
+MATRIX = ["The Matrix", "The Matrix Reloaded", "Matrix Revolutions"]
+
+
+def synthetic_dump() -> list[dict]:
+    """50 звичайних фільмів (популярність = id), три «Матриці» на верху
+    popular і два, які імпорт має пропустити (18+ і без назви)."""
+    movies = [
+        {"id": movie_id, "title": f"Movie {movie_id}", "release_date": f"{2000 + movie_id % 3}-05-01",
+         "popularity": float(movie_id), "genre_ids": [28, 18], "vote_average": 7.0}
+        for movie_id in range(1, 51)
+    ]
+    movies += [
+        {"id": 100 + number, "title": title, "release_date": "1999-03-31", "popularity": 1000.0 - number}
+        for number, title in enumerate(MATRIX)
+    ]
+    movies.append({"id": 200, "title": "Adult", "adult": True, "popularity": 5000.0})
+    movies.append({"id": 201, "title": "", "popularity": 5000.0})
+    return movies
+
+
+def write_dump(path, movies: list[dict], fmt: str) -> None:
+    with open(path, "w", encoding="utf-8") as dump:
+        if fmt == "ndjson":
+            dump.writelines(json.dumps(movie) + "\n" for movie in movies)
+        elif fmt == "array":
+            json.dump(movies, dump)
+        else:
+            json.dump({"page": 1, "results": movies}, dump)
+
+
+@pytest.fixture
+def movie_catalog(tmp_path):
+    path = tmp_path / "movies.ndjson"
+    write_dump(path, synthetic_dump(), "ndjson")
+    store = MovieCatalog(str(tmp_path / "catalog.db"))
+    assert store.import_movies(read_dump(str(path))) == 53
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "array", "results"])
+def test_read_dump_formats(tmp_path, fmt):
+    path = tmp_path / f"movies.{fmt}"
+    write_dump(path, synthetic_dump(), fmt)
+    assert [movie["id"] for movie in read_dump(str(path))] == [movie["id"] for movie in synthetic_dump()]
+
+
+async def test_popular_pages(movie_catalog):
+    first = await movie_catalog.get_movies(None, None, 1)
+    assert first["total_results"] == 53
+    assert first["total_pages"] == 3
+    assert [movie["id"] for movie in first["results"][:4]] == [100, 101, 102, 50]
+    assert len(first["results"]) == PAGE_SIZE
+    assert sorted(first["results"][3]["genre_ids"]) == [18, 28]
+
+    last = await movie_catalog.get_movies(None, None, 3)
+    assert len(last["results"]) == 53 - 2 * PAGE_SIZE
+    assert last["results"][-1]["id"] == 1
+    # За межами каталогу — None, тобто питати TMDB
+    assert await movie_catalog.get_movies(None, None, 4) is None
+    assert await movie_catalog.get_movies(None, None, 0) is None
+
+
+async def test_discover_by_year(movie_catalog):
+    in_2001 = sorted((movie_id for movie_id in range(1, 51) if movie_id % 3 == 1), reverse=True)
+    first = await movie_catalog.get_movies(None, 2001, 1)
+    assert first["total_results"] == len(in_2001) == 17
+    assert first["total_pages"] == 1
+    assert [movie["id"] for movie in first["results"]] == in_2001
+    assert await movie_catalog.get_movies(None, 1980, 1) is None
+
+
+async def test_search_by_title_prefix(movie_catalog):
+    found = await movie_catalog.get_movies("matr", None, 1)
+    assert [movie["title"] for movie in found["results"]] == MATRIX
+    assert (found["total_results"], found["total_pages"]) == (3, 1)
+
+    reloaded = await movie_catalog.get_movies("Matrix reload", None, 1)
+    assert [movie["id"] for movie in reloaded["results"]] == [101]
+    assert (await movie_catalog.get_movies("matrix", 1999, 1))["total_results"] == 3
+    assert await movie_catalog.get_movies("matrix", 2001, 1) is None
+    assert await movie_catalog.get_movies("casablanca", None, 1) is None
+
+
+async def test_search_many_matches_by_popularity_index(movie_catalog, monkeypatch):
+    # Понад SEARCH_SCAN_THRESHOLD збігів запит іде індексом популярності; результат той самий
+    by_rowid = await movie_catalog.get_movies("movie", None, 2)
+    monkeypatch.setattr(catalog, "SEARCH_SCAN_THRESHOLD", 1)
+    by_index = await movie_catalog.get_movies("movie", None, 2)
+    assert by_index == by_rowid
+    assert (by_index["total_results"], by_index["total_pages"]) == (50, 3)
+    assert [movie["id"] for movie in by_index["results"]] == list(range(30, 10, -1))
+
+
+async def test_client_falls_through_to_tmdb(movie_catalog):
+    upstream: list[httpx.URL] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream.append(request.url)
+        found = (901, 902) if request.url.params["query"] == "bench movie" else ()
+        return httpx.Response(200, json={
+            "page": 1, "results": [fake_movie(movie_id) for movie_id in found],
+            "total_pages": 1, "total_results": len(found),
+        })
+
+    client = TMDBClient(api_key="test", catalog=movie_catalog)
+    await client.session.aclose()
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        # Каталог відповідає сам; TMDB — лише фонове оновлення, раз на ключ
+        local = await client.get_movies(name="matrix")
+        assert [movie["id"] for movie in local["results"]] == [100, 101, 102]
+        assert local["results"][0]["poster_url"] is None
+        await client.get_movies(name="matrix")
+        await asyncio.gather(*client._background)
+        assert len(upstream) == 1
+
+        # Нічого не знайдено в каталозі — відповідь TMDB, і каталог її запам'ятовує
+        remote = await client.get_movies(name="bench movie")
+        assert [movie["id"] for movie in remote["results"]] == [901, 902]
+        assert len(upstream) == 2
+        assert upstream[-1].path == "/3/search/movie"
+        cached = await movie_catalog.get_movies("bench movie", None, 1)
+        assert [movie["id"] for movie in cached["results"]] == [901, 902]
+        assert movie_catalog.stats()["movies"] == 55
+    finally:
+        client.catalog = None  # каталог закриває фікстура
+        await client.aclose()
@@ -0,0 +1,116 @@
+"""friend_compatibility, що підтримується інкрементально (лайки, анлайки,
+likes:batch, прийняття і видалення дружби), має збігатися з повним
+перерахунком FRIEND_COMPATIBILITY_BACKFILL."""
+import random
+
+import pytest
+from sqlalchemy import delete, or_, select, text
+
+import database
+import models
+from migrations import FRIEND_COMPATIBILITY_BACKFILL
+from schemas import LikesBatch, MoviePublic
+from services.movie_service import MovieService
+from services.user_service import FriendshipService, UserService
+
+pytestmark = pytest.mark.anyio
+
+USERS = 8
+MOVIES = 25
+
+
+def movie(movie_id: int) -> MoviePublic:
+    return MoviePublic(id=movie_id, movie_name=f"Movie {movie_id}")
+
+
+async def create_users() -> list[int]:
+    async with database.new_write_session() as session:
+        users = [models.User(username=f"user{i}", password_hash="x") for i in range(USERS)]
+        session.add_all(users)
+        await session.commit()
+        return [user.id for user in users]
+
+
+async def stored() -> list[tuple]:
+    fc = models.friend_compatibility
+    async with database.get_engine().connect() as conn:
+        rows = await conn.execute(select(fc).order_by(fc.c.user_id, fc.c.friend_id))
+        return [tuple(row) for row in rows]
+
+
+async def backfilled() -> list[tuple]:
+    """Повний перерахунок у транзакції, що відкочується."""
+    fc = models.friend_compatibility
+    async with database.get_write_engine().connect() as conn:
+        transaction = await conn.begin()
+        await conn.execute(delete(fc))
+        await conn.execute(text(FRIEND_COMPATIBILITY_BACKFILL))
+        rows = [tuple(row) for row in await conn.execute(select(fc).order_by(fc.c.user_id, fc.c.friend_id))]
+        await transaction.rollback()
+        return rows
+
+
+def assert_same(actual: list[tuple], expected: list[tuple]) -> None:
+    assert [row[:4] for row in actual] == [row[:4] for row in expected]
+    assert [row[4] for row in actual] == pytest.approx([row[4] for row in expected])
+
+
+async def random_history(user_ids: list[int], steps: int = 150, seed: int = 3) -> None:
+    rng = random.Random(seed)
+    accepted: set[frozenset] = set()
+    for step in range(steps):
+        user_id = rng.choice(user_ids)
+        async with database.new_write_session() as session:
+            user = await session.get(models.User, user_id)
+            action = rng.random()
+            if action < 0.35:
+                await MovieService(session).like_movie(movie(rng.randint(1, MOVIES)), user)
+            elif action < 0.7:
+                # Лайки й анлайки можуть перетинатися: лайк і анлайк одного
+                # фільму в батчі взаємно скасовуються
+                batch = LikesBatch(
+                    like=[movie(rng.randint(1, MOVIES)) for _ in range(rng.randint(0, 5))],
+                    unlike=[rng.randint(1, MOVIES) for _ in range(rng.randint(0, 5))],
+                )
+                await MovieService(session).apply_likes_batch(batch, user)
+            else:
+                friend_id = rng.choice([other for other in user_ids if other != user_id])
+                pair = frozenset((user_id, friend_id))
+                friendships = FriendshipService(session)
+                if pair in accepted:
+                    await friendships.remove_friendship(user_id, friend_id)
+                    accepted.discard(pair)
+                else:
+                    await friendships.send_request(user_id, friend_id)
+                    await friendships.accept_request(friend_id, user_id)
+                    accepted.add(pair)
+        if step % 25 == 0:
+            assert_same(await stored(), await backfilled())
+
+
+async def test_incremental_updates_match_backfill(app_db):
+    user_ids = await create_users()
+    await random_history(user_ids)
+    rows = await stored()
+    assert rows, "історія має лишити хоча б одну дружбу"
+    assert_same(rows, await backfilled())
+
+
+async def test_delete_user_removes_compatibility_rows(app_db):
+    user_ids = await create_users()
+    await random_history(user_ids)
+    fc = models.friend_compatibility
+    counts: dict[int, int] = {}
+    for user_id, *_ in await stored():
+        counts[user_id] = counts.get(user_id, 0) + 1
+    target = max(counts, key=counts.get)
+    before = await stored()
+
+    async with database.new_write_session() as session:
+        await UserService(session).delete_user(target, target)
+
+    async with database.get_engine().connect() as conn:
+        left = await conn.scalar(select(fc.c.user_id).where(or_(fc.c.user_id == target, fc.c.friend_id == target)))
+    assert left is None
+    # Пари інших юзерів не змінюються: спільних лайків з видаленим у них немає
+    assert await stored() == [row for row in before if target not in row[:2]]
@@ -0,0 +1,45 @@
+"""NDJSON експорт лайків: без сесії запиту, з'єднання пулу зайняте лише
+під час перевірки юзера і самого стріму."""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+import database
+import models
+from services.movie_service import MovieService
+
+pytestmark = pytest.mark.anyio
+
+
+async def seed_likes(count: int) -> None:
+    async with database.get_write_engine().begin() as conn:
+        await conn.execute(insert(models.User), [{"id": 1, "username": "alice", "password_hash": "x"}])
+        await conn.execute(insert(models.Movie), [
+            {"id": movie_id, "movie_name": f"Movie {movie_id}"} for movie_id in range(1, count + 1)
+        ])
+        await conn.execute(insert(models.likes), [
+            {"user_id": 1, "movie_id": movie_id, "liked_at": datetime(2024, 1, 1) + timedelta(minutes=movie_id * 7 % count)}
+            for movie_id in range(1, count + 1)
+        ])
+
+
+async def test_export_holds_no_connection_until_streamed(app_db):
+    await seed_likes(1200)
+    rows = await MovieService.stream_user_liked_movies(1)
+    assert app_db.pool.checkedout() == 0
+
+    lines = [json.loads(line) async for line in rows]
+    assert app_db.pool.checkedout() == 0
+    assert len(lines) == 1200
+    # Нові лайки першими, як у /movies/{user_id}/liked
+    assert [line["liked_at"] for line in lines] == sorted((line["liked_at"] for line in lines), reverse=True)
+
+
+async def test_export_unknown_user(app_db):
+    with pytest.raises(HTTPException) as raised:
+        await MovieService.stream_user_liked_movies(404)
+    assert raised.value.status_code == 404
+    assert app_db.pool.checkedout() == 0
@@ -0,0 +1,78 @@
+"""EXPLAIN QUERY PLAN для запитів дружби: кожен доступ до user_friends —
+пошук індексом, без SCAN. Плани беруться з тих SQL, що реально виконують
+методи FriendshipService, на схемі з upgrade_schema."""
+import re
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.user_service import FriendshipService
+
+pytestmark = pytest.mark.anyio
+
+
+async def query_plans(engine, call) -> list[list[str]]:
+    """Виконує call(FriendshipService) і повертає план кожного SELECT/DELETE."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with AsyncSession(engine) as session:
+            try:
+                await call(FriendshipService(session))
+            except HTTPException:
+                pass  # 404 / 400 — запит уже виконано
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    plans = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans.append([row[-1] for row in rows])
+    return plans
+
+
+def friends_lines(plan: list[str]) -> list[str]:
+    return [line for line in plan if "user_friends" in line]
+
+
+async def test_get_friends_uses_primary_key(engine):
+    [plan] = await query_plans(engine, lambda service: service.get_friends(1))
+    assert friends_lines(plan) == [
+        "SEARCH user_friends USING INDEX sqlite_autoindex_user_friends_1 (user_id=?)"
+    ]
+    assert "SEARCH users USING INTEGER PRIMARY KEY (rowid=?)" in plan
+    assert not any(line.startswith("SCAN") for line in plan)
+
+
+async def test_get_incoming_uses_covering_index(engine):
+    [plan] = await query_plans(engine, lambda service: service.get_incoming(1))
+    assert friends_lines(plan) == [
+        "SEARCH user_friends USING COVERING INDEX ix_user_friends_friend_accepted (friend_id=? AND is_accepted=?)"
+    ]
+    assert "SEARCH users USING INTEGER PRIMARY KEY (rowid=?)" in plan
+    assert not any(line.startswith("SCAN") for line in plan)
+
+
+@pytest.mark.parametrize("method", ["send_request", "remove_friendship"])
+async def test_pair_lookup_searches_both_directions_by_key(engine, method):
+    plans = await query_plans(engine, lambda service: getattr(service, method)(1, 2))
+    # Перший запит — пошук пари (A, B) або (B, A)
+    plan = plans[0]
+    assert "MULTI-INDEX OR" in plan
+    lines = friends_lines(plan)
+    assert len(lines) == 2
+    for line in lines:
+        # DELETE читає лише ключ — той самий індекс стає покривним
+        assert re.fullmatch(
+            r"SEARCH user_friends USING (COVERING )?INDEX sqlite_autoindex_user_friends_1"
+            r" \(user_id=\? AND friend_id=\?\)",
+            line,
+        )
@@ -0,0 +1,35 @@
+"""LikeIndex: знімок сесії, старший за зміну лайків, не кешується; новий
+екземпляр індексу не додає слухачів до Session."""
+import pytest
+from sqlalchemy import event, insert
+
+import database
+import models
+from like_index import LikeIndex
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_instances_do_not_register_listeners(monkeypatch):
+    registered = []
+    monkeypatch.setattr(event, "listen", lambda *args, **kwargs: registered.append(args))
+    for _ in range(5):
+        LikeIndex(maxsize=10, ttl=60)
+    assert registered == []
+
+
+async def test_stale_session_snapshot_is_not_cached(app_db):
+    index = LikeIndex(maxsize=10, ttl=60)
+    async with database.new_session() as reader:
+        # Транзакція читача почалась до лайку, записаного цим воркером
+        await reader.connection()
+        async with database.get_write_engine().begin() as conn:
+            await conn.execute(insert(models.likes), [{"user_id": 1, "movie_id": 7}])
+        index.added(1, [7])
+
+        await index.get(1, reader)
+        assert index.users.peek(1) is None
+
+    async with database.new_session() as reader:
+        assert list(await index.get(1, reader)) == [7]
+        assert list(index.users.peek(1)) == [7]
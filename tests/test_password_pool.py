@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+
+from auth import PasswordHasherPool
+
+pytestmark = pytest.mark.anyio
+
+
+class BlockingHash:
+    """Замість argon2: hash() чекає, поки тест не відпустить потік."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def hash(self, password: str) -> str:
+        self.calls += 1
+        self.release.wait(5)
+        return f"hashed:{password}"
+
+
+async def test_cancelled_queued_jobs_leave_the_queue():
+    hasher = BlockingHash()
+    pool = PasswordHasherPool(hasher, max_workers=1)
+    try:
+        tasks = [asyncio.ensure_future(pool.hash(f"p{number}")) for number in range(5)]
+        await asyncio.sleep(0.05)
+        assert pool.stats()["active"] == 1
+        assert pool.stats()["queued"] == 4
+
+        # Клієнти, що чекали в черзі, відключились
+        for task in tasks[1:]:
+            task.cancel()
+        await asyncio.gather(*tasks[1:], return_exceptions=True)
+        assert pool.stats()["queued"] == 0
+
+        hasher.release.set()
+        assert await tasks[0] == "hashed:p0"
+    finally:
+        hasher.release.set()
+        pool.shutdown()
+
+    assert hasher.calls == 1
+    stats = pool.stats()
+    assert (stats["active"], stats["queued"], stats["completed"]) == (0, 0, 1)
+
+
+async def test_cancelling_a_running_job_keeps_counters_consistent():
+    hasher = BlockingHash()
+    pool = PasswordHasherPool(hasher, max_workers=1)
+    try:
+        task = asyncio.ensure_future(pool.hash("p"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        hasher.release.set()
+        # Потік доробляє хеш; результат нікому не потрібен, але лічильники сходяться
+        for _ in range(100):
+            if pool.stats()["completed"]:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        hasher.release.set()
+        pool.shutdown()
+
+    assert pool.stats()["queued"] == 0
+    assert pool.stats()["active"] == 0
+    assert pool.stats()["completed"] == 1
@@ -0,0 +1,163 @@
+import random
+
+import pytest
+from sqlalchemy import delete, func, insert, select, text
+
+import database
+import models
+from migrations import upgrade_schema
+from recommender import LikesMatrix, compute_neighbors
+from services import recommendation_service
+from services.recommendation_service import RecommendationRefresher
+
+pytestmark = pytest.mark.anyio
+
+TOP_K = 5
+
+
+def random_likes(users: int = 40, movies: int = 30, seed: int = 7) -> list[tuple[int, int]]:
+    rng = random.Random(seed)
+    return sorted({(user_id, rng.randint(1, movies))
+                   for user_id in range(1, users + 1) for _ in range(rng.randint(1, 8))})
+
+
+def expected_neighbors(likes: list[tuple[int, int]]) -> dict:
+    matrix = LikesMatrix()
+    for user_id, movie_id in likes:
+        matrix.add(user_id, movie_id)
+    return dict(matrix.neighbors(TOP_K))
+
+
+def refresher(**overrides) -> RecommendationRefresher:
+    options = dict(interval=1.0, batch_size=100, seed_likes=50, top_k=TOP_K, min_support=1)
+    return RecommendationRefresher(**{**options, **overrides})
+
+
+async def insert_likes(likes: list[tuple[int, int]]) -> None:
+    async with database.get_write_engine().begin() as conn:
+        await conn.execute(insert(models.likes), [{"user_id": u, "movie_id": m} for u, m in likes])
+
+
+async def stored_neighbors() -> dict:
+    async with database.get_engine().connect() as conn:
+        rows = await conn.execute(select(models.movie_neighbors).order_by(
+            models.movie_neighbors.c.movie_id, models.movie_neighbors.c.score.desc(),
+            models.movie_neighbors.c.neighbor_id))
+    stored: dict = {}
+    for movie_id, neighbor_id, score in rows:
+        stored.setdefault(movie_id, []).append((neighbor_id, score))
+    return stored
+
+
+def assert_same(actual: dict, expected: dict) -> None:
+    assert set(actual) == {movie_id for movie_id, items in expected.items() if items}
+    for movie_id, items in actual.items():
+        assert [n for n, _ in items] == [n for n, _ in expected[movie_id]]
+        assert [s for _, s in items] == pytest.approx([s for _, s in expected[movie_id]])
+
+
+async def test_compute_neighbors_matches_full_build(app_db):
+    likes = random_likes()
+    await insert_likes(likes)
+    expected = expected_neighbors(likes)
+    async with app_db.connect() as conn:
+        computed = await compute_neighbors(conn, [*expected, 999], TOP_K)
+    assert computed.pop(999) == []
+    assert_same({movie_id: items for movie_id, items in computed.items() if items}, expected)
+
+
+async def test_marked_likes_are_refreshed_from_the_shared_queue(app_db):
+    likes = random_likes()
+    await insert_likes(likes)
+    worker = refresher()
+    # Щойно прийшли лайки юзера 3
+    async with database.new_write_session() as session:
+        await worker.mark(session, 3, [movie_id for user_id, movie_id in likes if user_id == 3])
+        await session.commit()
+
+    assert await worker.refresh() > 0
+    stored = await stored_neighbors()
+    expected = expected_neighbors(likes)
+    touched = {m for u, m in likes if u == 3}
+    assert_same({m: stored[m] for m in touched if m in stored}, {m: expected[m] for m in touched})
+
+    async with app_db.connect() as conn:
+        assert await conn.scalar(select(models.recommendation_dirty_movies.c.movie_id)) is None
+        assert await conn.scalar(select(models.recommendation_dirty_users.c.user_id)) is None
+
+
+async def test_movie_marked_during_refresh_stays_queued(app_db, monkeypatch):
+    await insert_likes(random_likes())
+    worker = refresher()
+    async with database.new_write_session() as session:
+        await worker.mark(session, 1, [5, 6])
+        await session.commit()
+
+    original = recommendation_service.compute_neighbors
+
+    async def compute_then_like(conn, movie_ids, top_k, min_support=1):
+        result = await original(conn, movie_ids, top_k, min_support)
+        # Новий лайк фільму 5, поки список перераховувався
+        async with database.new_write_session() as session:
+            await worker.mark(session, 2, [5])
+            await session.commit()
+        return result
+
+    monkeypatch.setattr(recommendation_service, "compute_neighbors", compute_then_like)
+    await worker.refresh()
+    async with app_db.connect() as conn:
+        queued = (await conn.execute(select(models.recommendation_dirty_movies.c.movie_id))).scalars().all()
+    assert queued == [5]
+
+
+async def test_only_one_process_holds_the_lease(app_db):
+    first, second = refresher(lease_ttl=60), refresher(lease_ttl=60)
+    assert await first.acquire_lease()
+    assert not await second.acquire_lease()
+    # Продовження власної оренди
+    assert await first.acquire_lease()
+
+    await first.release_lease()
+    assert await second.acquire_lease()
+    assert not await first.acquire_lease()
+
+
+async def test_expired_lease_is_taken_over(app_db):
+    first, second = refresher(lease_ttl=-1), refresher(lease_ttl=60)
+    assert await first.acquire_lease()
+    # Лідер зник, не звільнивши оренду: вона вже прострочена
+    assert await second.acquire_lease()
+    assert not await first.acquire_lease()
+
+
+async def like_counts(conn) -> tuple[dict, dict]:
+    counted = dict((await conn.execute(
+        select(models.likes.c.movie_id, func.count()).group_by(models.likes.c.movie_id))).all())
+    stored = dict((await conn.execute(
+        select(models.movie_like_counts).where(models.movie_like_counts.c.like_count > 0))).all())
+    return counted, stored
+
+
+async def test_movie_like_counts_follow_likes(app_db):
+    likes = random_likes()
+    await insert_likes(likes)
+    async with database.get_write_engine().begin() as conn:
+        await conn.execute(delete(models.likes).where(models.likes.c.user_id <= 10))
+    async with app_db.connect() as conn:
+        counted, stored = await like_counts(conn)
+    assert stored == counted
+
+
+async def test_migration_backfills_movie_like_counts(engine):
+    async with engine.begin() as conn:
+        # БД версії 8: лайки є, лічильників і тригерів ще немає
+        await conn.execute(text("DROP TRIGGER likes_count_ai"))
+        await conn.execute(text("DROP TRIGGER likes_count_ad"))
+        await conn.execute(text("DROP TABLE movie_like_counts"))
+        await conn.execute(text("PRAGMA user_version = 8"))
+        await conn.execute(insert(models.likes), [{"user_id": u, "movie_id": m} for u, m in random_likes()])
+    async with engine.begin() as conn:
+        assert await upgrade_schema(conn) == 1
+        await conn.execute(insert(models.likes).values(user_id=999, movie_id=1))
+        counted, stored = await like_counts(conn)
+    assert stored == counted
@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.fake_tmdb import fake_movie
+from cache import SingleFlight
+from get_movie_info import TMDBClient
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingUpstream:
+    """MockTransport-обробник: рахує запити й відповідає із затримкою,
+    щоб одночасні виклики встигли зустрітися."""
+
+    def __init__(self, delay: float = 0.1, status: int = 200):
+        self.delay = delay
+        self.status = status
+        self.requests: list[httpx.URL] = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url)
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return httpx.Response(self.status, json={"status_message": "Service Unavailable"})
+        page = int(request.url.params.get("page", 1))
+        return httpx.Response(200, json={
+            "page": page,
+            "results": [fake_movie(movie_id) for movie_id in range(page * 20 - 19, page * 20 + 1)],
+            "total_pages": 500,
+            "total_results": 10000,
+        })
+
+
+async def _client(upstream: CountingUpstream) -> TMDBClient:
+    client = TMDBClient(api_key="test")
+    await client.session.aclose()
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    return client
+
+
+async def test_identical_requests_share_one_upstream_call():
+    upstream = CountingUpstream()
+    client = await _client(upstream)
+    try:
+        # Той самий нормалізований ключ: регістр і пробіли не важать
+        names = ["The Matrix", " the matrix ", "THE MATRIX"] * 10
+        results = await asyncio.gather(*(client.get_movies(name=name, page=2) for name in names))
+    finally:
+        await client.aclose()
+
+    assert len(upstream.requests) == 1
+    assert upstream.requests[0].path == "/3/search/movie"
+    assert all(result == results[0] for result in results)
+    assert [movie["id"] for movie in results[0]["results"]] == list(range(21, 41))
+    assert client.stats()["single_flight"] == {"inflight": 0, "leaders": 1, "followers": 29}
+
+
+async def test_different_keys_are_not_merged():
+    upstream = CountingUpstream()
+    client = await _client(upstream)
+    try:
+        await asyncio.gather(
+            client.get_movies(page=1),
+            client.get_movies(page=2),
+            client.get_movies(year=1999, page=1),
+            client.get_movies(name="matrix", page=1),
+        )
+        # Після завершення ключ звільняється: без кешу — новий запит
+        await client.get_movies(page=1)
+    finally:
+        await client.aclose()
+
+    assert len(upstream.requests) == 5
+
+
+async def test_error_is_shared_and_counted_once():
+    upstream = CountingUpstream(status=503)
+    client = await _client(upstream)
+    try:
+        results = await asyncio.gather(*(client.get_movies(page=1) for _ in range(10)))
+    finally:
+        await client.aclose()
+
+    assert len(upstream.requests) == 1
+    assert all(result["results"] == [] and "error" in result for result in results)
+    assert client.breaker.stats()["consecutive_failures"] == 1
+
+
+async def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "payload"
+
+    leader = asyncio.ensure_future(flight.do("key", load))
+    follower = asyncio.ensure_future(flight.do("key", load))
+    await asyncio.sleep(0)
+    follower.cancel()
+
+    assert await leader == "payload"
+    assert calls == 1
+    with pytest.raises(asyncio.CancelledError):
+        await follower
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from get_movie_info import TMDBClient
+
+pytestmark = pytest.mark.anyio
+
+LATENCY = 0.2  # затримка fake_tmdb_server
+
+
+async def test_concurrent_requests_overlap(fake_tmdb_server):
+    client = TMDBClient(api_key="test", base_url=f"{fake_tmdb_server}/3", max_concurrency=10)
+    try:
+        started = time.perf_counter()
+        pages = await asyncio.gather(*(client.get_movies(page=page) for page in range(1, 9)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.aclose()
+
+    assert [data["page"] for data in pages] == list(range(1, 9))
+    assert all(len(data["results"]) == 20 and "error" not in data for data in pages)
+    # Послідовно це 8 × LATENCY; паралельно — трохи більше однієї затримки
+    assert elapsed < 3 * LATENCY
+    async with httpx.AsyncClient() as http:
+        stats = (await http.get(f"{fake_tmdb_server}/stats")).json()
+    assert stats["requests"] >= 8
+
+
+async def test_concurrency_cap_queues_requests(fake_tmdb_server):
+    client = TMDBClient(api_key="test", base_url=f"{fake_tmdb_server}/3", max_concurrency=2)
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(client.get_movies(name=f"movie {n}") for n in range(4)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.aclose()
+
+    # Не більше двох запитів одночасно — дві хвилі
+    assert elapsed >= 2 * LATENCY
+
+
+async def test_non_json_body_is_breaker_failure():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text="<html>Bad gateway</html>")
+
+    client = TMDBClient(api_key="test")
+    await client.session.aclose()
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        data = await client.get_movies(page=1)
+    finally:
+        await client.aclose()
+
+    assert data["results"] == []
+    assert data["error"].startswith("Invalid TMDB response")
+    assert client.breaker.stats()["consecutive_failures"] == 1
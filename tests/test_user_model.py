@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_username_normalized_follows_username(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = models.User(username="Alice", password_hash="old")
+        session.add(user)
+        await session.commit()
+        assert user.username_normalized == "alice"
+
+        # UPDATE без username не перераховує (і не ламає) username_normalized
+        user.password_hash = "new"
+        await session.commit()
+
+        user.username = "ALICIA"
+        await session.commit()
+
+    async with AsyncSession(engine) as session:
+        row = (await session.execute(
+            select(models.User.username, models.User.username_normalized, models.User.password_hash)
+        )).one()
+    assert tuple(row) == ("ALICIA", "alicia", "new")
+
+
+async def test_core_insert_fills_username_normalized(engine):
+    async with AsyncSession(engine) as session:
+        await session.execute(insert(models.User).values(username="Bob", password_hash="x"))
+        await session.commit()
+        normalized = (await session.execute(select(models.User.username_normalized))).scalar_one()
+    assert normalized == "bob"
@@ -0,0 +1,59 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from services.user_service import UserService
+
+pytestmark = pytest.mark.anyio
+
+NAMES = ["Alice", "bob", "dan", "Anna", "banana", "Andrew", "Diana", "Zed"]
+
+
+@pytest.fixture
+async def session(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add_all(models.User(username=name, password_hash="x") for name in NAMES)
+        await session.commit()
+        yield session
+
+
+async def search_all(service: UserService, query: str, limit: int) -> list[str]:
+    """Усі сторінки пошуку підряд, через курсори."""
+    names, cursor = [], None
+    while True:
+        users, cursor = await service.search(query, limit, cursor)
+        names += [user.username for user in users]
+        if cursor is None:
+            return names
+
+
+@pytest.mark.parametrize("query, expected", [
+    # Спершу префікси, потім інші входження — кожна група за іменем
+    ("a", ["Alice", "Andrew", "Anna", "banana", "dan", "Diana"]),
+    ("an", ["Andrew", "Anna", "banana", "dan", "Diana"]),
+    ("AN", ["Andrew", "Anna", "banana", "dan", "Diana"]),
+    ("z", ["Zed"]),
+    ("ana", ["banana", "Diana"]),
+    ("nna", ["Anna"]),
+    ("xy", []),
+])
+async def test_search_prefix_then_substring(session, query, expected):
+    service = UserService(session)
+    users, cursor = await service.search(query, 20)
+    assert [user.username for user in users] == expected
+    assert cursor is None
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+@pytest.mark.parametrize("query", ["a", "an", "ana"])
+async def test_search_pages_cross_rank_boundary(session, query, limit):
+    service = UserService(session)
+    everything, _ = await service.search(query, 100)
+    assert await search_all(service, query, limit) == [user.username for user in everything]
+
+
+async def test_search_rejects_malformed_cursor(session):
+    with pytest.raises(HTTPException) as error:
+        await UserService(session).search("an", 2, "WzEsImEiXQ==")
+    assert error.value.status_code == 400